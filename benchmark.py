@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for texture generation and every layer of a globe frame.
+
+Runs headless (see headless.py), so it works on a machine without a GPU or
+display, e.g. with Mesa's llvmpipe. Each stage is timed repeatedly and the
+percentiles are written as JSON:
+
+    python benchmark.py --out bench.json
+    python benchmark.py --out new.json --baseline bench.json   # exit 1 on regressions
+
+Draw timings call glFinish(), so they include the rasterizer's work rather
+than only the time to queue the commands. --golden compares one fixed frame
+against a reference PNG so optimisations can be checked for output changes;
+--update-golden (re)writes the reference.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform as host_platform
+import tempfile
+import subprocess
+
+# Textures are generated into a private cache so every run starts the same way.
+os.environ['GLOBE_CACHE_DIR'] = tempfile.mkdtemp(prefix='globe-bench-')
+
+import headless  # must come before anything that imports OpenGL
+
+import numpy as np
+from OpenGL.GL import *
+
+import globe
+from globe import Camera, EARTH_RADIUS
+
+PERCENTILES = (50, 90, 99)
+# The images are found next to this file, so the suite runs the same from any directory.
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+EARTH_PATH = os.path.join(ASSET_DIR, 'world.jpg')
+GALAXY_PATH = os.path.join(ASSET_DIR, 'galaxy.jpg')
+BENCH_POINTS = 1_000_000
+
+# ------------------ Timing ------------------
+
+def time_call(fn, iterations, warmup=1, finish=False):
+    """Wall-clock seconds of `iterations` calls to fn(), after `warmup` untimed calls."""
+    for _ in range(warmup):
+        fn()
+    if finish:
+        glFinish()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        if finish:
+            glFinish()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(samples):
+    """Millisecond statistics of a list of durations in seconds."""
+    ms = np.asarray(samples) * 1000.0
+    summary = {'n': len(ms), 'mean_ms': float(ms.mean()), 'min_ms': float(ms.min()),
+               'max_ms': float(ms.max())}
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = float(np.percentile(ms, p))
+    return summary
+
+# ------------------ Stages ------------------
+
+def texture_stages():
+    """(name, callable) pairs for the texture generation and loading stages."""
+    def read_texture_cold():
+        # Drop the decoded mip cache so the image is decoded and filtered again.
+        try:
+            os.remove(globe._mip_cache_path(EARTH_PATH))
+        except OSError:
+            pass
+        glDeleteTextures([globe.read_texture(EARTH_PATH)])
+
+    return [
+        ('create_earth_texture', lambda: glDeleteTextures(
+            [globe.create_earth_texture(*globe.EARTH_FALLBACK_RESOLUTION, use_cache=False)])),
+        ('create_galaxy_texture', lambda: glDeleteTextures(
+            [globe.create_galaxy_texture(use_cache=False)])),
+        ('read_texture_cold', read_texture_cold),
+        ('read_texture', lambda: glDeleteTextures([globe.read_texture(EARTH_PATH)])),
+    ]
+
+def layer_stages(scene, camera, layer=None):
+    """(name, callable) pairs drawing one layer each with the state the frame gives it."""
+    def with_view(draw):
+        def stage():
+            camera.apply()
+            draw()
+        return stage
+
+    def background():
+        glDisable(GL_LIGHTING)
+        glEnable(GL_TEXTURE_2D)
+        globe.draw_background(scene.galaxy_texture, scene.sphere)
+
+    def earth():
+        glEnable(GL_LIGHTING)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, scene.earth.id)
+        scene.sphere.draw(EARTH_RADIUS)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def earth_lod():
+        glEnable(GL_LIGHTING)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, scene.earth.id)
+        scene.earth_lod.draw(camera)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def atmosphere():
+        glEnable(GL_LIGHTING)
+        globe.draw_atmosphere(EARTH_RADIUS, scene.sphere)
+
+    def clouds():
+        glDisable(GL_TEXTURE_2D)
+        globe.draw_clouds(EARTH_RADIUS, 1.0)
+
+    def stars():
+        glDisable(GL_LIGHTING)
+        globe.draw_stars(1200)
+
+    def points():
+        glDisable(GL_LIGHTING)
+        glDisable(GL_TEXTURE_2D)
+        layer.draw(camera)
+
+    stages = [
+        ('draw_background', background),
+        ('draw_nebula', globe.draw_nebula),
+        ('draw_stars', stars),
+        ('draw_atmosphere', atmosphere),
+        ('draw_earth', earth),
+        ('draw_clouds', clouds),
+    ]
+    if scene.earth_lod:
+        stages.append(('draw_earth_lod', earth_lod))
+    if layer:
+        stages.append(('draw_points', points))
+    if scene.skybox:
+        stages.append(('draw_skybox', scene.skybox.draw))
+    if scene.shader:
+        # Earth, atmosphere and clouds in one pass; compare with the three stages above.
+        stages.append(('draw_globe_shaded', lambda: scene.shader.draw(camera, scene.earth.id, 1.0)))
+    return [(name, with_view(draw)) for name, draw in stages]
+
+def frame_stage(scene, camera):
+    """A full frame under a camera that keeps turning, as if the user were dragging."""
+    state = {'time': 0.0}
+
+    def frame():
+        camera.rotate((0, 1, 0), 2.0)
+        state['time'] += 1.0 / 60
+        scene.draw(camera, state['time'])
+
+    return ('frame', frame)
+
+def bench_points(count=BENCH_POINTS):
+    """A layer of `count` random points with values, seeded so every run draws the same."""
+    from points import PointLayer
+    rng = np.random.default_rng(0)
+    lat = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, count)))
+    return PointLayer.from_arrays(lat, rng.uniform(-180.0, 180.0, count), values=rng.random(count))
+
+# ------------------ Golden image ------------------
+
+def golden_frame(renderer, size):
+    """The reference view: Europe at a fixed time, so the output is deterministic."""
+    camera = Camera()
+    camera.set_viewport(*size)
+    globe.fly_to(camera, 'europe', duration=0).step(0.0)
+    return renderer.render_frame(camera, size, time_offset=0.0)
+
+def load_image(path):
+    import pygame
+    surface = pygame.image.load(path)
+    width, height = surface.get_size()
+    return np.frombuffer(pygame.image.tostring(surface, 'RGB'), dtype=np.uint8).reshape(height, width, 3)
+
+def compare_images(image, reference):
+    """Mean absolute difference and share of pixels differing by more than 8 levels."""
+    if image.shape != reference.shape:
+        return {'match': False, 'reason': f"size {image.shape} != {reference.shape}"}
+    diff = np.abs(image.astype(np.int16) - reference.astype(np.int16))
+    return {'mean_abs_diff': float(diff.mean()),
+            'pixels_over_8': float((diff.max(axis=-1) > 8).mean())}
+
+# ------------------ Comparison ------------------
+
+def find_regressions(results, baseline, threshold, metric='p50_ms'):
+    """Stages whose `metric` grew by more than `threshold` (a ratio) against `baseline`."""
+    regressions = []
+    for name, summary in results.items():
+        before = baseline.get(name, {}).get(metric)
+        if before and summary[metric] > before * threshold:
+            regressions.append((name, before, summary[metric]))
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+# ------------------ Main ------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark globe texture generation and rendering.")
+    parser.add_argument('--out', default='benchmark.json', help="JSON results file")
+    parser.add_argument('--size', default='800x600', type=headless.parse_size, help="frame size")
+    parser.add_argument('--iterations', type=int, default=50, help="timed runs per draw stage")
+    parser.add_argument('--texture-iterations', type=int, default=5,
+                        help="timed runs per texture stage")
+    parser.add_argument('--only', help="regular expression selecting stages to run")
+    parser.add_argument('--baseline', help="earlier results to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="p50 ratio over the baseline that counts as a regression")
+    parser.add_argument('--golden', help="reference PNG for the golden-image check")
+    parser.add_argument('--update-golden', action='store_true', help="write --golden from this run")
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help="largest mean absolute pixel difference accepted by the golden check")
+    args = parser.parse_args(argv)
+
+    try:
+        # Without the images every stage would time the fallback path instead.
+        missing = [path for path in (EARTH_PATH, GALAXY_PATH) if not os.path.exists(path)]
+        if missing:
+            print(f"Missing {', '.join(missing)}; not benchmarking the fallback textures")
+            return 1
+        renderer = headless.HeadlessRenderer(args.size, EARTH_PATH, GALAXY_PATH)
+        camera = Camera()
+        camera.set_viewport(*args.size)
+        globe.fly_to(camera, 'earth', duration=0).step(0.0)
+        renderer.scene.resize(camera, *args.size)
+
+        selected = re.compile(args.only) if args.only else None
+        layer = bench_points() if not selected or selected.search('draw_points') else None
+        stages = ([(name, fn, args.texture_iterations) for name, fn in texture_stages()]
+                  + [(name, fn, args.iterations)
+                     for name, fn in layer_stages(renderer.scene, camera, layer)]
+                  + [frame_stage(renderer.scene, camera) + (args.iterations,)])
+
+        results = {}
+        for name, fn, iterations in stages:
+            if selected and not selected.search(name):
+                continue
+            results[name] = summarize(time_call(fn, iterations, finish=True))
+            print(f"{name:>22}: p50 {results[name]['p50_ms']:8.2f} ms  "
+                  f"p99 {results[name]['p99_ms']:8.2f} ms")
+
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': host_platform.python_version(),
+                'platform': host_platform.platform(),
+                'gl_renderer': glGetString(GL_RENDERER).decode(),
+                'size': list(args.size),
+            },
+            'results': results,
+        }
+
+        status = 0
+        if args.golden:
+            image = golden_frame(renderer, args.size)
+            if args.update_golden or not os.path.exists(args.golden):
+                headless.save_image(image, args.golden)
+                print(f"Wrote golden image {args.golden}")
+            else:
+                check = compare_images(image, load_image(args.golden))
+                check['match'] = check.get('mean_abs_diff', float('inf')) <= args.tolerance
+                report['golden'] = check
+                print(f"Golden image: {check}")
+                if not check['match']:
+                    status = 1
+
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)['results']
+            for name, before, after in find_regressions(results, baseline, args.threshold):
+                print(f"Regression in {name}: p50 {before:.2f} ms -> {after:.2f} ms")
+                status = 1
+
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+        if layer:
+            layer.delete()
+        renderer.close()
+        return status
+    finally:
+        shutil.rmtree(os.environ['GLOBE_CACHE_DIR'], ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Country and continent borders drawn over the globe.
+
+Borders are read from a local GeoJSON file (or a shapefile, with pyshp
+installed), converted to unit-sphere XYZ and simplified with
+Douglas-Peucker at every tolerance in TOLERANCES. Douglas-Peucker runs once:
+each point records the largest tolerance at which it survives, so every
+level is a mask over the same points. The levels are saved as one .npz in
+the globe's texture cache and reloaded from there while the source file is
+unchanged.
+
+At runtime BorderOverlay keeps one line buffer per level and draws the
+coarsest level whose error stays under a pixel at the current zoom, with
+the rings of the selected continent drawn brighter on top.
+
+Build (or check) the cache for a file with:
+    python borders.py ne_110m_admin_0_countries.geojson
+"""
+
+import os
+import sys
+import json
+import hashlib
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+
+from globe import CACHE_DIR, latlon_to_xyz
+from continents import CONTINENTS
+
+# Bump when the simplification or the cache layout change.
+BORDER_CACHE_VERSION = 1
+# Douglas-Peucker tolerances in radians of arc, finest first; 0 keeps every point.
+TOLERANCES = (0.0, 0.0005, 0.002, 0.008)
+# Borders float just above the surface so they win the depth test against it.
+BORDER_RADIUS_SCALE = 1.001
+
+BORDER_COLOR = (1.0, 1.0, 1.0, 0.35)
+HIGHLIGHT_COLOR = (1.0, 0.85, 0.3, 0.9)
+
+# Continent names in GeoJSON properties that differ from CONTINENTS.
+CONTINENT_ALIASES = {'oceania': 'australia', 'australia and oceania': 'australia',
+                     'north and central america': 'north-america'}
+CONTINENT_PROPERTIES = ('continent', 'CONTINENT', 'Continent', 'name', 'NAME', 'Name')
+
+# ------------------ Reading ------------------
+
+def continent_id(properties):
+    """CONTINENTS index named by a feature's properties, 0 if none is."""
+    for key in CONTINENT_PROPERTIES:
+        value = (properties or {}).get(key)
+        if isinstance(value, str):
+            name = value.strip().lower()
+            name = CONTINENT_ALIASES.get(name, name.replace(' ', '-'))
+            if name in CONTINENTS:
+                return CONTINENTS.index(name)
+    return 0
+
+def _geometry_lines(geometry):
+    """(lon, lat) arrays of every ring or line of a GeoJSON geometry."""
+    kind = geometry.get('type') if geometry else None
+    coordinates = geometry.get('coordinates') if geometry else None
+    if kind == 'LineString':
+        return [coordinates]
+    if kind in ('Polygon', 'MultiLineString'):
+        return list(coordinates)
+    if kind == 'MultiPolygon':
+        return [ring for polygon in coordinates for ring in polygon]
+    if kind == 'GeometryCollection':
+        return [line for part in geometry['geometries'] for line in _geometry_lines(part)]
+    return []
+
+def read_features(path):
+    """GeoJSON-style features from a .geojson/.json file or a shapefile."""
+    if path.lower().endswith('.shp'):
+        try:
+            import shapefile
+        except ImportError:
+            raise RuntimeError("Reading shapefiles needs pyshp (pip install pyshp); "
+                               "or convert the file to GeoJSON") from None
+        with shapefile.Reader(path) as reader:
+            return reader.__geo_interface__['features']
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('type') == 'FeatureCollection':
+        return data['features']
+    if data.get('type') == 'Feature':
+        return [data]
+    return [{'type': 'Feature', 'properties': {}, 'geometry': data}]
+
+def read_lines(path):
+    """Every border line of a file as (lon/lat arrays, continent ids), rings sorted by continent."""
+    lines, continents = [], []
+    for feature in read_features(path):
+        continent = continent_id(feature.get('properties'))
+        for line in _geometry_lines(feature.get('geometry')):
+            line = np.asarray(line, dtype=np.float64)
+            if line.ndim == 2 and len(line) >= 2:
+                lines.append(line[:, :2])
+                continents.append(continent)
+    order = np.argsort(continents, kind='stable')
+    return [lines[i] for i in order], np.asarray(continents, dtype=np.uint8)[order]
+
+# ------------------ Simplification ------------------
+
+def _segment_distances(points, a, b):
+    """Distances of `points` from the segments a-b, all of shape (n, 3)."""
+    ab = b - a
+    length_sq = np.einsum('ij,ij->i', ab, ab)
+    t = np.einsum('ij,ij->i', points - a, ab) / np.where(length_sq > 0, length_sq, 1.0)
+    closest = a + ab * np.clip(t, 0.0, 1.0)[:, None]
+    return np.linalg.norm(points - closest, axis=1)
+
+def douglas_peucker_importance(points, starts, ends):
+    """Largest Douglas-Peucker tolerance at which each point is kept.
+
+    `points` holds all lines back to back, line i spanning starts[i] to
+    ends[i] inclusive. Line endpoints are always kept (inf). The lines are
+    split in lockstep, one recursion depth of every line per pass, so the
+    work is vectorised over all of them. A point is kept at a tolerance
+    only if the split that produced its interval was too, so the importance
+    is capped by its parent's and the levels nest.
+    """
+    importance = np.zeros(len(points))
+    importance[starts] = importance[ends] = np.inf
+    a, b = np.asarray(starts), np.asarray(ends)
+    cap = np.full(len(a), np.inf)
+    while True:
+        inner = b - a - 1
+        open_ = inner > 0
+        a, b, cap, inner = a[open_], b[open_], cap[open_], inner[open_]
+        if not len(a):
+            return importance
+        # Every interior point of every interval, with the interval it belongs to.
+        interval = np.repeat(np.arange(len(a)), inner)
+        offsets = np.arange(len(interval)) - np.repeat(np.cumsum(inner) - inner, inner)
+        index = a[interval] + 1 + offsets
+        distance = _segment_distances(points[index], points[a[interval]], points[b[interval]])
+
+        first = np.cumsum(inner) - inner
+        farthest = np.maximum.reduceat(distance, first)
+        # The first interior point reaching the maximum splits its interval.
+        hit = np.flatnonzero(distance == farthest[interval])
+        _, take = np.unique(interval[hit], return_index=True)
+        split = index[hit[take]]
+
+        kept = np.minimum(farthest, cap)
+        importance[split] = kept
+        a, b, cap = np.concatenate([a, split]), np.concatenate([split, b]), np.concatenate([kept, kept])
+
+def build_levels(lines, continents, tolerances=TOLERANCES):
+    """Simplified unit-sphere lines per tolerance, as a dict of arrays for np.savez().
+
+    Level i has points_i (float32, n x 3) and per line first_i, count_i and
+    continent_i, ready for glMultiDrawArrays(GL_LINE_STRIP).
+    """
+    counts = np.array([len(line) for line in lines], dtype=np.int64)
+    starts = np.cumsum(counts) - counts
+    lonlat = np.concatenate(lines) if lines else np.zeros((0, 2))
+    points = latlon_to_xyz(lonlat[:, 1], lonlat[:, 0])
+    importance = douglas_peucker_importance(points, starts, starts + counts - 1)
+    closed = np.all(lonlat[starts] == lonlat[starts + counts - 1], axis=1) if lines else np.zeros(0, bool)
+    line_of_point = np.repeat(np.arange(len(lines)), counts)
+
+    levels = {'tolerances': np.asarray(tolerances, dtype=np.float64)}
+    for level, tolerance in enumerate(tolerances):
+        keep = importance > tolerance if tolerance > 0 else np.ones(len(points), dtype=bool)
+        kept_counts = np.bincount(line_of_point[keep], minlength=len(lines))
+        # Closed rings need a triangle to stay a ring; collapsed ones are dropped.
+        usable = kept_counts >= np.where(closed, 4, 2)
+        keep &= usable[line_of_point]
+        level_counts = kept_counts[usable]
+        levels[f'points_{level}'] = points[keep].astype(np.float32)
+        levels[f'first_{level}'] = (np.cumsum(level_counts) - level_counts).astype(np.int32)
+        levels[f'count_{level}'] = level_counts.astype(np.int32)
+        levels[f'continent_{level}'] = continents[usable]
+    return levels
+
+# ------------------ Cache ------------------
+
+def border_cache_path(path, tolerances=TOLERANCES):
+    stat = os.stat(path)
+    key = hashlib.sha1(repr((os.path.abspath(path), stat.st_mtime_ns, stat.st_size, tuple(tolerances),
+                             BORDER_CACHE_VERSION)).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"borders-{key}.npz")
+
+def load_borders(path, tolerances=TOLERANCES):
+    """Simplified border levels for `path`, from the cache or built and cached on first use."""
+    cache_path = border_cache_path(path, tolerances)
+    try:
+        with np.load(cache_path) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError):
+        pass
+    levels = build_levels(*read_lines(path), tolerances=tolerances)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **levels)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"[BorderOverlay] Could not write cache '{cache_path}': {e}")
+    return levels
+
+# ------------------ Drawing ------------------
+
+def select_level(camera, radius, tolerances, pixels=1.0):
+    """Coarsest level whose tolerance stays under `pixels` screen pixels at the view centre."""
+    gap = max(camera.distance - radius, 1e-6)
+    pixels_per_unit = camera.height / 2.0 / np.tan(np.radians(camera.fov) / 2) / gap
+    pixel_angle = pixels / (pixels_per_unit * radius)
+    return max(level for level, tolerance in enumerate(tolerances) if tolerance <= pixel_angle)
+
+class BorderOverlay:
+    """Border lines of every simplification level in GPU buffers, drawn for the current zoom.
+
+    Set `highlight` to a continent name to draw its borders in HIGHLIGHT_COLOR.
+    """
+
+    def __init__(self, levels, radius):
+        self.radius = radius
+        self.tolerances = tuple(levels['tolerances'])
+        self.highlight = None
+        self.levels = []
+        for level, tolerance in enumerate(self.tolerances):
+            # A simplified chord can sag up to its tolerance below the sphere, so it is lifted as much.
+            scale = radius * (BORDER_RADIUS_SCALE + tolerance)
+            points = np.ascontiguousarray(levels[f'points_{level}'] * scale, dtype=np.float32)
+            vbo = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, vbo)
+            glBufferData(GL_ARRAY_BUFFER, points.nbytes, points, GL_STATIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            continents = levels[f'continent_{level}']
+            # Lines are sorted by continent, so each continent is one run of lines.
+            bounds = np.searchsorted(continents, np.arange(len(CONTINENTS) + 1))
+            self.levels.append((vbo, np.ascontiguousarray(levels[f'first_{level}'], dtype=np.int32),
+                                np.ascontiguousarray(levels[f'count_{level}'], dtype=np.int32), bounds))
+
+    @classmethod
+    def load(cls, path, radius):
+        return cls(load_borders(path), radius)
+
+    def draw(self, camera):
+        vbo, firsts, counts, bounds = self.levels[select_level(camera, self.radius, self.tolerances)]
+        if not len(firsts):
+            return
+        glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT | GL_LINE_BIT | GL_DEPTH_BUFFER_BIT)
+        glDisable(GL_LIGHTING)
+        glDisable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDepthMask(GL_FALSE)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 12, ctypes.c_void_p(0))
+
+        glColor4f(*BORDER_COLOR)
+        glLineWidth(1.0)
+        glMultiDrawArrays(GL_LINE_STRIP, firsts, counts, len(firsts))
+        if self.highlight and self.highlight in CONTINENTS:
+            continent = CONTINENTS.index(self.highlight)
+            start, end = bounds[continent], bounds[continent + 1]
+            if end > start:
+                glColor4f(*HIGHLIGHT_COLOR)
+                glLineWidth(2.0)
+                glMultiDrawArrays(GL_LINE_STRIP, firsts[start:end], counts[start:end], end - start)
+
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glPopAttrib()
+
+    def delete(self):
+        if self.levels:
+            glDeleteBuffers(len(self.levels), [vbo for vbo, _, _, _ in self.levels])
+            self.levels = []
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python borders.py <borders.geojson|borders.shp>")
+        return 1
+    levels = load_borders(sys.argv[1])
+    print(f"Cache: {border_cache_path(sys.argv[1])}")
+    for level, tolerance in enumerate(levels['tolerances']):
+        print(f"level {level} (tolerance {tolerance:.4f} rad): {len(levels[f'first_{level}'])} lines, "
+              f"{len(levels[f'points_{level}'])} points")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
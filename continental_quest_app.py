@@ -4,13 +4,19 @@ Continental Quest - Integrated Desktop Application
 Combines the beautiful web landing page with your existing 3D OpenGL globe
 """
 
+import time
+STARTUP_T0 = time.perf_counter()  # startup timeline origin
+
 import os
 import sys
 import threading
-import time
+import hashlib
 import subprocess
 from pathlib import Path
 import json
+import importlib.util
+
+from progress_store import ProgressStore
 
 # Try to import webview for desktop integration
 try:
@@ -20,13 +26,138 @@ except ImportError:
     WEBVIEW_AVAILABLE = False
     print("⚠️  pywebview not installed. Install with: pip install pywebview")
 
-# Import your existing globe functionality
-try:
-    import globe
-    GLOBE_AVAILABLE = True
-except ImportError:
-    GLOBE_AVAILABLE = False
-    print("⚠️  globe.py not found or has import errors")
+# Your existing globe runs in its own process (see globe_process.py), so the
+# launcher never imports pygame, PyOpenGL or NumPy; only check they are there
+from globe_process import GlobeProcess
+GLOBE_AVAILABLE = all(importlib.util.find_spec(module) is not None
+                      for module in ('globe', 'pygame', 'OpenGL', 'numpy'))
+if not GLOBE_AVAILABLE:
+    print("⚠️  globe.py or its dependencies (pygame, PyOpenGL, numpy) not found")
+
+STARTUP_LOG = os.environ.get('CONTINENTAL_QUEST_STARTUP_LOG')
+
+class StartupTimeline:
+    """Startup milestones in milliseconds since the launcher began importing"""
+    
+    STAGES = ('import', 'window-create', 'page-ready', 'globe-ready')
+    
+    def __init__(self, log_path=STARTUP_LOG):
+        self.log_path = log_path
+        self.marks = {}
+        self.expected = set(self.STAGES) if GLOBE_AVAILABLE else set(self.STAGES) - {'globe-ready'}
+        self.lock = threading.Lock()
+    
+    def mark(self, stage):
+        """Record `stage` (first time only); reports once every expected stage is in"""
+        with self.lock:
+            if stage in self.marks:
+                return
+            self.marks[stage] = (time.perf_counter() - STARTUP_T0) * 1000.0
+            complete = self.expected <= self.marks.keys()
+        print(f"⏱️  [Startup] {stage}: {self.marks[stage]:.0f} ms")
+        if complete:
+            self.report()
+    
+    def report(self):
+        """Print the timeline and append it to STARTUP_LOG (one JSON object per line)"""
+        timeline = ' → '.join(f"{stage} {ms:.0f} ms" for stage, ms in self.marks.items())
+        print(f"⏱️  [Startup] {timeline}")
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps({'time': time.time(), 'stages_ms': self.marks}) + '\n')
+            except OSError as e:
+                print(f"⚠️  Could not write startup log '{self.log_path}': {e}")
+
+class WebAPI:
+    """Launcher actions shared by the pywebview bridge and the HTTP server"""
+    
+    def __init__(self, app_instance):
+        self.app = app_instance
+    
+    def launch_continent(self, continent_name):
+        """Called when user selects a continent from the web interface"""
+        print(f"🌍 Web: Launching {continent_name}")
+        self.app.current_continent = continent_name
+        
+        # Start the 3D globe with the selected continent
+        return self.app.start_3d_globe(continent_name)
+    
+    def start_game(self, options=None):
+        """Start the main 3D globe game"""
+        print("\n🚀 [DEBUG] start_game() called from JavaScript!")
+        print(f"📊 [DEBUG] Options received: {options}")
+        
+        continent = 'earth'  # Default to full earth view
+        difficulty = 'medium'
+        
+        if options:
+            continent = options.get('continent', 'earth')
+            difficulty = options.get('difficulty', 'medium')
+        
+        self.app.current_continent = continent
+        self.app.current_difficulty = difficulty
+        
+        print(f"🎮 Starting 3D Globe: {continent} ({difficulty})")
+        result = self.app.start_3d_globe(continent)
+        print(f"🔄 [DEBUG] Globe start result: {result}")
+        return result
+    
+    def set_difficulty(self, difficulty):
+        """Set game difficulty level"""
+        self.app.current_difficulty = difficulty
+        print(f"⚡ Difficulty set to: {difficulty}")
+        return {'status': 'success', 'difficulty': difficulty}
+    
+    def get_progress(self, continent=None):
+        """Get player progress for one continent, or all of them"""
+        if continent:
+            return self.app.progress.get(continent)
+        return self.app.progress.get_all()
+    
+    def update_progress(self, continent, progress):
+        """Record player progress; persisted in the background"""
+        try:
+            stored = self.app.progress.update(continent, progress)
+        except (ValueError, TypeError, RuntimeError) as e:
+            return {'status': 'error', 'message': str(e)}
+        return {'status': 'success', 'continent': continent, 'progress': stored}
+    
+    def get_dashboard(self):
+        """Everything the landing page dashboard shows, in one call"""
+        return {
+            'status': 'success',
+            'progress': self.app.progress.get_all(),
+            'difficulty': self.app.current_difficulty,
+            'current_continent': self.app.current_continent,
+            'game_running': self.app.game_running,
+            'updated_at': self.app.progress.last_updated()
+        }
+    
+    def page_ready(self):
+        """Readiness handshake: the page is interactive and its Python bridge is up"""
+        self.app.on_page_ready()
+        return {'status': 'success', 'startup_ms': self.app.timeline.marks}
+    
+    def minimize_launcher(self):
+        """Minimize the launcher window"""
+        if self.app.web_window:
+            self.app.web_window.minimize()
+        return {'status': 'success'}
+    
+    def close_application(self):
+        """Close the entire application"""
+        self.app.shutdown()
+        return {'status': 'success'}
+    
+    def test_connection(self):
+        """Test if the Python API bridge is working"""
+        print("\n🔥 [TEST] Python API connection successful!")
+        return {
+            'status': 'success',
+            'message': 'Python API bridge is working!',
+            'timestamp': time.time()
+        }
 
 class ContinentalQuestApp:
     """Main application class that manages both the launcher and 3D globe"""
@@ -37,96 +168,102 @@ class ContinentalQuestApp:
         self.game_running = False
         self.web_window = None
         self.game_process = None
+        self.progress = ProgressStore()
+        self.timeline = StartupTimeline()
         
         # Paths
         self.app_dir = Path(__file__).parent
-        self.launcher_path = self.app_dir / 'continental_quest_landing.html'
+        self.launcher_path = self.find_launcher_page()
         
         print("🌍 Continental Quest - Starting Application")
         print(f"📁 App Directory: {self.app_dir}")
         
     def setup_api_bridge(self):
         """Setup JavaScript-Python communication bridge"""
+        return WebAPI(self)
+    
+    def on_page_ready(self):
+        """The page announced it is ready: finish wiring it, then warm up the globe"""
+        self.timeline.mark('page-ready')
+        if self.web_window:
+            # evaluate_js waits for the page, so keep it off the bridge call's thread
+            threading.Thread(target=self.enhance_page, daemon=True).start()
+        # Warm the globe up now that the launcher is interactive
+        self.start_globe_process()
+    
+    def enhance_page(self):
+        """Inject the desktop-only JavaScript helpers into the launcher page"""
+        print("\n🔥 [DEBUG] Page ready - setting up Python integration")
         
-        class WebAPI:
-            def __init__(self, app_instance):
-                self.app = app_instance
-            
-            def launch_continent(self, continent_name):
-                """Called when user selects a continent from the web interface"""
-                print(f"🌍 Web: Launching {continent_name}")
-                self.app.current_continent = continent_name
-                
-                # Start the 3D globe with the selected continent
-                return self.app.start_3d_globe(continent_name)
-            
-            def start_game(self, options=None):
-                """Start the main 3D globe game"""
-                print("\n🚀 [DEBUG] start_game() called from JavaScript!")
-                print(f"📊 [DEBUG] Options received: {options}")
-                
-                continent = 'earth'  # Default to full earth view
-                difficulty = 'medium'
-                
-                if options:
-                    continent = options.get('continent', 'earth')
-                    difficulty = options.get('difficulty', 'medium')
-                
-                self.app.current_continent = continent
-                self.app.current_difficulty = difficulty
-                
-                print(f"🎮 Starting 3D Globe: {continent} ({difficulty})")
-                result = self.app.start_3d_globe(continent)
-                print(f"🔄 [DEBUG] Globe start result: {result}")
-                return result
-            
-            def set_difficulty(self, difficulty):
-                """Set game difficulty level"""
-                self.app.current_difficulty = difficulty
-                print(f"⚡ Difficulty set to: {difficulty}")
-                return {'status': 'success', 'difficulty': difficulty}
-            
-            def get_progress(self, continent=None):
-                """Get player progress (mock data for now)"""
-                # You can integrate this with your actual game progress later
-                progress_data = {
-                    'north-america': 75,
-                    'south-america': 60,
-                    'europe': 85,
-                    'africa': 45,
-                    'asia': 55,
-                    'australia': 90,
-                    'antarctica': 25
-                }
-                
-                if continent:
-                    return progress_data.get(continent, 0)
-                return progress_data
-            
-            def minimize_launcher(self):
-                """Minimize the launcher window"""
-                if self.app.web_window:
-                    self.app.web_window.minimize()
-                return {'status': 'success'}
+        # Inject a direct call to our API
+        script = """
+        // Override the Python interface to force webview mode
+        if (window.pythonInterface) {
+            window.pythonInterface.backend_type = 'webview';
+            console.log('🔥 [FORCED] Backend type set to webview');
             
-            def close_application(self):
-                """Close the entire application"""
-                self.app.shutdown()
-                return {'status': 'success'}
-            
-            def test_connection(self):
-                """Test if the Python API bridge is working"""
-                print("\n🔥 [TEST] Python API connection successful!")
-                return {
-                    'status': 'success',
-                    'message': 'Python API bridge is working!',
-                    'timestamp': time.time()
+            // Override startGame to directly call the Python API
+            const originalStartGame = window.pythonInterface.startGame.bind(window.pythonInterface);
+            window.pythonInterface.startGame = async function(options) {
+                console.log('🚀 [OVERRIDE] startGame called, triggering Python...');
+                try {
+                    // Call the Python API directly
+                    const result = await pywebview.api.start_game(options);
+                    console.log('✅ [PYTHON] Success:', result);
+                    return result;
+                } catch (error) {
+                    console.error('❌ [PYTHON] Error:', error);
+                    // If that fails, try the original method
+                    return await originalStartGame(options);
                 }
+            };
+        }
         
-        return WebAPI(self)
+        // Also inject a global direct function
+        window.directStartGame = function() {
+            console.log('🚀 [DIRECT] Starting game directly!');
+            return window.pythonInterface.startGame({});
+        };
+        
+        console.log('🔥 [INJECTED] Python integration enhanced');
+        """
+        
+        try:
+            self.web_window.evaluate_js(script)
+            print("✅ [DEBUG] Successfully enhanced Python integration")
+        except Exception as e:
+            print(f"❌ [DEBUG] Failed to enhance integration: {e}")
+    
+    def start_globe_process(self):
+        """Spawn the globe process so it warms up while the launcher loads"""
+        if not GLOBE_AVAILABLE:
+            return
+        if self.game_process is None:
+            self.game_process = GlobeProcess(on_ready=lambda: self.timeline.mark('globe-ready'),
+                                             on_hidden=self.on_globe_closed,
+                                             on_exit=self.on_globe_closed,
+                                             on_error=self.on_globe_error)
+        if self.game_process.alive or self.game_process.failed:
+            return
+        self.game_process.start()
+        print("🔥 Pre-warming the 3D globe in the background")
     
+    def on_globe_closed(self):
+        """Called from the globe listener thread when the globe window is closed"""
+        self.game_running = False
+        # Restore the launcher window when the globe closes
+        if self.web_window:
+            try:
+                self.web_window.restore()
+            except Exception:
+                pass
+    
+    def on_globe_error(self, message):
+        """Called from the globe listener thread when the globe process dies unexpectedly"""
+        print(f"❌ 3D globe stopped: {message}")
+
     def start_3d_globe(self, continent='earth'):
-        """Start the 3D OpenGL globe"""
+        """Show the 3D OpenGL globe, flying to the selected continent"""
         try:
             if not GLOBE_AVAILABLE:
                 return {
@@ -134,23 +271,29 @@ class ContinentalQuestApp:
                     'message': 'globe.py not available'
                 }
             
+            # A globe that died during warm-up is not restarted behind the user's back.
+            self.start_globe_process()
+            if self.game_process.failed:
+                return {
+                    'status': 'error',
+                    'message': f'3D globe unavailable: {self.game_process.error}'
+                }
+            
             # Minimize the web launcher
             if self.web_window:
                 self.web_window.minimize()
             
             print(f"🌍 Starting 3D Globe for: {continent}")
             
-            # Start the 3D globe in a separate thread to avoid blocking
-            globe_thread = threading.Thread(
-                target=self.run_globe_with_continent,
-                args=(continent,)
-            )
-            globe_thread.daemon = True
-            globe_thread.start()
+            # The globe runs in its own pre-warmed process; showing it is a pipe message.
+            # A launch during warm-up is queued and shown as soon as the globe is ready.
+            self.game_process.show(continent)
+            self.game_running = True
             
             return {
                 'status': 'success',
                 'continent': continent,
+                'ready': self.game_process.ready.is_set(),
                 'message': f'3D Globe started for {continent}'
             }
             
@@ -161,45 +304,21 @@ class ContinentalQuestApp:
                 'message': f'Failed to start 3D globe: {str(e)}'
             }
     
-    def run_globe_with_continent(self, continent):
-        """Run the 3D globe with continent-specific settings"""
+    def find_launcher_page(self):
+        """The built launcher page (minified, precompressed) if the build is current, else the sources"""
+        source_page = self.app_dir / 'continental_quest_landing.html'
+        manifest_path = self.app_dir / 'dist' / 'manifest.json'
         try:
-            self.game_running = True
-            print(f"🎮 3D Globe running for: {continent}")
-            
-            # You can modify globe.py's main() function or create continent-specific versions
-            # For now, we'll run the existing globe
-            globe.main()
-            
-        except Exception as e:
-            print(f"❌ Globe error: {e}")
-        finally:
-            self.game_running = False
-            # Restore the launcher window when globe closes
-            if self.web_window:
-                self.web_window.show()
-    
-    def create_launcher_files(self):
-        """Copy the landing page files to the app directory if needed"""
-        required_files = [
-            'continental_quest_landing.html',
-            'style.css',
-            'script.js'
-        ]
-        
-        source_dir = Path("C:\\Users\\Manthan Railkar")
-        
-        for filename in required_files:
-            source_file = source_dir / filename
-            target_file = self.app_dir / filename
-            
-            if source_file.exists() and not target_file.exists():
-                try:
-                    import shutil
-                    shutil.copy2(source_file, target_file)
-                    print(f"✅ Copied {filename} to app directory")
-                except Exception as e:
-                    print(f"⚠️  Could not copy {filename}: {e}")
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            for name, digest in manifest['sources'].items():
+                if hashlib.sha256((self.app_dir / name).read_bytes()).hexdigest() != digest:
+                    print(f"⚠️  {name} changed since the last asset build - using the source files")
+                    print("   Rebuild with: python setup_continental_quest.py --build-assets")
+                    return source_page
+            return manifest_path.parent / manifest['entry']
+        except (OSError, ValueError, KeyError):
+            return source_page
     
     def run_webview_launcher(self):
         """Run the web launcher using pywebview"""
@@ -207,9 +326,6 @@ class ContinentalQuestApp:
             print("❌ pywebview is not available")
             return False
         
-        # Ensure launcher files are available
-        self.create_launcher_files()
-        
         if not self.launcher_path.exists():
             print(f"❌ Launcher file not found: {self.launcher_path}")
             return False
@@ -229,54 +345,7 @@ class ContinentalQuestApp:
             on_top=False
         )
         
-        # Add a callback to handle window events
-        def on_window_loaded():
-            print("\n🔥 [DEBUG] Window loaded - setting up Python integration")
-            
-            # Inject a direct call to our API
-            script = f"""
-            // Override the Python interface to force webview mode
-            if (window.pythonInterface) {{
-                window.pythonInterface.backend_type = 'webview';
-                console.log('🔥 [FORCED] Backend type set to webview');
-                
-                // Override startGame to directly call the Python API
-                const originalStartGame = window.pythonInterface.startGame.bind(window.pythonInterface);
-                window.pythonInterface.startGame = async function(options) {{
-                    console.log('🚀 [OVERRIDE] startGame called, triggering Python...');
-                    try {{
-                        // Call the Python API directly
-                        const result = await pywebview.api.start_game(options);
-                        console.log('✅ [PYTHON] Success:', result);
-                        return result;
-                    }} catch (error) {{
-                        console.error('❌ [PYTHON] Error:', error);
-                        // If that fails, try the original method
-                        return await originalStartGame(options);
-                    }}
-                }};
-            }}
-            
-            // Also inject a global direct function
-            window.directStartGame = function() {{
-                console.log('🚀 [DIRECT] Starting game directly!');
-                return window.pythonInterface.startGame({{}});
-            }};
-            
-            console.log('🔥 [INJECTED] Python integration enhanced');
-            """
-            
-            try:
-                # Wait a bit for the page to fully load
-                import time
-                time.sleep(1)
-                self.web_window.evaluate_js(script)
-                print("✅ [DEBUG] Successfully enhanced Python integration")
-            except Exception as e:
-                print(f"❌ [DEBUG] Failed to enhance integration: {e}")
-        
-        # Set the callback
-        webview.windows[0].events.loaded += on_window_loaded
+        self.web_window.events.shown += lambda: self.timeline.mark('window-create')
         
         print("🚀 Starting Continental Quest Launcher...")
         print("🌍 Use the web interface to select your continent!")
@@ -287,16 +356,19 @@ class ContinentalQuestApp:
         return True
     
     def run_fallback_launcher(self):
-        """Fallback method using system browser"""
+        """Fallback method using the system browser and the local web server"""
         print("🔄 Using fallback browser launcher...")
         
-        self.create_launcher_files()
-        
         if self.launcher_path.exists():
             import webbrowser
-            webbrowser.open(f'file://{self.launcher_path.absolute()}')
-            print("🌐 Opened launcher in default browser")
-            print("👉 The 3D globe integration works best with the desktop app")
+            from web_server import WebServer
+            
+            # Serve the page over HTTP so its buttons reach WebAPI (the web_api backend)
+            server = WebServer(self.setup_api_bridge(), self.launcher_path.parent)
+            url = server.start_in_thread()
+            webbrowser.open(url)
+            self.timeline.mark('window-create')
+            print(f"🌐 Opened launcher in default browser: {url}")
             
             # Keep the app running
             try:
@@ -304,6 +376,8 @@ class ContinentalQuestApp:
                     time.sleep(1)
             except KeyboardInterrupt:
                 print("👋 Application closed")
+            finally:
+                server.stop()
         else:
             print("❌ Launcher files not found")
     
@@ -319,10 +393,13 @@ class ContinentalQuestApp:
         
         if self.game_process:
             try:
-                self.game_process.terminate()
+                self.game_process.quit()
             except:
                 pass
         
+        # Write any progress still queued before the hard exit
+        self.progress.close()
+        
         # Force exit
         os._exit(0)
     
@@ -335,6 +412,10 @@ class ContinentalQuestApp:
         if not GLOBE_AVAILABLE:
             print("❌ Warning: globe.py not available - 3D features may not work")
         
+        self.timeline.mark('import')
+        
+        # The globe is warmed up once the page reports ready (on_page_ready), so
+        # it does not compete with the launcher window for the CPU
         # Try to run with webview first (best experience)
         if WEBVIEW_AVAILABLE:
             print("🚀 Starting with WebView integration")
@@ -342,6 +423,8 @@ class ContinentalQuestApp:
         else:
             print("🔄 WebView not available, using browser fallback")
             self.run_fallback_launcher()
+        
+        self.progress.close()
 
 def main():
     """Main entry point"""
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Continent lookup for the globe.
+
+A label raster stores one uint8 continent id per cell of an equirectangular
+lat/lon grid (row 0 at 90N, column 0 at 180W). It is built once from the
+land/ocean colours of world.jpg plus coarse continent outlines, saved in the
+globe's texture cache and memory-mapped afterwards, so a lookup is a single
+array index and thousands of points can be classified in one call.
+"""
+
+import os
+import sys
+import hashlib
+
+import numpy as np
+
+from globe import CACHE_DIR, load_texture_levels
+
+# Ids are positions in this list; 0 means ocean or unknown. Names match the launcher.
+CONTINENTS = [None, 'africa', 'antarctica', 'asia', 'australia', 'europe',
+              'north-america', 'south-america']
+
+# Bump when CONTINENT_OUTLINES or the land classification change.
+LABEL_RASTER_VERSION = 1
+
+# Coarse (lon, lat) outlines, tested in order: the first outline containing a
+# land cell wins, so each one only has to be exact along borders with the
+# continents listed after it.
+CONTINENT_OUTLINES = [
+    ('antarctica', [[(-180, -60), (180, -60), (180, -90), (-180, -90)]]),
+    ('australia', [
+        [(112, -55), (112, -20), (125, -12), (129.5, -8.5), (130.8, -2), (131, 0), (134, 5),
+         (134, 10), (145, 22), (180, 22), (180, -55)],
+        [(-180, -55), (-180, 30), (-150, 30), (-120, -10), (-100, -30), (-100, -55)],
+    ]),
+    ('south-america', [[(-95, 3), (-82, 6), (-77.9, 7.2), (-77.3, 8.8), (-72, 12.6), (-68, 13),
+                        (-60, 13), (-55, 10), (-30, 0), (-30, -20), (-55, -40), (-60, -60),
+                        (-80, -60), (-80, -20), (-95, -5)]]),
+    ('north-america', [
+        [(-180, 50), (-180, 55), (-175, 61), (-171.8, 64), (-168.9, 65.7), (-168, 72),
+         (-150, 75), (-120, 80), (-80, 84), (-10, 84), (-10, 80), (-17, 75), (-20, 70),
+         (-28, 68), (-35, 63), (-42, 58), (-50, 45), (-60, 30), (-58, 18), (-59, 12.5),
+         (-76, 9), (-78, 7.5), (-95, 5), (-130, 20)],
+        [(170, 48), (180, 48), (180, 58), (170, 58)],
+    ]),
+    ('africa', [[(-30, -40), (-26, 34), (-5.45, 35.95), (-2.2, 35.6), (0, 36.3), (3, 36.95),
+                 (6, 37.2), (9.8, 37.45), (11.2, 37.2), (12.5, 36), (15, 35), (22, 34),
+                 (28, 34.5), (32.3, 31.5), (32.5, 29.9), (33.6, 27.8), (34.5, 27), (37, 23),
+                 (39, 19), (41.5, 15), (43.2, 12.5), (45, 12.2), (51.5, 12), (60, 12),
+                 (65, -10), (65, -40)]]),
+    ('europe', [[(-35, 30), (-35, 82), (70, 82), (68, 76), (66, 70), (66, 68), (60, 64),
+                 (59, 60), (59.5, 55), (58.5, 51.2), (52, 47), (51.5, 46.5), (49.8, 41.3),
+                 (46, 42.5), (43, 43), (40, 43.4), (39, 44), (30, 42), (29.05, 41.2),
+                 (28.95, 41), (27, 40.5), (26.55, 40.25), (26.2, 40), (26.1, 38.9),
+                 (26.7, 37.6), (27, 36.7), (28.3, 36.1), (28.3, 30)]]),
+    ('asia', [
+        [(25, 82), (180, 82), (180, -12), (25, -12)],
+        [(-180, 62), (-171.8, 64), (-168.9, 65.7), (-168, 72), (-180, 72)],
+    ]),
+]
+
+# ------------------ Building the raster ------------------
+
+def _points_in_polygon(lon, lat, polygon):
+    """Even-odd test of many points against one (lon, lat) polygon."""
+    inside = np.zeros(lon.shape, dtype=bool)
+    vertices = np.asarray(polygon, dtype=np.float64)
+    for (x0, y0), (x1, y1) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        if y0 == y1:
+            continue
+        crosses = (y0 > lat) != (y1 > lat)
+        x_at = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (lon < x_at)
+    return inside
+
+def land_mask(texture, lat, lon):
+    """True where world.jpg shows land or ice at the given coordinates.
+
+    The texture is mirrored east-west like the globe expects, and ocean is
+    the only strongly blue-dominant colour in it.
+    """
+    height, width = texture.shape[:2]
+    rows = np.clip(((90.0 - lat) / 180.0 * height).astype(np.intp), 0, height - 1)
+    cols = (((180.0 - lon) / 360.0 * width).astype(np.intp)) % width
+    pixels = texture[rows, cols].astype(np.int16)
+    return pixels[..., 2] - pixels[..., 0] < 35
+
+def build_label_raster(texture_path='world.jpg', width=2048):
+    """uint8 continent ids on a (width / 2, width) equirectangular grid."""
+    height = width // 2
+    lat = 90.0 - (np.arange(height) + 0.5) * 180.0 / height
+    lon = -180.0 + (np.arange(width) + 0.5) * 360.0 / width
+    lon, lat = np.meshgrid(lon, lat)
+
+    labels = np.zeros((height, width), dtype=np.uint8)
+    unassigned = land_mask(load_texture_levels(texture_path)[0], lat, lon)
+    for name, polygons in CONTINENT_OUTLINES:
+        inside = np.zeros_like(unassigned)
+        for polygon in polygons:
+            inside |= _points_in_polygon(lon, lat, polygon)
+        hits = unassigned & inside
+        labels[hits] = CONTINENTS.index(name)
+        unassigned &= ~hits
+    return labels
+
+def label_raster_path(texture_path='world.jpg', width=2048):
+    stat = os.stat(texture_path)
+    key = hashlib.sha1(repr((os.path.abspath(texture_path), stat.st_mtime_ns, stat.st_size,
+                             width, LABEL_RASTER_VERSION)).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"continents-{key}.npy")
+
+# ------------------ Lookup ------------------
+
+class ContinentIndex:
+    """Answers "which continent is at this lat/lon" from a label raster."""
+
+    def __init__(self, raster):
+        self.raster = raster
+        self.height, self.width = raster.shape
+
+    @classmethod
+    def load(cls, texture_path='world.jpg', width=2048):
+        """Memory-map the cached raster for `texture_path`, building it on first use.
+
+        Returns None when the texture is missing or cannot be decoded.
+        """
+        try:
+            path = label_raster_path(texture_path, width)
+        except OSError as e:
+            print(f"[ContinentIndex] No continent map without '{texture_path}': {e}")
+            return None
+        try:
+            return cls(np.load(path, mmap_mode='r'))
+        except (OSError, ValueError):
+            pass
+        try:
+            raster = build_label_raster(texture_path, width)
+        except (OSError, ValueError, RuntimeError) as e:  # pygame.error is a RuntimeError
+            print(f"[ContinentIndex] Could not read '{texture_path}': {e}")
+            return None
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, raster)
+            os.replace(tmp_path, path)
+            raster = np.load(path, mmap_mode='r')
+        except OSError as e:
+            print(f"[ContinentIndex] Could not write cache '{path}': {e}")
+        return cls(raster)
+
+    def lookup(self, lat, lon):
+        """Continent ids for arrays of latitudes/longitudes in degrees; NaN gives 0."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        lat = np.where(valid, lat, 0.0)
+        lon = np.where(valid, lon, 0.0)
+        rows = np.clip(((90.0 - lat) * (self.height / 180.0)).astype(np.intp), 0, self.height - 1)
+        cols = ((lon + 180.0) * (self.width / 360.0)).astype(np.intp) % self.width
+        return np.where(valid, self.raster[rows, cols], 0).astype(np.uint8)
+
+    def name_at(self, lat, lon):
+        """Continent name at a single point, or None over the ocean or off the globe."""
+        if not (np.isfinite(lat) and np.isfinite(lon)):
+            return None
+        row = min(self.height - 1, max(0, int((90.0 - lat) * (self.height / 180.0))))
+        col = int((lon + 180.0) * (self.width / 360.0)) % self.width
+        return CONTINENTS[self.raster[row, col]]
+
+def main():
+    index = ContinentIndex.load(sys.argv[1] if len(sys.argv) > 1 else 'world.jpg')
+    if index is None:
+        return 1
+    counts = np.bincount(np.asarray(index.raster).ravel(), minlength=len(CONTINENTS))
+    for continent_id, name in enumerate(CONTINENTS):
+        print(f"{name or 'ocean':>14}: {counts[continent_id] / counts.sum():6.2%}")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,105 +7,426 @@ from OpenGL.GLU import *
 import numpy as np
 import random
 import os
+import hashlib
+import ctypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+# On-disk cache for generated and decoded textures.
+CACHE_DIR = os.environ.get('GLOBE_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), '.globe_cache'))
+
+# Bump when generate_earth_texture_data() changes so stale cache entries are ignored.
+EARTH_TEXTURE_VERSION = 1
+EARTH_FALLBACK_RESOLUTION = (2048, 1024)
+GALAXY_TEXTURE_VERSION = 1
+# Bump when the layout of the decoded mip chain cache files changes.
+MIP_CACHE_VERSION = 1
+
+# Tile pyramid (file or directory, see tiles.py) streamed over the globe when present.
+TILE_PYRAMID_PATH = 'world_tiles.pyr'
+# Country/continent borders (GeoJSON or shapefile, see borders.py) drawn over the globe when present.
+BORDERS_PATH = 'borders.geojson'
+
+# Number of cloud puffs in the cloud layer; only affects startup cost.
+CLOUD_COUNT = 60
+
+EARTH_RADIUS = 2.5
 
 # ------------------ Texture helpers ------------------
 
+def downsample_half(image):
+    """Halve an (h, w, 3) uint8 image with a 2x2 box filter (odd edges are dropped)."""
+    height, width = max(1, image.shape[0] // 2), max(1, image.shape[1] // 2)
+    rows = image[:height * 2] if image.shape[0] > 1 else image
+    cols = rows[:, :width * 2] if image.shape[1] > 1 else rows
+    blocks = cols.reshape(height, cols.shape[0] // height, width, cols.shape[1] // width, 3)
+    return blocks.mean(axis=(1, 3), dtype=np.float32).round().astype(np.uint8)
+
+def build_mip_chain(image):
+    """Return [image, image/2, ..., 1x1] built with a 2x2 box filter."""
+    levels = [image]
+    while image.shape[0] > 1 or image.shape[1] > 1:
+        image = downsample_half(image)
+        levels.append(image)
+    return levels
+
+def _mip_cache_path(path):
+    stat = os.stat(path)
+    key = hashlib.sha1(repr((os.path.abspath(path), stat.st_mtime_ns, stat.st_size,
+                             MIP_CACHE_VERSION)).encode()).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{key}.rgbmip")
+
+def load_texture_levels(path):
+    """Decoded RGB mip chain for the image at `path`, as a list of (h, w, 3) arrays.
+
+    The first load decodes the image and writes a cache file next to the other
+    cached textures: an 8-byte little-endian (width, height) header followed by
+    every level's raw RGB rows, top row first. Later loads memory-map that file,
+    so the returned levels are views into the page cache and need no decoding.
+    """
+    cache_path = _mip_cache_path(path)
+    if os.path.exists(cache_path):
+        try:
+            raw = np.memmap(cache_path, dtype=np.uint8, mode='r')
+            width, height = (int(v) for v in raw[:8].view('<u4'))
+            levels, offset = [], 8
+            while True:
+                size = width * height * 3
+                levels.append(raw[offset:offset + size].reshape(height, width, 3))
+                offset += size
+                if width == 1 and height == 1:
+                    return levels
+                width, height = max(1, width // 2), max(1, height // 2)
+        except (OSError, ValueError) as e:
+            print(f"[load_texture_levels] Ignoring unreadable cache '{cache_path}': {e}")
+
+    surface = pygame.image.load(path)
+    width, height = surface.get_rect().size
+    image = np.frombuffer(pygame.image.tostring(surface, "RGB"), dtype=np.uint8)
+    levels = build_mip_chain(image.reshape(height, width, 3))
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(np.array([width, height], dtype='<u4').tobytes())
+            for level in levels:
+                f.write(level.tobytes())
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"[load_texture_levels] Could not write cache '{cache_path}': {e}")
+    return levels
+
 def read_texture(path):
     """Load an image file as an OpenGL texture. Returns texture id or 0 on failure."""
     try:
-        surface = pygame.image.load(path)
-        surface = pygame.transform.flip(surface, False, True)  # OpenGL origin fix
-        image = pygame.image.tostring(surface, "RGB", True)
-        width, height = surface.get_rect().size
-
-        tex_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, tex_id)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0,
-                     GL_RGB, GL_UNSIGNED_BYTE, image)
-        glBindTexture(GL_TEXTURE_2D, 0)
-        return tex_id
+        return _upload_texture(load_texture_levels(path))
     except Exception as e:
         print(f"[read_texture] Failed to load '{path}': {e}")
         return 0
 
-def create_earth_texture():
-    """Create a procedural Earth-like texture (used as fallback)."""
-    size = 256
-    texture_data = np.zeros((size, size, 3), dtype=np.uint8)
-    for y in range(size):
-        for x in range(size):
-            u = x / size
-            v = y / size
-            noise1 = math.sin(u * math.pi * 8) * math.cos(v * math.pi * 6)
-            noise2 = math.sin(u * math.pi * 12) * math.sin(v * math.pi * 4)
-            noise3 = math.cos(u * math.pi * 16) * math.cos(v * math.pi * 8)
-            land_value = (noise1 + noise2 * 0.5 + noise3 * 0.3) / 1.8
-            if land_value > 0.1:
-                texture_data[y, x] = [
-                    34 + int(land_value * 50),
-                    102 + int(land_value * 50),
-                    34 + int(land_value * 30)
-                ]
-            else:
-                ocean_depth = abs(land_value) * 100
-                texture_data[y, x] = [0, 50 + int(ocean_depth), 150 + int(ocean_depth)]
+def _upload_texture(data, tex_id=None):
+    """Upload RGB image data as a GL_TEXTURE_2D. Returns texture id.
 
-    tex_id = glGenTextures(1)
+    `data` is either a (height, width, 3) uint8 array, for which a mip chain is
+    built here, or a ready-made list of levels as from load_texture_levels().
+    """
+    levels = build_mip_chain(data) if isinstance(data, np.ndarray) else data
+    if tex_id is None:
+        tex_id = glGenTextures(1)
     glBindTexture(GL_TEXTURE_2D, tex_id)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, size, size, 0, GL_RGB, GL_UNSIGNED_BYTE, texture_data)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER,
+                    GL_LINEAR_MIPMAP_LINEAR if len(levels) > 1 else GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for level, image in enumerate(levels):
+        height, width = image.shape[:2]
+        glTexImage2D(GL_TEXTURE_2D, level, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE,
+                     image if image.flags.c_contiguous else np.ascontiguousarray(image))
     glBindTexture(GL_TEXTURE_2D, 0)
     return tex_id
 
-def create_galaxy_texture():
+class AsyncTexture:
+    """Texture whose `id` is a placeholder until its image has been uploaded."""
+
+    def __init__(self, path, placeholder_id):
+        self.path = path
+        self.id = placeholder_id
+        self.ready = False
+
+class TextureLoader:
+    """Decodes textures on a worker thread and uploads them from the GL thread.
+
+    load() returns immediately with an AsyncTexture showing a 1x1 placeholder;
+    poll() must be called from the thread owning the GL context (once per
+    frame) to upload finished images. `notify`, if given, is called from the
+    worker thread whenever an image finishes, e.g. to wake an idle event loop.
+    """
+
+    def __init__(self, notify=None):
+        self.notify = notify
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='texture-loader')
+        self._pending = []
+
+    def _decode(self, path):
+        try:
+            return load_texture_levels(path)
+        finally:
+            if self.notify:
+                self.notify()
+
+    def load(self, path, placeholder=(0, 50, 150), fallback=None):
+        """Start loading `path`; `fallback()` supplies a texture id if loading fails."""
+        swatch = np.array(placeholder, dtype=np.uint8).reshape(1, 1, 3)
+        texture = AsyncTexture(path, _upload_texture([swatch]))
+        future = self._executor.submit(self._decode, path)
+        self._pending.append((future, texture, fallback))
+        return texture
+
+    def poll(self):
+        """Upload every finished texture. Returns True if any texture changed."""
+        changed = False
+        for entry in [entry for entry in self._pending if entry[0].done()]:
+            self._pending.remove(entry)
+            future, texture, fallback = entry
+            try:
+                _upload_texture(future.result(), texture.id)
+            except Exception as e:
+                print(f"[TextureLoader] Failed to load '{texture.path}': {e}")
+                if fallback is None:
+                    continue
+                glDeleteTextures([texture.id])
+                texture.id = fallback()
+            texture.ready = True
+            changed = True
+        return changed
+
+    def wait(self):
+        """Block until every pending texture has been decoded, then upload them."""
+        wait_futures([entry[0] for entry in self._pending])
+        return self.poll()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def cached_texture_data(name, generate, **params):
+    """Return generate(**params), reusing a copy saved in CACHE_DIR on earlier runs.
+
+    The cache file name is derived from `name`, the generator version and the
+    parameters, so changing any of them simply produces a new entry.
+    """
+    key = hashlib.sha1(repr(sorted(params.items())).encode()).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"{name}-{key}.npy")
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        pass
+
+    data = generate(**params)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[cached_texture_data] Could not write cache '{path}': {e}")
+    return data
+
+def generate_earth_texture_data(width=256, height=256):
+    """Procedural Earth-like RGB image of shape (height, width, 3)."""
+    u = np.arange(width, dtype=np.float64) / width
+    v = (np.arange(height, dtype=np.float64) / height)[:, None]
+    noise1 = np.sin(u * np.pi * 8) * np.cos(v * np.pi * 6)
+    noise2 = np.sin(u * np.pi * 12) * np.sin(v * np.pi * 4)
+    noise3 = np.cos(u * np.pi * 16) * np.cos(v * np.pi * 8)
+    land_value = (noise1 + noise2 * 0.5 + noise3 * 0.3) / 1.8
+
+    land = land_value > 0.1
+    land_shade = np.trunc(land_value * 50)
+    ocean_depth = np.trunc(np.abs(land_value) * 100)
+
+    texture_data = np.empty((height, width, 3), dtype=np.uint8)
+    texture_data[..., 0] = np.where(land, 34 + land_shade, 0)
+    texture_data[..., 1] = np.where(land, 102 + land_shade, 50 + ocean_depth)
+    texture_data[..., 2] = np.where(land, 34 + np.trunc(land_value * 30), 150 + ocean_depth)
+    return texture_data
+
+def create_earth_texture(width=256, height=256, use_cache=True):
+    """Create a procedural Earth-like texture (used as fallback)."""
+    if use_cache:
+        texture_data = cached_texture_data(f"earth-v{EARTH_TEXTURE_VERSION}",
+                                           generate_earth_texture_data,
+                                           width=width, height=height)
+    else:
+        texture_data = generate_earth_texture_data(width, height)
+    return _upload_texture(texture_data)
+
+def generate_galaxy_texture_data(size=512, seed=0):
+    """Procedural spiral-galaxy RGB image of shape (size, size, 3).
+
+    Stars are drawn from a seeded NumPy Generator, so the same (size, seed)
+    always produces the same image.
+    """
+    rng = np.random.default_rng(seed)
+    center = size // 2
+    dy = (np.arange(size, dtype=np.float64) - center)[:, None]
+    dx = np.arange(size, dtype=np.float64) - center
+    distance = np.sqrt(dx * dx + dy * dy) / (size / 2)
+    angle = np.arctan2(dy, dx)
+    spiral = np.sin(angle * 3 + distance * 10) * np.exp(-distance * 1.5)
+
+    texture_data = np.empty((size, size, 3), dtype=np.uint8)
+    arm = spiral > 0.1
+    intensity = np.where(arm, spiral * 100, 0).astype(np.int32)
+    base = (distance * 15).astype(np.int32)
+    texture_data[..., 0] = np.where(arm, intensity + 20, base)
+    texture_data[..., 1] = np.where(arm, intensity // 2, base // 2)
+    texture_data[..., 2] = np.where(arm, intensity + 30, base + 5)
+
+    star_chance = rng.random((size, size))
+    white = star_chance > 0.998
+    texture_data[white] = rng.integers(200, 256, white.sum(), dtype=np.uint8)[:, None]
+    coloured = (star_chance > 0.995) & ~white
+    count = coloured.sum()
+    texture_data[coloured] = np.stack([rng.integers(150, 256, count),
+                                       rng.integers(100, 201, count),
+                                       rng.integers(100, 256, count)], axis=1)
+    return texture_data
+
+def create_galaxy_texture(size=512, seed=0, use_cache=True):
     """Create a procedural galaxy background texture."""
-    size = 512
-    texture_data = np.zeros((size, size, 3), dtype=np.uint8)
-    center_x, center_y = size // 2, size // 2
-    for y in range(size):
-        for x in range(size):
-            dx = x - center_x
-            dy = y - center_y
-            distance = math.sqrt(dx*dx + dy*dy) / (size/2)
-            angle = math.atan2(dy, dx)
-            spiral = math.sin(angle * 3 + distance * 10) * math.exp(-distance * 1.5)
-
-            random.seed(x * 1000 + y)
-            star_chance = random.random()
-
-            if star_chance > 0.998:
-                intensity = random.randint(200, 255)
-                texture_data[y, x] = [intensity, intensity, intensity]
-            elif star_chance > 0.995:
-                r = random.randint(150, 255)
-                g = random.randint(100, 200)
-                b = random.randint(100, 255)
-                texture_data[y, x] = [r, g, b]
-            else:
-                if spiral > 0.1:
-                    intensity = int(spiral * 100)
-                    texture_data[y, x] = [intensity + 20, intensity//2, intensity + 30]
-                else:
-                    base = int(distance * 15)
-                    texture_data[y, x] = [base, base//2, base + 5]
+    if use_cache:
+        texture_data = cached_texture_data(f"galaxy-v{GALAXY_TEXTURE_VERSION}",
+                                           generate_galaxy_texture_data,
+                                           size=size, seed=seed)
+    else:
+        texture_data = generate_galaxy_texture_data(size, seed)
+    return _upload_texture(texture_data)
 
-    tex_id = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, tex_id)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, size, size, 0, GL_RGB, GL_UNSIGNED_BYTE, texture_data)
-    glBindTexture(GL_TEXTURE_2D, 0)
+def load_galaxy_texture(path='galaxy.jpg', size=512):
+    """Load the galaxy background from `path`, generating it if the file is unusable."""
+    tex_id = 0
+    if os.path.exists(path):
+        print(f"Loading galaxy texture from {path}")
+        tex_id = read_texture(path)
+    if tex_id == 0:
+        print("Falling back to procedural galaxy texture")
+        tex_id = create_galaxy_texture(size)
     return tex_id
 
+# ------------------ Geometry ------------------
+
+def _upload_buffer(data, target=GL_ARRAY_BUFFER, buffer_id=None):
+    """Copy a NumPy array into a GL_STATIC_DRAW buffer object. Returns the buffer id."""
+    if buffer_id is None:
+        buffer_id = glGenBuffers(1)
+    glBindBuffer(target, buffer_id)
+    glBufferData(target, data.nbytes, data, GL_STATIC_DRAW)
+    glBindBuffer(target, 0)
+    return buffer_id
+
+def uv_to_xyz(s, t):
+    """Unit-sphere points for texture coordinates (s, t) of the globe mesh, shape (..., 3)."""
+    s, t = np.broadcast_arrays(np.asarray(s, dtype=np.float64), np.asarray(t, dtype=np.float64))
+    theta = 2 * np.pi * s
+    rho = np.pi * (1.0 - t)
+    return np.stack([-np.sin(theta) * np.sin(rho), np.cos(theta) * np.sin(rho), np.cos(rho)], axis=-1)
+
+# world.jpg is an equirectangular map mirrored east-west (east on the left),
+# which is what makes it read correctly on this mesh with north at -z.
+
+def latlon_to_xyz(lat, lon):
+    """Unit-sphere points for latitudes/longitudes in degrees on the Earth texture."""
+    return uv_to_xyz((180.0 - np.asarray(lon)) / 360.0, (90.0 - np.asarray(lat)) / 180.0)
+
+def xyz_to_latlon(points):
+    """Inverse of latlon_to_xyz(): (lat, lon) arrays in degrees for points of shape (..., 3)."""
+    points = np.asarray(points, dtype=np.float64)
+    x, y, z = np.moveaxis(points / np.linalg.norm(points, axis=-1, keepdims=True), -1, 0)
+    lat = np.degrees(np.arccos(np.clip(z, -1.0, 1.0))) - 90.0
+    lon = 180.0 - np.degrees(np.arctan2(-x, y)) % 360.0
+    return lat, np.where(lon >= 180.0, lon - 360.0, lon)
+
+def ray_sphere_intersect(origins, directions, radius):
+    """Nearest hits of rays with a sphere at the origin, vectorised over leading axes.
+
+    Returns points of shape (..., 3); rays that miss give NaN.
+    """
+    origins = np.asarray(origins, dtype=np.float64)
+    directions = np.asarray(directions, dtype=np.float64)
+    directions = directions / np.linalg.norm(directions, axis=-1, keepdims=True)
+    b = np.sum(origins * directions, axis=-1)
+    c = np.sum(origins * origins, axis=-1) - radius * radius
+    disc = b * b - c
+    with np.errstate(invalid='ignore'):
+        t = -b - np.sqrt(disc)
+    t = np.where((disc >= 0) & (t >= 0), t, np.nan)
+    return origins + directions * t[..., None]
+
+class SphereMesh:
+    """Unit UV sphere with normals and texture coordinates in a VBO/IBO pair.
+
+    The layout matches gluSphere() with texturing enabled (poles on the z axis,
+    s wrapping around it, t = 1 at +z), so textures map exactly as before.
+    One mesh is shared by every spherical layer and scaled in draw().
+    """
+
+    STRIDE = 8 * 4  # bytes per vertex: position, normal, texcoord
+
+    def __init__(self, slices=100, stacks=100):
+        self.vertices, self.indices = self.generate(slices, stacks)
+        self.index_type = GL_UNSIGNED_SHORT if self.indices.dtype == np.uint16 else GL_UNSIGNED_INT
+        self.vbo = None
+        self.ibo = None
+
+    @staticmethod
+    def generate(slices, stacks):
+        """Return (vertices, indices) for a unit sphere as float32 and uint16/uint32 arrays."""
+        rho = (np.arange(stacks + 1) * (np.pi / stacks))[:, None]
+        theta = np.arange(slices + 1) * (2 * np.pi / slices)
+        theta[-1] = 0.0  # close the seam on exactly the same positions as the first column
+
+        x = -np.sin(theta) * np.sin(rho)
+        y = np.cos(theta) * np.sin(rho)
+        z = np.broadcast_to(np.cos(rho), x.shape)
+        s = np.broadcast_to(np.arange(slices + 1) / slices, x.shape)
+        t = np.broadcast_to(1.0 - np.arange(stacks + 1)[:, None] / stacks, x.shape)
+        vertices = np.stack([x, y, z, x, y, z, s, t], axis=2).reshape(-1, 8)
+
+        row = slices + 1
+        top = (np.arange(stacks)[:, None] * row + np.arange(slices)).ravel()
+        bottom = top + row
+        quads = np.stack([top, bottom, bottom + 1, top, bottom + 1, top + 1], axis=1)
+        index_dtype = np.uint16 if len(vertices) <= 0xFFFF else np.uint32
+        return (np.ascontiguousarray(vertices, dtype=np.float32),
+                np.ascontiguousarray(quads.ravel(), dtype=index_dtype))
+
+    def upload(self):
+        self.vbo = _upload_buffer(self.vertices, buffer_id=self.vbo)
+        self.ibo = _upload_buffer(self.indices, GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+
+    def draw(self, radius=1.0):
+        if self.vbo is None:
+            self.upload()
+        glPushMatrix()
+        glScalef(radius, radius, radius)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, self.STRIDE, ctypes.c_void_p(0))
+        glNormalPointer(GL_FLOAT, self.STRIDE, ctypes.c_void_p(12))
+        glTexCoordPointer(2, GL_FLOAT, self.STRIDE, ctypes.c_void_p(24))
+        glDrawElements(GL_TRIANGLES, len(self.indices), self.index_type, ctypes.c_void_p(0))
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glPopMatrix()
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(2, [self.vbo, self.ibo])
+            self.vbo = self.ibo = None
+
+_sphere_meshes = {}
+
+def get_sphere_mesh(slices=100, stacks=100):
+    """Shared SphereMesh for the given tessellation, created on first use."""
+    mesh = _sphere_meshes.get((slices, stacks))
+    if mesh is None:
+        mesh = _sphere_meshes[(slices, stacks)] = SphereMesh(slices, stacks)
+    return mesh
+
 # ------------------ Scene helpers ------------------
 
 def setup_lighting():
@@ -118,109 +439,172 @@ def setup_lighting():
     glLightfv(GL_LIGHT0, GL_SPECULAR, (0.8, 0.8, 0.8, 1.0))
     glLightfv(GL_LIGHT0, GL_POSITION, (10.0, 5.0, 5.0, 1.0))
 
-def draw_atmosphere(radius):
+def draw_atmosphere(radius, mesh=None):
+    mesh = mesh or get_sphere_mesh()
     glPushMatrix()
     glDisable(GL_TEXTURE_2D)
     glEnable(GL_BLEND)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
     glDepthMask(GL_FALSE)
     glColor4f(0.2, 0.4, 0.8, 0.3)
-    quad = gluNewQuadric()
-    gluSphere(quad, radius * 1.05, 50, 50)
-    gluDeleteQuadric(quad)
+    mesh.draw(radius * 1.05)
     glDepthMask(GL_TRUE)
     glDisable(GL_BLEND)
     glColor4f(1, 1, 1, 1)
     glPopMatrix()
 
+def _random_sphere_points(rng, count, radius):
+    """`count` points at `radius` with uniformly drawn theta/phi angles, shape (count, 3)."""
+    theta = rng.uniform(0, 2 * np.pi, count)
+    phi = rng.uniform(0, np.pi, count)
+    return np.stack([radius * np.sin(phi) * np.cos(theta),
+                     radius * np.sin(phi) * np.sin(theta),
+                     radius * np.cos(phi)], axis=1)
+
+class StarField:
+    """Background stars generated once and drawn from a single interleaved VBO.
+
+    Vertices are packed as float32 (x, y, z, r, g, b) and grouped by size
+    class, so a frame costs one glDrawArrays() call per class regardless of
+    the number of stars.
+    """
+
+    STRIDE = 6 * 4  # bytes per vertex
+
+    def __init__(self, count=1000, bright_count=50, radius=45.0, seed=42):
+        self.vertices, self.batches = self.generate(count, bright_count, radius, seed)
+        self.vbo = None
+
+    @staticmethod
+    def generate(count, bright_count=50, radius=45.0, seed=42):
+        """Return (vertices, batches) where batches is a list of (point_size, first, count)."""
+        rng = np.random.default_rng(seed)
+        positions = _random_sphere_points(rng, count, radius)
+        brightness = rng.uniform(0.3, 1.0, count)[:, None]
+        t = rng.random(count)
+
+        blue = t > 0.95
+        red = (t > 0.9) & ~blue
+        normal = ~(blue | red)
+        classes = [
+            (1.0, normal, (1.0, 0.95, 0.8)),
+            (1.5, red, (1.0, 0.6, 0.4)),
+            (2.0, blue, (0.8, 0.9, 1.0)),
+        ]
+
+        chunks, batches, first = [], [], 0
+        for point_size, mask, tint in classes:
+            colours = brightness[mask] * np.array(tint)
+            chunks.append(np.hstack([positions[mask], colours]))
+            batches.append((point_size, first, int(mask.sum())))
+            first += batches[-1][2]
+
+        bright = _random_sphere_points(rng, bright_count, radius + 3)
+        chunks.append(np.hstack([bright, np.tile((1.0, 1.0, 0.9), (bright_count, 1))]))
+        batches.append((3.0, first, bright_count))
+
+        vertices = np.ascontiguousarray(np.vstack(chunks), dtype=np.float32)
+        return vertices, [batch for batch in batches if batch[2]]
+
+    def upload(self):
+        """Copy the vertex array into a GL buffer (needs a current context)."""
+        self.vbo = _upload_buffer(self.vertices, buffer_id=self.vbo)
+
+    def draw(self):
+        if self.vbo is None:
+            self.upload()
+        glDisable(GL_TEXTURE_2D)
+        glDisable(GL_LIGHTING)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, self.STRIDE, ctypes.c_void_p(0))
+        glColorPointer(3, GL_FLOAT, self.STRIDE, ctypes.c_void_p(12))
+        for point_size, first, count in self.batches:
+            glPointSize(point_size)
+            glDrawArrays(GL_POINTS, first, count)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glPointSize(1.0)
+        glEnable(GL_LIGHTING)
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+
+_star_fields = {}
+
 def draw_stars(count=1000):
-    glDisable(GL_TEXTURE_2D)
-    glDisable(GL_LIGHTING)
+    """Draw `count` background stars, building the StarField on first use."""
+    field = _star_fields.get(count)
+    if field is None:
+        field = _star_fields[count] = StarField(count)
+    field.draw()
 
-    random.seed(42)
-    normal_stars, red_giants, blue_giants, bright_stars = [], [], [], []
+class CloudLayer:
+    """Cloud triangles generated once into a VBO and animated only by rotation.
 
-    for _ in range(count):
-        theta = random.uniform(0, 2 * math.pi)
-        phi = random.uniform(0, math.pi)
-        r = 45
-        x = r * math.sin(phi) * math.cos(theta)
-        y = r * math.sin(phi) * math.sin(theta)
-        z = r * math.cos(phi)
-        brightness = random.uniform(0.3, 1.0)
-        t = random.random()
-        if t > 0.95:
-            blue_giants.append((x, y, z, brightness * 0.8, brightness * 0.9, brightness))
-        elif t > 0.9:
-            red_giants.append((x, y, z, brightness, brightness * 0.6, brightness * 0.4))
-        else:
-            normal_stars.append((x, y, z, brightness, brightness * 0.95, brightness * 0.8))
+    `count` is the number of cloud puffs; raising it adds coverage without any
+    extra per-frame Python work.
+    """
 
-    random.seed(123)
-    for _ in range(50):
-        theta = random.uniform(0, 2 * math.pi)
-        phi = random.uniform(0, math.pi)
-        r = 48
-        x = r * math.sin(phi) * math.cos(theta)
-        y = r * math.sin(phi) * math.sin(theta)
-        z = r * math.cos(phi)
-        bright_stars.append((x, y, z, 1.0, 1.0, 0.9))
-
-    glPointSize(1.0)
-    glBegin(GL_POINTS)
-    for x, y, z, r, g, b in normal_stars:
-        glColor3f(r, g, b); glVertex3f(x, y, z)
-    glEnd()
-
-    glPointSize(1.5)
-    glBegin(GL_POINTS)
-    for x, y, z, r, g, b in red_giants:
-        glColor3f(r, g, b); glVertex3f(x, y, z)
-    glEnd()
-
-    glPointSize(2.0)
-    glBegin(GL_POINTS)
-    for x, y, z, r, g, b in blue_giants:
-        glColor3f(r, g, b); glVertex3f(x, y, z)
-    glEnd()
-
-    glPointSize(3.0)
-    glBegin(GL_POINTS)
-    for x, y, z, r, g, b in bright_stars:
-        glColor3f(r, g, b); glVertex3f(x, y, z)
-    glEnd()
-
-    glPointSize(1.0)
-    glEnable(GL_LIGHTING)
+    def __init__(self, radius, count=60, spread=0.1, seed=123):
+        self.vertices = self.generate(radius * 1.02, count, spread, seed)
+        self.vbo = None
 
-def draw_clouds(radius, time_offset):
-    glPushMatrix()
-    glRotatef(time_offset * 5, 0, 1, 0)
-    glEnable(GL_BLEND)
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-    glDepthMask(GL_FALSE)
-    glColor4f(1, 1, 1, 0.6)
+    @staticmethod
+    def generate(radius, count, spread=0.1, seed=123):
+        """Return float32 triangle vertices of shape (count * 3, 3)."""
+        rng = np.random.default_rng(seed)
+        theta = rng.uniform(0, 2 * np.pi, (count, 1)) + rng.uniform(-spread, spread, (count, 3))
+        phi = rng.uniform(0, np.pi, (count, 1)) + rng.uniform(-spread, spread, (count, 3))
+        vertices = np.stack([radius * np.sin(phi) * np.cos(theta),
+                             radius * np.sin(phi) * np.sin(theta),
+                             radius * np.cos(phi)], axis=2)
+        return np.ascontiguousarray(vertices.reshape(-1, 3), dtype=np.float32)
 
-    glBegin(GL_TRIANGLES)
-    random.seed(123)
-    for _ in range(200):
-        theta = random.uniform(0, 2 * math.pi)
-        phi = random.uniform(0, math.pi)
-        if random.random() > 0.7:
-            cloud_radius = radius * 1.02
-            for _ in range(3):
-                offset_theta = theta + random.uniform(-0.1, 0.1)
-                offset_phi = phi + random.uniform(-0.1, 0.1)
-                x = cloud_radius * math.sin(offset_phi) * math.cos(offset_theta)
-                y = cloud_radius * math.sin(offset_phi) * math.sin(offset_theta)
-                z = cloud_radius * math.cos(offset_phi)
-                glVertex3f(x, y, z)
-    glEnd()
+    def upload(self):
+        self.vbo = _upload_buffer(self.vertices, buffer_id=self.vbo)
 
-    glDepthMask(GL_TRUE)
-    glDisable(GL_BLEND)
-    glColor4f(1, 1, 1, 1)
-    glPopMatrix()
+    def draw(self, time_offset):
+        if self.vbo is None:
+            self.upload()
+        glPushMatrix()
+        glRotatef(time_offset * 5, 0, 1, 0)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDepthMask(GL_FALSE)
+        glColor4f(1, 1, 1, 0.6)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glDrawArrays(GL_TRIANGLES, 0, len(self.vertices))
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glDepthMask(GL_TRUE)
+        glDisable(GL_BLEND)
+        glColor4f(1, 1, 1, 1)
+        glPopMatrix()
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+
+_cloud_layers = {}
+
+def draw_clouds(radius, time_offset):
+    """Draw the cloud layer for `radius`, building the CloudLayer on first use."""
+    layer = _cloud_layers.get(radius)
+    if layer is None:
+        layer = _cloud_layers[radius] = CloudLayer(radius)
+    layer.draw(time_offset)
 
 def draw_nebula():
     glDisable(GL_TEXTURE_2D)
@@ -258,156 +642,1278 @@ def draw_nebula():
     glDisable(GL_BLEND)
     glEnable(GL_LIGHTING)
 
-def draw_background(texture):
+def draw_background(texture, mesh=None):
+    mesh = mesh or get_sphere_mesh()
     glPushMatrix()
     glColor4f(0.4, 0.4, 0.4, 1.0)
     glBindTexture(GL_TEXTURE_2D, texture)
-    quad = gluNewQuadric()
-    gluQuadricTexture(quad, GL_TRUE)
-    gluQuadricOrientation(quad, GLU_INSIDE)
-    gluSphere(quad, 40, 100, 100)
-    gluDeleteQuadric(quad)
+    # Drawn unlit, so the outward-facing normals of the shared mesh do not matter.
+    mesh.draw(40)
     glBindTexture(GL_TEXTURE_2D, 0)
     glColor4f(1, 1, 1, 1)
     glPopMatrix()
 
-# ------------------ Main ------------------
+# ------------------ Skybox ------------------
 
-def main():
-    try:
-        pygame.init()
-        display = (800, 600)
-        pygame.display.set_mode(display, DOUBLEBUF | OPENGL | RESIZABLE)
-        pygame.display.set_caption('Continental Quest - Realistic Earth with Enhanced Space Background')
-        pygame.key.set_repeat(1, 10)
+# (view direction, up vector) for each cube map face, in GL face order.
+_CUBE_FACES = [
+    (GL_TEXTURE_CUBE_MAP_POSITIVE_X, (1, 0, 0), (0, -1, 0)),
+    (GL_TEXTURE_CUBE_MAP_NEGATIVE_X, (-1, 0, 0), (0, -1, 0)),
+    (GL_TEXTURE_CUBE_MAP_POSITIVE_Y, (0, 1, 0), (0, 0, 1)),
+    (GL_TEXTURE_CUBE_MAP_NEGATIVE_Y, (0, -1, 0), (0, 0, -1)),
+    (GL_TEXTURE_CUBE_MAP_POSITIVE_Z, (0, 0, 1), (0, -1, 0)),
+    (GL_TEXTURE_CUBE_MAP_NEGATIVE_Z, (0, 0, -1), (0, -1, 0)),
+]
+
+SKYBOX_MAX_FACE_SIZE = 1024
+
+def skybox_face_size(height, fov=40.0, max_size=SKYBOX_MAX_FACE_SIZE):
+    """Power-of-two cube face size that keeps roughly one texel per screen pixel."""
+    pixels = height / math.tan(math.radians(fov) / 2)
+    return int(min(max_size, 2 ** math.ceil(math.log2(max(pixels, 1)))))
+
+class Skybox:
+    """Static space backdrop baked once into a cube map.
+
+    bake() renders `draw_layers` (a callable drawing the backdrop around the
+    origin) into the six faces through an FBO. draw() then replaces the whole
+    backdrop with one textured cube that follows the camera's rotation only,
+    i.e. the backdrop is treated as infinitely far away.
+    """
+
+    def __init__(self, draw_layers):
+        self.draw_layers = draw_layers
+        self.texture = None
+        self.face_size = 0
+        # Cube corners double as cube map texture coordinates.
+        corners = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)],
+                           dtype=np.float32)
+        faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+        self.vertices = np.ascontiguousarray(corners[np.array(faces).ravel()])
+        self.vbo = None
+
+    @staticmethod
+    def supported():
+        return bool(glGenFramebuffers) and bool(glFramebufferTexture2D)
+
+    def bake(self, face_size):
+        """Render the backdrop into the cube map; a no-op if `face_size` is unchanged."""
+        if self.texture is not None and face_size == self.face_size:
+            return
+        if self.texture is None:
+            self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.texture)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        for param in (GL_TEXTURE_WRAP_S, GL_TEXTURE_WRAP_T, GL_TEXTURE_WRAP_R):
+            glTexParameteri(GL_TEXTURE_CUBE_MAP, param, GL_CLAMP_TO_EDGE)
+        for face, _, _ in _CUBE_FACES:
+            glTexImage2D(face, 0, GL_RGB8, face_size, face_size, 0, GL_RGB, GL_UNSIGNED_BYTE, None)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, 0)
+
+        previous_fbo = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+        fbo = glGenFramebuffers(1)
+        depth = glGenRenderbuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+        glBindRenderbuffer(GL_RENDERBUFFER, depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, face_size, face_size)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, depth)
+
+        glPushAttrib(GL_VIEWPORT_BIT | GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glViewport(0, 0, face_size, face_size)
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        gluPerspective(90, 1.0, 0.1, 100.0)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        for face, direction, up in _CUBE_FACES:
+            glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, face, self.texture, 0)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glLoadIdentity()
+            gluLookAt(0, 0, 0, *direction, *up)
+            self.draw_layers()
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPopAttrib()
+
+        glBindFramebuffer(GL_FRAMEBUFFER, previous_fbo)
+        glDeleteRenderbuffers(1, [depth])
+        glDeleteFramebuffers(1, [fbo])
+        self.face_size = face_size
+
+    def draw(self):
+        if self.vbo is None:
+            self.vbo = _upload_buffer(self.vertices)
+
+        # Keep only the camera rotation: drop translation and any uniform zoom.
+        modelview = np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float32).reshape(4, 4)
+        rotation = np.eye(4, dtype=np.float32)
+        rotation[:3, :3] = modelview[:3, :3] / np.linalg.norm(modelview[0, :3])
+
+        glPushAttrib(GL_ENABLE_BIT | GL_DEPTH_BUFFER_BIT)
+        glDisable(GL_LIGHTING)
+        glDisable(GL_DEPTH_TEST)
+        glDisable(GL_TEXTURE_2D)
+        glEnable(GL_TEXTURE_CUBE_MAP)
+        glDepthMask(GL_FALSE)
+        glColor4f(1, 1, 1, 1)
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.texture)
+        glPushMatrix()
+        glLoadMatrixf(rotation)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glTexCoordPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glDrawArrays(GL_QUADS, 0, len(self.vertices))
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
+        glPopMatrix()
+        glBindTexture(GL_TEXTURE_CUBE_MAP, 0)
+        glPopAttrib()
+
+    def delete(self):
+        if self.texture is not None:
+            glDeleteTextures([self.texture])
+            self.texture = None
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+
+# ------------------ Shaded globe ------------------
+
+# Bump when generate_cloud_coverage_data() changes so stale cache entries are ignored.
+CLOUD_TEXTURE_VERSION = 1
+ATMOSPHERE_SCALE = 1.05  # atmosphere shell radius relative to the Earth
+CLOUD_SCALE = 1.02       # cloud layer radius relative to the Earth, as in CloudLayer
+SOFTWARE_RENDERERS = ('llvmpipe', 'softpipe', 'swrast')  # GL_RENDERER names that run on the CPU
+
+def generate_cloud_coverage_data(width=1024, height=512, count=CLOUD_COUNT, seed=123):
+    """CloudLayer's triangles rasterised into the globe's texture space, shape (height, width).
+
+    A texel is covered (255) when its direction passes through a cloud
+    triangle as seen from the globe's centre, i.e. where the triangle would
+    be drawn over it.
+    """
+    s = (np.arange(width) + 0.5) / width
+    t = ((np.arange(height) + 0.5) / height)[:, None]
+    directions = uv_to_xyz(s, t).reshape(-1, 3)
+    triangles = CloudLayer.generate(1.0, count, seed=seed).astype(np.float64).reshape(-1, 3, 3)
+    covered = np.zeros(len(directions), dtype=bool)
+    for a, b, c in triangles:
+        sign = np.sign(np.dot(a, np.cross(b, c)))
+        inside = np.ones(len(directions), dtype=bool)
+        for p, q in ((a, b), (b, c), (c, a)):
+            inside &= directions @ np.cross(p, q) * sign >= 0
+        covered |= inside
+    return np.where(covered, 255, 0).astype(np.uint8).reshape(height, width)
+
+def create_cloud_texture(use_cache=True):
+    """Single-channel cloud coverage texture for GlobeShader."""
+    if use_cache:
+        data = cached_texture_data(f"clouds-v{CLOUD_TEXTURE_VERSION}", generate_cloud_coverage_data,
+                                   count=CLOUD_COUNT)
+    else:
+        data = generate_cloud_coverage_data(count=CLOUD_COUNT)
+    tex_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, tex_id)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    height, width = data.shape
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_LUMINANCE, width, height, 0, GL_LUMINANCE, GL_UNSIGNED_BYTE,
+                 np.ascontiguousarray(data))
+    glBindTexture(GL_TEXTURE_2D, 0)
+    return tex_id
+
+GLOBE_VERTEX_SHADER = """
+#version 120
+uniform float scale;  // mesh scale: the atmosphere shell, or 1 for surface patches
+varying vec3 position;  // globe (model) coordinates
+varying vec2 texcoord;
+
+void main() {
+    position = gl_Vertex.xyz * scale;
+    texcoord = gl_MultiTexCoord0.st;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(position, 1.0);
+}
+"""
+
+GLOBE_FRAGMENT_SHADER = """
+#version 120
+#extension GL_ARB_shader_texture_lod : enable
+uniform sampler2D earth;
+uniform sampler2D clouds;
+uniform vec3 eye;               // camera position in globe coordinates
+uniform float earth_radius;
+uniform float atmosphere_radius;
+uniform float cloud_radius;
+uniform vec2 cloud_rotation;    // cos and sin of the cloud layer's rotation about y
+uniform bool surface;           // fragments lie on the Earth (tile patches), not on the shell
+uniform bool lighting;
+varying vec3 position;
+varying vec2 texcoord;
+
+const float PI = 3.14159265358979;
+const vec3 ATMOSPHERE_COLOR = vec3(0.2, 0.4, 0.8);
+const float ATMOSPHERE_ALPHA = 0.3;
+const float CLOUD_ALPHA = 0.6;
+
+// GL_LIGHT0 as the fixed-function pipeline applies it (colour material,
+// infinite viewer), evaluated per pixel: the diffuse and specular factors.
+// Every layer of a pixel is lit with the same factors, so they are
+// computed once per fragment.
+vec2 light_terms(vec3 point, vec3 normal) {
+    vec3 p = (gl_ModelViewMatrix * vec4(point, 1.0)).xyz;
+    vec3 n = normalize(gl_NormalMatrix * normal);
+    vec4 light = gl_LightSource[0].position;
+    vec3 l = normalize(light.xyz - p * light.w);
+    float diffuse = max(dot(n, l), 0.0);
+    float specular = diffuse > 0.0 ?
+        pow(max(dot(n, normalize(l + vec3(0.0, 0.0, 1.0))), 0.0), gl_FrontMaterial.shininess) : 0.0;
+    return vec2(diffuse, specular);
+}
+
+vec3 shade(vec3 color, vec2 terms) {
+    if (!lighting)
+        return color;
+    vec3 lit = color * (gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb
+                        + gl_LightSource[0].diffuse.rgb * terms.x)
+               + gl_FrontMaterial.specular.rgb * gl_LightSource[0].specular.rgb * terms.y;
+    return clamp(lit, 0.0, 1.0);
+}
+
+// Texture coordinates of a unit direction, matching SphereMesh.
+vec2 sphere_uv(vec3 d) {
+    return vec2(atan(-d.x, d.y) / (2.0 * PI), 1.0 - acos(clamp(d.z, -1.0, 1.0)) / PI);
+}
+
+// Sample a map at unit direction `d`. s wraps from 0.5 to -0.5 at the seam,
+// which implicit derivatives would take for a huge minification, so the
+// gradients are computed from the (continuous) direction instead.
+vec4 sample_sphere(sampler2D map, vec3 d, vec3 ddx, vec3 ddy) {
+    vec2 uv = sphere_uv(d);
+#ifdef GL_ARB_shader_texture_lod
+    float xy = max(d.x * d.x + d.y * d.y, 1e-6);
+    float z = PI * sqrt(xy);
+    vec2 gx = vec2((d.x * ddx.y - d.y * ddx.x) / (2.0 * PI * xy), ddx.z / z);
+    vec2 gy = vec2((d.x * ddy.y - d.y * ddy.x) / (2.0 * PI * xy), ddy.z / z);
+    return texture2DGradARB(map, uv, gx, gy);
+#else
+    // Where s wraps around inside this pixel quad, use the other wrapping.
+    if (fwidth(uv.s) > 0.5)
+        uv.s = fract(uv.s);
+    return texture2D(map, uv);
+#endif
+}
+
+// Distance along the ray to where it enters (or, from inside, leaves) a sphere; -1 on a miss.
+float intersect(vec3 dir, float radius) {
+    float b = dot(eye, dir);
+    float c = dot(eye, eye) - radius * radius;
+    float disc = b * b - c;
+    if (disc < 0.0)
+        return -1.0;
+    return c > 0.0 ? -b - sqrt(disc) : -b + sqrt(disc);
+}
+
+// Layer `src` (straight alpha) over `dst` (premultiplied alpha).
+vec4 over(vec4 dst, vec4 src) {
+    return vec4(src.rgb * src.a + dst.rgb * (1.0 - src.a), src.a + dst.a * (1.0 - src.a));
+}
+
+// The cloud layer along the ray, lit with the underlying pixel's light terms.
+vec4 cloud_layer(vec3 dir, vec2 terms) {
+    float t = intersect(dir, cloud_radius);
+    if (t < 0.0)
+        return vec4(0.0);
+    vec3 n = normalize(eye + dir * t);
+    // Undo the layer's rotation to find where the point is on the cloud texture.
+    float c = cloud_rotation.x, s = cloud_rotation.y;
+    vec3 v = vec3(c * n.x - s * n.z, n.y, s * n.x + c * n.z);
+    // The cloud texture has no mipmaps, so the seam needs no special care.
+    return vec4(shade(vec3(1.0), terms), CLOUD_ALPHA * texture2D(clouds, sphere_uv(v)).r);
+}
+
+// Opacity of `thickness` layers of the atmosphere's alpha, i.e. 1 - (1 - alpha)^thickness.
+float atmosphere_alpha(float thickness) {
+    return 1.0 - exp2(thickness * log2(1.0 - ATMOSPHERE_ALPHA));
+}
+
+void main() {
+    vec3 dir = normalize(position - eye);
+    vec3 point = position;
+    bool hit = true;
+    gl_FragDepth = gl_FragCoord.z;
+    if (!surface) {
+        float t = intersect(dir, earth_radius);
+        hit = t > 0.0;
+        point = eye + dir * max(t, 0.0);
+        if (hit) {
+            // Depth of the Earth itself, so later layers (tiles) test against it.
+            vec4 clip = gl_ModelViewProjectionMatrix * vec4(point, 1.0);
+            gl_FragDepth = 0.5 * gl_DepthRange.diff * clip.z / clip.w
+                           + 0.5 * (gl_DepthRange.near + gl_DepthRange.far);
+        }
+    }
+    vec3 normal = normalize(point);
+    // Screen-space derivatives outside any branch, where they are well defined.
+    vec3 normal_dx = dFdx(normal);
+    vec3 normal_dy = dFdy(normal);
+
+    vec4 color;
+    if (hit) {
+        vec2 terms = light_terms(point, normal);
+        vec3 map = surface ? texture2D(earth, texcoord).rgb
+                           : sample_sphere(earth, normal, normal_dx, normal_dy).rgb;
+        color = vec4(map * shade(vec3(1.0), terms), 1.0);
+        color = over(color, cloud_layer(dir, terms));
+        // Rim scattering: the atmosphere thickens towards the limb.
+        float rim = 1.0 - max(dot(normal, -dir), 0.0);
+        color = over(color, vec4(shade(ATMOSPHERE_COLOR, terms),
+                                 atmosphere_alpha(2.0 * rim * rim * rim)));
+    } else {
+        // Halo: opacity grows with the length of the ray's path through the shell.
+        vec3 closest = eye - dir * dot(eye, dir);
+        float d2 = dot(closest, closest);
+        float r2 = atmosphere_radius * atmosphere_radius;
+        float chord = sqrt(max(r2 - d2, 0.0) / (r2 - earth_radius * earth_radius));
+        vec2 terms = light_terms(closest, closest * inversesqrt(d2));
+        color = vec4(shade(ATMOSPHERE_COLOR, terms), atmosphere_alpha(2.0 * chord));
+        color.rgb *= color.a;
+        color = over(color, cloud_layer(dir, terms));
+        if (color.a <= 0.0)
+            discard;
+    }
+    gl_FragColor = vec4(color.rgb / color.a, color.a);
+}
+"""
+
+class GlobeShader:
+    """The Earth, its atmosphere and the cloud layer in one pass over one mesh.
+
+    The sphere mesh is drawn once at the atmosphere's radius (front faces
+    only) and every fragment traces its view ray against the Earth and the
+    cloud layer: rays hitting the Earth get the per-pixel lit map with the
+    clouds and a rim-scattering term on top, the others the atmosphere halo.
+    This replaces draw_atmosphere(), the Earth pass and CloudLayer.draw(),
+    so each covered pixel is shaded once instead of up to four times.
+
+    surface() shades other geometry on the Earth (the streamed tiles) with
+    the same lighting, clouds and rim.
+    """
+
+    def __init__(self, mesh, cloud_texture):
+        from OpenGL.GL import shaders
+        self.program = shaders.compileProgram(
+            shaders.compileShader(GLOBE_VERTEX_SHADER, GL_VERTEX_SHADER),
+            shaders.compileShader(GLOBE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+            validate=False)
+        self.mesh = mesh
+        self.cloud_texture = cloud_texture
+        self.uniforms = {name: glGetUniformLocation(self.program, name)
+                         for name in ('earth', 'clouds', 'eye', 'earth_radius', 'atmosphere_radius',
+                                      'cloud_radius', 'cloud_rotation', 'surface', 'lighting', 'scale')}
+        glUseProgram(self.program)
+        glUniform1i(self.uniforms['earth'], 0)
+        glUniform1i(self.uniforms['clouds'], 1)
+        glUniform1f(self.uniforms['earth_radius'], EARTH_RADIUS)
+        glUniform1f(self.uniforms['atmosphere_radius'], EARTH_RADIUS * ATMOSPHERE_SCALE)
+        glUniform1f(self.uniforms['cloud_radius'], EARTH_RADIUS * CLOUD_SCALE)
+        glUseProgram(0)
+
+    @staticmethod
+    def supported():
+        return bool(glCreateShader) and bool(glUseProgram)
+
+    @staticmethod
+    def preferred():
+        """Whether to use the shader by default: GLOBE_SHADERS=1/0 decides, else the renderer.
+
+        Software rasterizers pay for every per-pixel instruction on the CPU,
+        where the Gouraud-lit fixed-function passes are cheaper than one
+        ray-traced pass, so they keep the fixed-function path unless asked.
+        """
+        setting = os.environ.get('GLOBE_SHADERS')
+        if setting in ('0', '1'):
+            return setting == '1'
+        renderer = (glGetString(GL_RENDERER) or b'').decode(errors='replace').lower()
+        return not any(name in renderer for name in SOFTWARE_RENDERERS)
+
+    def draw(self, camera, earth_texture, time_offset, lighting=True):
+        """Draw the Earth, clouds and atmosphere; the camera's matrices must be loaded."""
+        eye = camera.eye_position()
+        glUseProgram(self.program)
+        u = self.uniforms
+        glUniform3f(u['eye'], *eye)
+        angle = math.radians(time_offset * 5)  # CloudLayer's rate
+        glUniform2f(u['cloud_rotation'], math.cos(angle), math.sin(angle))
+        glUniform1i(u['lighting'], bool(lighting))
+        glUniform1i(u['surface'], 0)
+        glUniform1f(u['scale'], EARTH_RADIUS * ATMOSPHERE_SCALE)
+
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_2D, self.cloud_texture)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, earth_texture)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        # From outside the shell only its near side is needed; inside it, only the far side exists.
+        inside = np.dot(eye, eye) <= (EARTH_RADIUS * ATMOSPHERE_SCALE) ** 2
+        if not inside:
+            glEnable(GL_CULL_FACE)
+            glCullFace(GL_BACK)
+        # The shader does its own scaling, so the mesh is drawn at unit size.
+        self.mesh.draw()
+        glDisable(GL_CULL_FACE)
+        glDisable(GL_BLEND)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glUseProgram(0)
+
+    def surface(self, draw):
+        """Run draw() (geometry on the Earth, textured on unit 0) through the shader."""
+        glUseProgram(self.program)
+        glUniform1i(self.uniforms['surface'], 1)
+        glUniform1f(self.uniforms['scale'], 1.0)
+        draw()
+        glUseProgram(0)
+
+    def delete(self):
+        glDeleteProgram(self.program)
+        glDeleteTextures([self.cloud_texture])
+
+# ------------------ Camera ------------------
+
+def quat_from_axis_angle(axis, degrees):
+    """Unit quaternion (w, x, y, z) for a rotation of `degrees` about `axis`."""
+    axis = np.asarray(axis, dtype=np.float64)
+    half = math.radians(degrees) / 2
+    return np.concatenate([[math.cos(half)], math.sin(half) * axis / np.linalg.norm(axis)])
+
+def quat_multiply(a, b):
+    """Hamilton product a * b (apply b first, then a)."""
+    aw, ax, ay, az = a
+    bw, bx, by, bz = b
+    return np.array([aw * bw - ax * bx - ay * by - az * bz,
+                     aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw])
+
+def quat_to_matrix(q):
+    """3x3 rotation matrix of the unit quaternion `q`."""
+    w, x, y, z = q
+    return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+                     [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+                     [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)]])
+
+def quat_from_matrix(m):
+    """Unit quaternion (w, x, y, z) of the 3x3 rotation matrix `m`."""
+    trace = m[0][0] + m[1][1] + m[2][2]
+    if trace > 0:
+        s = 2.0 * math.sqrt(trace + 1.0)
+        q = [0.25 * s, (m[2][1] - m[1][2]) / s, (m[0][2] - m[2][0]) / s, (m[1][0] - m[0][1]) / s]
+    elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+        s = 2.0 * math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2])
+        q = [(m[2][1] - m[1][2]) / s, 0.25 * s, (m[0][1] + m[1][0]) / s, (m[0][2] + m[2][0]) / s]
+    elif m[1][1] > m[2][2]:
+        s = 2.0 * math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2])
+        q = [(m[0][2] - m[2][0]) / s, (m[0][1] + m[1][0]) / s, 0.25 * s, (m[1][2] + m[2][1]) / s]
+    else:
+        s = 2.0 * math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1])
+        q = [(m[1][0] - m[0][1]) / s, (m[0][2] + m[2][0]) / s, (m[1][2] + m[2][1]) / s, 0.25 * s]
+    q = np.array(q)
+    return q / np.linalg.norm(q)
+
+def perspective_matrix(fov, aspect, near, far):
+    """Same matrix as gluPerspective(), row-major."""
+    f = 1.0 / math.tan(math.radians(fov) / 2)
+    return np.array([[f / aspect, 0, 0, 0],
+                     [0, f, 0, 0],
+                     [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+                     [0, 0, -1, 0]])
+
+class Camera:
+    """Orbit camera looking at the globe's centre.
+
+    The globe's orientation is a unit quaternion and zoom is the distance of
+    the eye from the centre, so the whole view is rebuilt from a few numbers
+    every frame instead of accumulating glRotatef/glScaled calls. Matrices are
+    kept on the CPU (row-major NumPy arrays) for culling and picking.
+    """
+
+    def __init__(self, distance=6.0, fov=40.0, near=0.1, far=100.0,
+                 min_distance=3.0, max_distance=30.0):
+        self.orientation = np.array([1.0, 0.0, 0.0, 0.0])
+        self.distance = distance
+        self.fov = fov
+        self.near = near
+        self.far = far
+        self.min_distance = min_distance
+        self.max_distance = max_distance
+        self.width, self.height = 1, 1
+
+    def set_viewport(self, width, height):
+        self.width, self.height = max(1, width), max(1, height)
+
+    @property
+    def aspect(self):
+        return self.width / float(self.height)
+
+    def rotate(self, axis, degrees):
+        """Rotate the globe by `degrees` about an axis given in view space."""
+        q = quat_multiply(quat_from_axis_angle(axis, degrees), self.orientation)
+        self.orientation = q / np.linalg.norm(q)
+
+    def arcball_vector(self, x, y):
+        """Map a window position onto the unit arcball sphere (view space)."""
+        radius = min(self.width, self.height) / 2.0
+        v = np.array([(x - self.width / 2.0) / radius, (self.height / 2.0 - y) / radius, 0.0])
+        length_sq = v[0] * v[0] + v[1] * v[1]
+        if length_sq < 1.0:
+            v[2] = math.sqrt(1.0 - length_sq)
+        else:
+            v /= math.sqrt(length_sq)
+        return v
+
+    def arcball(self, start, end):
+        """Rotate so the point under window position `start` moves under `end`."""
+        v0 = self.arcball_vector(*start)
+        v1 = self.arcball_vector(*end)
+        axis = np.cross(v0, v1)
+        if np.linalg.norm(axis) < 1e-9:
+            return
+        angle = math.degrees(math.atan2(np.linalg.norm(axis), np.dot(v0, v1)))
+        self.rotate(axis, angle)
+
+    def zoom(self, steps, factor=1.05):
+        """Dolly towards (steps > 0) or away from the globe."""
+        self.distance = min(self.max_distance,
+                            max(self.min_distance, self.distance / factor ** steps))
+
+    def view_matrix(self):
+        view = np.eye(4)
+        view[:3, :3] = quat_to_matrix(self.orientation)
+        view[2, 3] = -self.distance
+        return view
+
+    def projection_matrix(self):
+        return perspective_matrix(self.fov, self.aspect, self.near, self.far)
+
+    def eye_position(self):
+        """Camera position in globe (model) coordinates."""
+        return quat_to_matrix(self.orientation).T @ np.array([0.0, 0.0, self.distance])
+
+    def ray(self, x, y):
+        """Rays in globe coordinates through window positions (x, y), vectorised.
+
+        Returns (origins, directions), each of shape (..., 3).
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        tan_half = math.tan(math.radians(self.fov) / 2)
+        view_dirs = np.stack([(2.0 * x / self.width - 1.0) * tan_half * self.aspect,
+                              (1.0 - 2.0 * y / self.height) * tan_half,
+                              -np.ones_like(x)], axis=-1)
+        rotation = quat_to_matrix(self.orientation)
+        directions = view_dirs @ rotation  # inverse rotation: R^T applied to row vectors
+        origins = np.broadcast_to(self.eye_position(), directions.shape)
+        return origins, directions
+
+    def pick_latlon(self, x, y, radius):
+        """(lat, lon) in degrees under window positions (x, y); NaN where the globe is missed."""
+        origins, directions = self.ray(x, y)
+        hits = ray_sphere_intersect(origins, directions, radius)
+        with np.errstate(invalid='ignore'):
+            return xyz_to_latlon(hits)
+
+    def apply(self):
+        """Load the projection and modelview matrices for this frame."""
+        glMatrixMode(GL_PROJECTION)
+        glLoadMatrixf(np.ascontiguousarray(self.projection_matrix().T, dtype=np.float32))
+        glMatrixMode(GL_MODELVIEW)
+        glLoadMatrixf(np.ascontiguousarray(self.view_matrix().T, dtype=np.float32))
+
+# ------------------ Fly-to animation ------------------
+
+# Where the camera flies for each launcher continent: (lat, lon, distance).
+CONTINENT_VIEWS = {
+    'earth': (20.0, 10.0, 8.0),
+    'africa': (2.0, 20.0, 6.5),
+    'antarctica': (-80.0, 30.0, 6.5),
+    'asia': (45.0, 90.0, 7.0),
+    'australia': (-25.0, 134.0, 5.5),
+    'europe': (52.0, 15.0, 5.2),
+    'north-america': (45.0, -100.0, 6.5),
+    'south-america': (-18.0, -60.0, 6.5),
+}
+
+def orientation_facing(lat, lon):
+    """Camera orientation that centres (lat, lon) on screen with north up."""
+    forward = latlon_to_xyz(lat, lon)
+    north = np.array([0.0, 0.0, -1.0])
+    up = north - np.dot(north, forward) * forward
+    if np.linalg.norm(up) < 1e-6:
+        # Over a pole any heading is "north up"; keep longitude 0 at the top.
+        up = latlon_to_xyz(0.0, lon if lat < 0 else lon + 180.0)
+    up /= np.linalg.norm(up)
+    right = np.cross(up, forward)
+    # Rows are the view axes in globe coordinates, i.e. the globe-to-view rotation.
+    return quat_from_matrix(np.array([right, up, forward]))
+
+class CameraFlight:
+    """Animates a Camera to a new orientation and distance.
+
+    The slerp constants and zoom curve are computed once up front; step()
+    only evaluates them for the elapsed time, writing into the camera's
+    existing orientation array, so flights are driven by frame time, look the
+    same at any frame rate and allocate nothing per frame. The camera backs
+    off mid-flight in proportion to the arc travelled.
+    """
+
+    def __init__(self, camera, orientation, distance, duration=None):
+        self.camera = camera
+        start = np.array(camera.orientation, dtype=np.float64)
+        end = np.array(orientation, dtype=np.float64)
+        cos_angle = float(np.dot(start, end))
+        if cos_angle < 0.0:
+            # q and -q are the same rotation; take the short way round.
+            end = -end
+            cos_angle = -cos_angle
+        self.start, self.end = start, end
+        self.angle = math.acos(min(1.0, cos_angle))
+        self.sin_angle = math.sin(self.angle)
+        self.scratch = np.empty(4)
+
+        arc = 2.0 * self.angle  # rotation angle of the globe itself
+        self.start_distance = camera.distance
+        self.end_distance = min(camera.max_distance, max(camera.min_distance, distance))
+        self.lift = min(camera.max_distance - max(self.start_distance, self.end_distance),
+                        max(0.0, 2.0 * arc))
+        self.duration = duration if duration is not None else 0.6 + 0.8 * arc / math.pi
+        self.elapsed = 0.0
+
+    @property
+    def done(self):
+        return self.elapsed >= self.duration
+
+    def step(self, dt):
+        """Advance by `dt` seconds and update the camera. Returns False once finished."""
+        self.elapsed = min(self.duration, self.elapsed + dt)
+        u = self.elapsed / self.duration if self.duration > 0 else 1.0
+        u = u * u * (3.0 - 2.0 * u)  # ease in and out
+        q = self.camera.orientation
+        if self.sin_angle < 1e-6:
+            np.copyto(q, self.end)
+        else:
+            a = math.sin((1.0 - u) * self.angle) / self.sin_angle
+            b = math.sin(u * self.angle) / self.sin_angle
+            np.multiply(self.start, a, out=q)
+            np.multiply(self.end, b, out=self.scratch)
+            np.add(q, self.scratch, out=q)
+        self.camera.distance = (self.start_distance + (self.end_distance - self.start_distance) * u
+                                + self.lift * 4.0 * u * (1.0 - u))
+        return not self.done
+
+def fly_to(camera, target, distance=None, duration=None):
+    """Start a flight to a continent name or a (lat, lon) pair.
+
+    Returns a CameraFlight to step every frame, or None for an unknown continent.
+    """
+    if isinstance(target, str):
+        view = CONTINENT_VIEWS.get(target.lower())
+        if view is None:
+            print(f"[fly_to] Unknown continent '{target}'")
+            return None
+        lat, lon, default_distance = view
+    else:
+        lat, lon = target
+        default_distance = camera.distance
+    return CameraFlight(camera, orientation_facing(lat, lon),
+                        default_distance if distance is None else distance, duration)
+
+# ------------------ Frame scheduling ------------------
+
+TARGET_FPS = 60
+IDLE_FPS = 10      # animation tick rate once nobody is interacting
+IDLE_AFTER = 2.0   # seconds without input before the scene counts as idle
+KEY_ROTATE_SPEED = 90.0  # degrees per second while an arrow key is held
+PERF_EXPORT_INTERVAL = 5.0  # seconds between perf log rewrites
+COMMAND_POLL_INTERVAL = 0.05  # longest sleep before checking the globe_process.py pipe
+POINT_PICK_PIXELS = 8  # how far from the cursor a hovered point may be
+
+class FrameScheduler:
+    """Decides when the next frame should be rendered.
+
+    Frames are paced to `target_fps`, measuring from the start of the previous
+    frame so render time is not added on top of the sleep. In `on_demand` mode
+    the scene is only redrawn at full rate while something marks it dirty
+    (input, a resize, an active animation) or for `idle_after` seconds after
+    that; otherwise it ticks at `idle_fps`, or not at all if that is 0.
+    """
+
+    def __init__(self, target_fps=TARGET_FPS, idle_fps=IDLE_FPS, idle_after=IDLE_AFTER,
+                 on_demand=True, clock=time.perf_counter):
+        self.target_fps = target_fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.on_demand = on_demand
+        self.clock = clock
+        self.dirty = True
+        self.last_activity = clock()
+        self.last_frame = None
+
+    def mark_dirty(self):
+        self.dirty = True
+        self.last_activity = self.clock()
+
+    def idle(self, now=None):
+        now = self.clock() if now is None else now
+        return (self.on_demand and not self.dirty
+                and now - self.last_activity >= self.idle_after)
+
+    def frame_interval(self, now=None):
+        """Seconds between frames right now, or None when no frame is needed at all."""
+        if not self.idle(now):
+            return 1.0 / self.target_fps
+        return 1.0 / self.idle_fps if self.idle_fps else None
+
+    def time_until_next_frame(self, now=None):
+        """Seconds to wait before the next frame (0 if due), or None to wait for input."""
+        now = self.clock() if now is None else now
+        interval = self.frame_interval(now)
+        if interval is None:
+            return None
+        if self.last_frame is None:
+            return 0.0
+        return max(0.0, self.last_frame + interval - now)
+
+    def begin_frame(self, now=None):
+        """Record that a frame is being rendered at `now` and clear the dirty flag."""
+        now = self.clock() if now is None else now
+        interval = self.frame_interval(now) or 0.0
+        if self.last_frame is not None and now - self.last_frame < 2 * interval:
+            # Stay on the fixed cadence instead of drifting by the wake-up latency.
+            self.last_frame = max(self.last_frame + interval, now - interval)
+        else:
+            self.last_frame = now
+        self.dirty = False
+
+def wait_for_events(scheduler, max_wait=None):
+    """Sleep until the next frame is due or input arrives, and return pending events.
+
+    `max_wait` caps the sleep in seconds, for callers that also poll something else.
+    """
+    timeout = scheduler.time_until_next_frame()
+    if max_wait is not None and (timeout is None or timeout > max_wait):
+        timeout = max_wait
+    if timeout is None:
+        events = [pygame.event.wait()]
+    elif timeout > 0:
+        event = pygame.event.wait(max(1, int(timeout * 1000)))
+        events = [event] if event.type != NOEVENT else []
+    else:
+        events = []
+    return events + pygame.event.get()
+
+# ------------------ Scene ------------------
+
+def earth_fallback_texture():
+    print("Falling back to procedural Earth texture")
+    return create_earth_texture(*EARTH_FALLBACK_RESOLUTION)
+
+class GlobeScene:
+    """Every layer of a globe frame and the GL state it needs, independent of any window.
+
+    main() drives one from pygame events; headless.py renders the same scene
+    into an offscreen framebuffer. `earth` is anything with a texture `id`
+    attribute, such as an AsyncTexture that is still loading. `use_shaders`
+    and `use_lod` left at None follow GlobeShader.preferred() and GLOBE_LOD.
+    """
+
+    def __init__(self, camera, earth, galaxy_texture, use_skybox=True,
+                 use_shaders=None, use_lod=None):
         glEnable(GL_DEPTH_TEST)
         glEnable(GL_TEXTURE_2D)
         glShadeModel(GL_SMOOTH)
-        glEnable(GL_NORMALIZE)
+        # The view is rigid, so only the uniform per-layer radius scales normals.
+        glEnable(GL_RESCALE_NORMAL)
         glClearColor(0.0, 0.0, 0.02, 1.0)
+        glViewport(0, 0, camera.width, camera.height)
+        # The light is specified under the initial view, fixing it in eye space.
+        Camera().apply()
+        setup_lighting()
 
-        # Projection
-        def set_projection(w, h):
-            glViewport(0, 0, w, h)
-            glMatrixMode(GL_PROJECTION)
-            glLoadIdentity()
-            aspect = w / float(h if h else 1)
-            gluPerspective(40, aspect, 0.1, 100.0)
-            glMatrixMode(GL_MODELVIEW)
-            glLoadIdentity()
-            glTranslatef(0.0, 0.0, -6)
+        self.earth = earth
+        self.galaxy_texture = galaxy_texture
+        self.lighting = True
+        self.tile_streamer = None
+        self.borders = None  # a borders.BorderOverlay once its lines are loaded
+        self.point_layers = []  # points.PointLayer objects, drawn in order
+        self.profiler = None  # a perf.FrameProfiler while instrumentation is on
+        self.stars = StarField(1200)
+        self.stars.upload()
+        self.clouds = CloudLayer(EARTH_RADIUS, count=CLOUD_COUNT)
+        self.clouds.upload()
+        self.sphere = get_sphere_mesh()
+        self.sphere.upload()
+        # The fixed-function Earth is tessellated for the view rather than uniformly.
+        self.earth_lod = None
+        if use_lod is None:
+            use_lod = os.environ.get('GLOBE_LOD') != '0'
+        if use_lod:
+            from lod import QuadtreeGlobe
+            self.earth_lod = QuadtreeGlobe(EARTH_RADIUS)
 
-        set_projection(*display)
+        # The backdrop does not change over time, so bake it once when FBOs are available.
+        self.skybox = None
+        if use_skybox and Skybox.supported():
+            self.skybox = Skybox(self.draw_backdrop)
+            self.skybox.bake(skybox_face_size(camera.height, camera.fov))
 
-        setup_lighting()
+        # The single-pass shader when GLSL is available; else the fixed-function layers.
+        self.shader = None
+        if use_shaders is None:
+            use_shaders = GlobeShader.preferred()
+        if use_shaders and GlobeShader.supported():
+            try:
+                self.shader = GlobeShader(self.sphere, create_cloud_texture())
+            except Exception as e:
+                print(f"[GlobeScene] Shaders unavailable, using fixed-function rendering: {e}")
+
+        self.material_ambient = [0.2, 0.2, 0.2, 1.0]
+        self.material_diffuse = [0.8, 0.8, 0.8, 1.0]
+        self.material_specular = [0.1, 0.1, 0.1, 1.0]
+        self.material_shininess = [5.0]
+
+    def draw_backdrop(self, profiler=None):
+        glDisable(GL_LIGHTING)
+        glEnable(GL_TEXTURE_2D)
+        draw_background(self.galaxy_texture, self.sphere)
+        if profiler:
+            profiler.lap('background')
+        draw_nebula()
+        if profiler:
+            profiler.lap('nebula')
+        self.stars.draw()
+        if profiler:
+            profiler.lap('stars')
 
-        # Load Earth texture, fallback if missing
-        earth_tex = 0
-        if os.path.exists('world.jpg'):
-            print("Loading Earth texture from world.jpg")
-            earth_tex = read_texture('world.jpg')
-        if earth_tex == 0:
-            print("Falling back to procedural Earth texture")
-            earth_tex = create_earth_texture()
+    def resize(self, camera, width, height):
+        camera.set_viewport(width, height)
+        glViewport(0, 0, camera.width, camera.height)
+        if self.skybox:
+            self.skybox.bake(skybox_face_size(camera.height, camera.fov))
+
+    def draw(self, camera, time_offset):
+        """Render one frame for `camera` into the current framebuffer (no buffer swap).
+
+        With a FrameProfiler in `self.profiler`, each layer's CPU time is recorded.
+        """
+        profiler = self.profiler
+        camera.apply()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        if profiler:
+            profiler.lap('clear')
+
+        if self.skybox:
+            self.skybox.draw()
+            if profiler:
+                profiler.lap('skybox')
+        else:
+            glPushMatrix()
+            self.draw_backdrop(profiler)
+            glPopMatrix()
+        if self.lighting:
+            glEnable(GL_LIGHTING)
+        glColor4f(1, 1, 1, 1)
+
+        glMaterialfv(GL_FRONT, GL_AMBIENT,  self.material_ambient)
+        glMaterialfv(GL_FRONT, GL_DIFFUSE,  self.material_diffuse)
+        glMaterialfv(GL_FRONT, GL_SPECULAR, self.material_specular)
+        glMaterialfv(GL_FRONT, GL_SHININESS, self.material_shininess)
+
+        if self.shader:
+            self.shader.draw(camera, self.earth.id, time_offset, self.lighting)
+            if profiler:
+                profiler.lap('earth')
+            if self.tile_streamer:
+                self.tile_streamer.update(camera)
+                self.shader.surface(self.tile_streamer.draw)
+                if profiler:
+                    profiler.lap('tiles')
+            self.draw_overlays(camera)
+            return
+
+        glDisable(GL_TEXTURE_2D)
+        draw_atmosphere(EARTH_RADIUS, self.sphere)
+        if profiler:
+            profiler.lap('atmosphere')
+
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.earth.id)
+        if self.earth_lod:
+            self.earth_lod.draw(camera)
+        else:
+            self.sphere.draw(EARTH_RADIUS)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        if profiler:
+            profiler.lap('earth')
+        if self.tile_streamer:
+            self.tile_streamer.update(camera)
+            self.tile_streamer.draw()
+            if profiler:
+                profiler.lap('tiles')
+        self.draw_overlays(camera)
 
-        galaxy_tex = create_galaxy_texture()
+        glDisable(GL_TEXTURE_2D)
+        self.clouds.draw(time_offset)
+        if profiler:
+            profiler.lap('clouds')
 
-        qobj = gluNewQuadric()
-        gluQuadricTexture(qobj, GL_TRUE)
-        gluQuadricNormals(qobj, GLU_SMOOTH)
+    def draw_overlays(self, camera):
+        """Borders and point layers over the Earth."""
+        if self.borders:
+            self.borders.draw(camera)
+            if self.profiler:
+                self.profiler.lap('borders')
+        if self.point_layers:
+            for layer in self.point_layers:
+                layer.draw(camera)
+            if self.profiler:
+                self.profiler.lap('points')
 
-        earth_material_ambient = [0.2, 0.2, 0.2, 1.0]
-        earth_material_diffuse = [0.8, 0.8, 0.8, 1.0]
-        earth_material_specular = [0.1, 0.1, 0.1, 1.0]
-        earth_material_shininess = [5.0]
+    def point_at(self, camera, x, y, pixels=POINT_PICK_PIXELS):
+        """(layer, point index, km) of the point nearest window position (x, y), or None.
+
+        Only points within `pixels` of it count, measured on the surface at
+        the view centre. Layers use their last spatial index without waiting
+        for a rebuild.
+        """
+        lat, lon = camera.pick_latlon(x, y, EARTH_RADIUS)
+        if not self.point_layers or not np.isfinite(lat):
+            return None
+        from spatial import EARTH_RADIUS_KM
+        gap = max(camera.distance - EARTH_RADIUS, 1e-6)
+        pixel = 2.0 * gap * math.tan(math.radians(camera.fov) / 2) / camera.height
+        reach = pixels * pixel / EARTH_RADIUS * EARTH_RADIUS_KM
+        nearest = None
+        for layer in self.point_layers:
+            index = layer.index(build=False)
+            if not index:
+                continue
+            km, ids = index.nearest(float(lat), float(lon))
+            if km[0] <= reach and (nearest is None or km[0] < nearest[2]):
+                nearest = (layer, int(ids[0]), float(km[0]))
+        return nearest
+
+    def delete(self):
+        self.stars.delete()
+        self.clouds.delete()
+        self.sphere.delete()
+        if self.earth_lod:
+            self.earth_lod.delete()
+        if self.skybox:
+            self.skybox.delete()
+        if self.shader:
+            self.shader.delete()
+        if self.borders:
+            self.borders.delete()
+        for layer in self.point_layers:
+            layer.delete()
+
+# ------------------ Main ------------------
+
+def set_window_visible(visible):
+    """Bring the pygame window up, or get it out of the way, keeping its GL context.
+
+    Going away minimises rather than hides: re-showing a hidden OpenGL window
+    crashed Mesa in testing, while minimise/restore is safe. A window created
+    with HIDDEN is shown the first time this is called with True.
+    """
+    if not visible:
+        pygame.display.iconify()
+        return
+    try:
+        from pygame._sdl2.video import Window
+        window = Window.from_display_module()
+        window.restore()
+        window.show()
+        window.focus()
+    except (ImportError, AttributeError, pygame.error) as e:
+        print(f"[set_window_visible] Could not show the window: {e}")
+
+def main(target_fps=TARGET_FPS, on_demand=True, tile_path=None, fly_to_target=None,
+         perf_log=None, commands=None, start_hidden=False, borders_path=None,
+         point_layers=()):
+    """Run the globe window; `fly_to_target` is a continent name or (lat, lon) to fly to on start.
+
+    With `perf_log` (a .csv or .json path, default GLOBE_PERF_LOG) frame
+    instrumentation stays on and the recent frames are written there every
+    PERF_EXPORT_INTERVAL seconds.
+
+    `commands` is a multiprocessing Connection used by globe_process.py: the
+    globe reports ('ready',) once its textures are resident, obeys ('show',
+    target), ('hide',) and ('quit',), and closing the window only minimises it and
+    reports ('hidden',).
+
+    `borders_path` (default BORDERS_PATH when it exists) is a GeoJSON file or
+    shapefile of borders to draw; the continent clicked or flown to is highlighted.
+    `point_layers` are points.PointLayer objects to draw; they may still be
+    filling on other threads.
+    """
+    perf_log = perf_log or os.environ.get('GLOBE_PERF_LOG')
+    try:
+        pygame.init()
+        display = (800, 600)
+        pygame.display.set_mode(display, DOUBLEBUF | OPENGL | RESIZABLE | (HIDDEN if start_hidden else 0))
+        pygame.display.set_caption('Continental Quest - Realistic Earth with Enhanced Space Background')
+
+        camera = Camera()
+        camera.set_viewport(*display)
+
+        # Load the Earth texture in the background; the globe shows a placeholder
+        # colour until it is ready, or the procedural texture if it is missing.
+        texture_ready_event = pygame.USEREVENT + 1
+        loader = TextureLoader(notify=lambda: pygame.event.post(pygame.event.Event(texture_ready_event)))
+        print("Loading Earth texture from world.jpg")
+        earth = loader.load('world.jpg', fallback=earth_fallback_texture)
+
+        # The continent raster is memory-mapped, or built once in the background on first run.
+        from continents import ContinentIndex
+        index_pool = ThreadPoolExecutor(max_workers=1)
+        continent_index = index_pool.submit(ContinentIndex.load)
+        # Borders are simplified and cached on the same worker; the lines are uploaded once ready.
+        borders_path = borders_path or (BORDERS_PATH if os.path.exists(BORDERS_PATH) else None)
+        borders = None
+        if borders_path:
+            from borders import BorderOverlay, load_borders
+            print(f"Loading borders from {borders_path}")
+            borders = index_pool.submit(load_borders, borders_path)
+        index_pool.shutdown(wait=False)
+
+        scene = GlobeScene(camera, earth, load_galaxy_texture())
+        scene.point_layers = list(point_layers)
+        # Hover picking needs a spatial index; it is rebuilt here whenever a layer's points change.
+        point_pool = ThreadPoolExecutor(max_workers=1)
+        hovered = None
+
+        # High-resolution imagery is streamed over the base texture when a pyramid exists.
+        tile_path = tile_path or (TILE_PYRAMID_PATH if os.path.exists(TILE_PYRAMID_PATH) else None)
+        if tile_path:
+            from tiles import TileStreamer, open_tile_source
+            print(f"Streaming Earth imagery tiles from {tile_path}")
+            scene.tile_streamer = TileStreamer(
+                open_tile_source(tile_path), radius=EARTH_RADIUS,
+                notify=lambda: pygame.event.post(pygame.event.Event(texture_ready_event)))
+        tile_streamer = scene.tile_streamer
+
+        visible = not start_hidden
+        if commands is not None:
+            # A pre-warmed globe should show the real Earth the moment it is shown.
+            loader.wait()
+            commands.send(('ready',))
+        # The pipe is polled from this thread: SDL is not safe to drive from a listener thread.
+        max_wait = COMMAND_POLL_INTERVAL if commands is not None else None
+
+        # Instrumentation is attached only while the HUD is shown or a log is written.
+        from perf import FrameProfiler, PerfHud
+        profiler = FrameProfiler()
+        hud = None
+        last_export = time.perf_counter()
+        if perf_log:
+            profiler.enable()
+            scene.profiler = profiler
 
         start_time = time.time()
-        lastPosX, lastPosY = 0, 0
         rotating = False
+        click_pos = (0, 0)
+        # Input is coalesced per frame: one arcball step and one zoom per frame.
+        drag_from = drag_to = None
+        zoom_steps = 0
+        last_frame_time = time.perf_counter()
 
         print("Controls:")
         print("Arrow keys / Left-drag: rotate Earth")
         print("Mouse wheel: zoom")
-        print("L: toggle lighting, ESC: quit")
+        print("L: toggle lighting, F3: performance overlay, ESC: quit")
+
+        scheduler = FrameScheduler(target_fps, on_demand=on_demand)
+        flight = fly_to(camera, fly_to_target) if fly_to_target is not None else None
+
+        def hide_window():
+            nonlocal visible, rotating, drag_from, drag_to
+            visible = rotating = False
+            drag_from = drag_to = None
+            set_window_visible(False)
 
         running = True
         while running:
-            current_time = time.time() - start_time
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+            while commands is not None and commands.poll():
+                try:
+                    message = commands.recv()
+                except (EOFError, OSError):
+                    message = ('quit',)
+                scheduler.mark_dirty()
+                if message[0] == 'quit':
                     running = False
+                    break
+                elif message[0] == 'hide':
+                    hide_window()
+                elif message[0] == 'show':
+                    visible = True
+                    set_window_visible(True)
+                    target = message[1] if len(message) > 1 else None
+                    flight = fly_to(camera, target) if target is not None else None
+                    if scene.borders and isinstance(target, str):
+                        scene.borders.highlight = target
+
+            if visible:
+                events = wait_for_events(scheduler, max_wait)
+            else:
+                # A hidden window renders nothing; just wait for the next command.
+                event = pygame.event.wait(int(COMMAND_POLL_INTERVAL * 1000))
+                events = ([event] if event.type != NOEVENT else []) + pygame.event.get()
+            for event in events:
+                if event.type != MOUSEMOTION or rotating:
+                    scheduler.mark_dirty()
+                if event.type == pygame.QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                    if commands is None:
+                        running = False
+                    else:
+                        hide_window()
+                        commands.send(('hidden',))
                 elif event.type == VIDEORESIZE:
-                    set_projection(event.w, event.h)
+                    scene.resize(camera, event.w, event.h)
                 elif event.type == KEYDOWN:
-                    if event.key == K_ESCAPE:
-                        running = False
-                    elif event.key == K_LEFT:
-                        glRotatef(2, 0, 1, 0)
-                    elif event.key == K_RIGHT:
-                        glRotatef(2, 0, -1, 0)
-                    elif event.key == K_UP:
-                        glRotatef(2, -1, 0, 0)
-                    elif event.key == K_DOWN:
-                        glRotatef(2, 1, 0, 0)
-                    elif event.key == K_l:
-                        if glIsEnabled(GL_LIGHTING):
-                            glDisable(GL_LIGHTING); print("Lighting disabled")
+                    if event.key == K_l:
+                        scene.lighting = not scene.lighting
+                        print("Lighting enabled" if scene.lighting else "Lighting disabled")
+                    elif event.key == K_F3:
+                        if hud:
+                            hud.delete()
+                            hud = None
+                            if not perf_log:
+                                profiler.disable()
+                                scene.profiler = None
                         else:
-                            glEnable(GL_LIGHTING); print("Lighting enabled")
+                            profiler.enable()
+                            scene.profiler = profiler
+                            hud = PerfHud(profiler)
                 elif event.type == MOUSEBUTTONDOWN:
                     if event.button == 1:
                         rotating = True
+                        drag_from = drag_to = click_pos = event.pos
                     elif event.button == 4:
-                        glScaled(1.05, 1.05, 1.05)
+                        zoom_steps += 1
                     elif event.button == 5:
-                        glScaled(0.95, 0.95, 0.95)
+                        zoom_steps -= 1
                 elif event.type == MOUSEBUTTONUP:
                     if event.button == 1:
                         rotating = False
+                        if math.dist(event.pos, click_pos) < 4:
+                            lat, lon = camera.pick_latlon(*event.pos, EARTH_RADIUS)
+                            if not np.isfinite(lat):
+                                print("Clicked on space")
+                            elif not continent_index.done():
+                                print(f"Clicked at {float(lat):.1f}, {float(lon):.1f} (continent map still loading)")
+                            elif continent_index.exception() or continent_index.result() is None:
+                                print(f"Clicked at {float(lat):.1f}, {float(lon):.1f} (continent map unavailable)")
+                            else:
+                                name = continent_index.result().name_at(float(lat), float(lon))
+                                print(f"Clicked on {name or 'ocean'} at {float(lat):.1f}, {float(lon):.1f}")
+                                if scene.borders:
+                                    scene.borders.highlight = name
                 elif event.type == MOUSEMOTION and rotating:
-                    x, y = event.pos
-                    dx = x - lastPosX
-                    dy = y - lastPosY
-                    # Simple, stable world-axis rotation (avoids GLfloat usage)
-                    glRotatef(dy * 0.3, 1, 0, 0)
-                    glRotatef(dx * 0.3, 0, 1, 0)
-                    lastPosX, lastPosY = x, y
-                if event.type == MOUSEMOTION and not rotating:
-                    lastPosX, lastPosY = event.pos
+                    drag_to = event.pos
+                elif event.type == MOUSEMOTION and scene.point_layers:
+                    hit = scene.point_at(camera, *event.pos)
+                    if hit and hit[:2] != hovered:
+                        layer, index, km = hit
+                        lat, lon, value = layer.point(index)
+                        print(f"Point {index} at {lat:.2f}, {lon:.2f}"
+                              + (f" (value {value:.4g})" if np.isfinite(value) else ""))
+                    hovered = hit[:2] if hit else None
 
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            # Held arrow keys rotate at a fixed angular speed, independent of key repeat.
+            keys = pygame.key.get_pressed()
+            yaw = keys[K_LEFT] - keys[K_RIGHT]
+            pitch = keys[K_DOWN] - keys[K_UP]
+            if yaw or pitch:
+                scheduler.mark_dirty()
+            if flight:
+                scheduler.mark_dirty()
 
-            glPushMatrix()
-            glDisable(GL_LIGHTING)
-            glEnable(GL_TEXTURE_2D)
-            draw_background(galaxy_tex)
-            draw_nebula()
-            draw_stars(1200)
-            glPopMatrix()
-            glEnable(GL_LIGHTING)
-            glColor4f(1, 1, 1, 1)
-
-            glMaterialfv(GL_FRONT, GL_AMBIENT,  earth_material_ambient)
-            glMaterialfv(GL_FRONT, GL_DIFFUSE,  earth_material_diffuse)
-            glMaterialfv(GL_FRONT, GL_SPECULAR, earth_material_specular)
-            glMaterialfv(GL_FRONT, GL_SHININESS, earth_material_shininess)
+            if loader.poll():
+                scheduler.mark_dirty()
+            if tile_streamer and tile_streamer.poll():
+                scheduler.mark_dirty()
+            if any(layer.dirty for layer in scene.point_layers):
+                scheduler.mark_dirty()
+            for layer in scene.point_layers:
+                layer.refresh_index(point_pool)
+            if borders and borders.done():
+                try:
+                    scene.borders = BorderOverlay(borders.result(), EARTH_RADIUS)
+                    if isinstance(fly_to_target, str):
+                        scene.borders.highlight = fly_to_target
+                except Exception as e:
+                    print(f"[BorderOverlay] Could not load '{borders_path}': {e}")
+                borders = None
+                scheduler.mark_dirty()
 
-            glDisable(GL_TEXTURE_2D)
-            draw_atmosphere(2.5)
-
-            glEnable(GL_TEXTURE_2D)
-            glBindTexture(GL_TEXTURE_2D, earth_tex)
-            gluSphere(qobj, 2.5, 100, 100)
-            glBindTexture(GL_TEXTURE_2D, 0)
+            if not running or not visible or scheduler.time_until_next_frame() != 0:
+                continue
+            scheduler.begin_frame()
+            if scene.profiler:
+                profiler.begin_frame()
+            current_time = time.time() - start_time
+            now = time.perf_counter()
+            # Clamp so the first frame after an idle stretch does not jump.
+            frame_dt, last_frame_time = min(now - last_frame_time, 0.1), now
 
-            glDisable(GL_TEXTURE_2D)
-            draw_clouds(2.5, current_time)
+            # Any manual control takes over from a running flight.
+            if flight and (drag_to != drag_from or zoom_steps or yaw or pitch):
+                flight = None
+            if flight and not flight.step(frame_dt):
+                flight = None
+            if drag_from is not None and drag_to != drag_from:
+                camera.arcball(drag_from, drag_to)
+                drag_from = drag_to
+            if zoom_steps:
+                camera.zoom(zoom_steps)
+                zoom_steps = 0
+            if yaw:
+                camera.rotate((0, 1, 0), yaw * KEY_ROTATE_SPEED * frame_dt)
+            if pitch:
+                camera.rotate((1, 0, 0), pitch * KEY_ROTATE_SPEED * frame_dt)
 
+            if scene.profiler:
+                profiler.lap('update')
+            scene.draw(camera, current_time)
+            if hud:
+                hud.draw(camera.width, camera.height)
+                profiler.lap('hud')
             pygame.display.flip()
-            pygame.time.wait(10)
+            if scene.profiler:
+                profiler.lap('flip')
+                profiler.end_frame()
+                if perf_log and now - last_export >= PERF_EXPORT_INTERVAL:
+                    profiler.export(perf_log)
+                    last_export = now
 
+        if perf_log:
+            profiler.export(perf_log)
+        loader.shutdown()
+        point_pool.shutdown(wait=False)
+        if tile_streamer:
+            tile_streamer.shutdown()
         pygame.quit()
 
     except Exception as e:
@@ -0,0 +1,130 @@
+"""
+The globe window in a dedicated, pre-warmed process.
+
+GlobeProcess.start() spawns a process that opens a hidden globe window,
+creates the GL context and makes every texture resident, then waits for
+commands over a pipe:
+
+    ('show', target)   show the window and fly to a continent or (lat, lon)
+    ('hide',)          minimise the window and stop rendering
+    ('quit',)          close the window and exit
+
+The process answers ('ready',) once it is warm and ('hidden',) whenever the
+user closes the window, which only minimises it so the next launch is instant.
+If the process dies it is started again by the next command, unless it died
+before it was ever ready: a globe that cannot warm up (no GL context, say)
+would only fail again, so it stays down until start() is called explicitly.
+Pygame and OpenGL get their own main thread and GIL this way instead of
+running on a thread of the launcher.
+"""
+
+import os
+import threading
+import multiprocessing
+
+def _run(conn, options):
+    # Textures are loaded relative to the globe's directory.
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    import globe
+    globe.main(commands=conn, start_hidden=True, **options)
+
+class GlobeProcess:
+    """Parent-side handle of the globe process.
+
+    `on_ready` is called once the globe is warm, `on_hidden` when the user
+    closes the globe window, `on_error(message)` when the process dies without
+    being asked to quit and `on_exit` when the process ends; all run on a
+    listener thread.
+    """
+
+    def __init__(self, on_ready=None, on_hidden=None, on_exit=None, on_error=None, **options):
+        self.on_ready = on_ready
+        self.on_hidden = on_hidden
+        self.on_exit = on_exit
+        self.on_error = on_error
+        self.options = options
+        self.ready = threading.Event()
+        self.process = None
+        self.conn = None
+        self.exitcode = None
+        self.error = None  # why the last process died, if it was not asked to quit
+        self.failed = False  # the last process died before it was ever ready
+        self._quitting = False
+        self._send_lock = threading.Lock()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        """Spawn and start warming up the globe process; returns immediately."""
+        if self.alive:
+            return
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.ready.clear()
+        self.exitcode = self.error = None
+        self.failed = self._quitting = False
+        self.process = context.Process(target=_run, args=(child_conn, self.options),
+                                       name='globe', daemon=True)
+        self.process.start()
+        child_conn.close()
+        threading.Thread(target=self._listen, args=(self.conn, self.process), name='globe-listener',
+                         daemon=True).start()
+
+    def _listen(self, conn, process):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == 'ready':
+                self.ready.set()
+                if self.on_ready:
+                    self.on_ready()
+            elif message[0] == 'hidden' and self.on_hidden:
+                self.on_hidden()
+        was_ready = self.ready.is_set()
+        self.ready.clear()
+        process.join(1.0)
+        self.exitcode = process.exitcode
+        if not self._quitting:
+            self.failed = not was_ready
+            self.error = (f"Globe process exited with code {self.exitcode}"
+                          + ("" if was_ready else " before it was ready"))
+            print(f"[GlobeProcess] {self.error}")
+            if self.on_error:
+                self.on_error(self.error)
+        if self.on_exit:
+            self.on_exit()
+
+    def _send(self, *message):
+        if not self.alive:
+            if self.failed:
+                raise RuntimeError(self.error)
+            self.start()
+        with self._send_lock:
+            # Commands sent during warm-up queue in the pipe until the globe is ready.
+            self.conn.send(message)
+
+    def show(self, target=None):
+        """Show the globe, flying to `target` (a continent name or (lat, lon)) if given."""
+        self._send('show', target)
+
+    def hide(self):
+        self._send('hide')
+
+    def quit(self, timeout=5.0):
+        """Ask the process to exit, terminating it if it does not within `timeout`."""
+        if not self.alive:
+            return
+        self._quitting = True
+        try:
+            with self._send_lock:
+                self.conn.send(('quit',))
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
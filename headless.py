@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Offscreen rendering of the globe without a window.
+
+A GL context is created through EGL (the default; with Mesa it needs no
+display or GPU) or OSMesa (PYOPENGL_PLATFORM=osmesa), and frames are drawn
+into a framebuffer object and read back as NumPy arrays:
+
+    import headless                  # before anything imports OpenGL
+    from globe import Camera, fly_to
+    camera = Camera()
+    fly_to(camera, 'africa', duration=0).step(0)
+    image = headless.render_frame(camera, (512, 512))   # (512, 512, 3) uint8
+
+PyOpenGL picks its platform when OpenGL is first imported, so this module
+must be imported before globe (or anything else using OpenGL).
+
+The command line renders a batch of views across a process pool, one GL
+context per worker:
+
+    python headless.py --out thumbnails --sizes 512x512,256x256
+"""
+
+import os
+import sys
+import ctypes
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+if os.environ['PYOPENGL_PLATFORM'] == 'egl':
+    # Lets Mesa create a display without X11 or Wayland.
+    os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+import numpy as np
+from OpenGL.GL import *
+
+import globe
+from globe import Camera, GlobeScene, TextureLoader, CONTINENT_VIEWS
+
+# ------------------ Context ------------------
+
+class HeadlessContext:
+    """A windowless GL context with an RGBA8 + depth framebuffer object bound."""
+
+    def __init__(self, width, height):
+        self.platform = os.environ['PYOPENGL_PLATFORM']
+        if self.platform == 'egl':
+            self._create_egl()
+        elif self.platform == 'osmesa':
+            self._create_osmesa(width, height)
+        else:
+            raise RuntimeError(f"Headless rendering needs PYOPENGL_PLATFORM=egl or osmesa, "
+                               f"not '{self.platform}'")
+        self.fbo = None
+        self.width = self.height = 0
+        self.resize(width, height)
+
+    def _create_egl(self):
+        from OpenGL import EGL
+        self._egl = EGL
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("eglInitialize failed")
+        attributes = (EGL.EGLint * 13)(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+            EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config, count = EGL.EGLConfig(), EGL.EGLint()
+        if not EGL.eglChooseConfig(self.display, attributes, ctypes.pointer(config), 1,
+                                   ctypes.pointer(count)) or count.value == 0:
+            raise RuntimeError("No suitable EGL config")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, None)
+        if not self.context:
+            raise RuntimeError("eglCreateContext failed")
+        # Rendering goes to our own FBO, so no surface is needed.
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context)
+
+    def _create_osmesa(self, width, height):
+        from OpenGL import arrays, osmesa
+        self._osmesa = osmesa
+        self.context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not self.context:
+            raise RuntimeError("OSMesaCreateContextExt failed")
+        # OSMesa needs a bound buffer even though drawing happens in the FBO.
+        self._osmesa_buffer = arrays.GLubyteArray.zeros((1, 1, 4))
+        osmesa.OSMesaMakeCurrent(self.context, self._osmesa_buffer, GL_UNSIGNED_BYTE, 1, 1)
+
+    def resize(self, width, height):
+        """(Re)allocate the framebuffer for `width` x `height` frames."""
+        if (width, height) == (self.width, self.height):
+            return
+        self._delete_fbo()
+        self.width, self.height = width, height
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        self.color, self.depth = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Incomplete framebuffer for {width}x{height}")
+
+    def read_pixels(self):
+        """The framebuffer as a (height, width, 3) uint8 array, top row first."""
+        glFinish()
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)[::-1].copy()
+
+    def _delete_fbo(self):
+        if self.fbo is not None:
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
+            glDeleteRenderbuffers(2, [self.color, self.depth])
+            glDeleteFramebuffers(1, [self.fbo])
+            self.fbo = None
+
+    def close(self):
+        self._delete_fbo()
+        if self.platform == 'egl':
+            EGL = self._egl
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.display, self.context)
+            EGL.eglTerminate(self.display)
+        else:
+            self._osmesa.OSMesaDestroyContext(self.context)
+
+# ------------------ Rendering ------------------
+
+class HeadlessRenderer:
+    """A HeadlessContext plus a fully loaded GlobeScene, ready for render_frame()."""
+
+    def __init__(self, size=(512, 512), earth_path='world.jpg', galaxy_path='galaxy.jpg'):
+        self.context = HeadlessContext(*size)
+        camera = Camera()
+        camera.set_viewport(*size)
+        loader = TextureLoader()
+        earth = loader.load(earth_path, fallback=globe.earth_fallback_texture)
+        # Unlike the window there is nothing to show meanwhile, so wait for the real texture.
+        loader.wait()
+        loader.shutdown()
+        self.scene = GlobeScene(camera, earth, globe.load_galaxy_texture(galaxy_path))
+
+    def render_frame(self, camera, size=None, time_offset=0.0):
+        """Render `camera`'s view at `size` (width, height; default: the camera's viewport)."""
+        width, height = size or (camera.width, camera.height)
+        self.context.resize(width, height)
+        self.scene.resize(camera, width, height)
+        self.scene.draw(camera, time_offset)
+        return self.context.read_pixels()
+
+    def close(self):
+        self.scene.delete()
+        self.context.close()
+
+_renderer = None
+
+def get_renderer():
+    """The process-wide renderer, created on first use (one GL context per process)."""
+    global _renderer
+    if _renderer is None:
+        _renderer = HeadlessRenderer()
+    return _renderer
+
+def render_frame(camera, size=(512, 512), time_offset=0.0):
+    """Render the globe as seen by `camera` into a (height, width, 3) uint8 array.
+
+    Note that the camera's viewport is set to `size`.
+    """
+    return get_renderer().render_frame(camera, size, time_offset)
+
+# ------------------ Batch CLI ------------------
+
+def save_image(image, path):
+    import pygame
+    height, width = image.shape[:2]
+    pygame.image.save(pygame.image.frombuffer(image.tobytes(), (width, height), 'RGB'), path)
+
+def render_view(view, size, out_dir):
+    """Pool task: render the named CONTINENT_VIEWS entry at `size` and save it as PNG."""
+    camera = Camera()
+    camera.set_viewport(*size)
+    globe.fly_to(camera, view, duration=0).step(0.0)
+    path = os.path.join(out_dir, f"{view}-{size[0]}x{size[1]}.png")
+    save_image(render_frame(camera, size), path)
+    return path
+
+def _init_worker():
+    get_renderer()
+
+def parse_size(text):
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height or width)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render globe views to PNG files without a window.")
+    parser.add_argument('--out', default='thumbnails', help="output directory")
+    parser.add_argument('--views', default=','.join(CONTINENT_VIEWS),
+                        help="comma-separated continent names (default: all)")
+    parser.add_argument('--sizes', default='512x512', help="comma-separated WIDTHxHEIGHT list")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help="worker processes, each with its own GL context")
+    args = parser.parse_args(argv)
+
+    views = [view.strip() for view in args.views.split(',') if view.strip()]
+    unknown = [view for view in views if view not in CONTINENT_VIEWS]
+    if unknown:
+        parser.error(f"unknown views: {', '.join(unknown)}")
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    os.makedirs(args.out, exist_ok=True)
+
+    jobs = [(view, size) for view in views for size in sizes]
+    # Spawned workers start clean, so no GL or threading state is inherited.
+    with ProcessPoolExecutor(max_workers=max(1, args.workers),
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker) as pool:
+        futures = [pool.submit(render_view, view, size, args.out) for view, size in jobs]
+        for future in futures:
+            print(future.result())
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
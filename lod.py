@@ -0,0 +1,288 @@
+"""
+Chunked level-of-detail mesh for the Earth.
+
+The sphere is cut into the same equirectangular quadtree tiles.py uses for
+imagery: level L has 2**(L+1) x 2**L patches, each a PATCH_SEGMENTS grid
+carrying its share of the whole-Earth texture coordinates, so the base
+texture maps exactly as on SphereMesh. Every frame the tree is descended
+from level 0 with the camera state: patches beyond the horizon or outside
+the view frustum are dropped, and a patch is split while the sag of its
+chords below the sphere (its geometric error) would cover more than
+`max_error` pixels on screen. A skirt hangs below every patch edge to hide
+the cracks where it meets a coarser neighbour.
+
+Patches live in fixed-size slots of one vertex buffer and are uploaded
+once; the selected slots are drawn with one glDrawElements call whose
+index buffer is rebuilt only when the selection changes.
+"""
+
+import ctypes
+from collections import OrderedDict
+
+import numpy as np
+from OpenGL.GL import *
+
+from globe import uv_to_xyz
+
+PATCH_SEGMENTS = 16
+MAX_LEVEL = 8
+MAX_ERROR = 0.5   # pixels of geometric error tolerated before a patch is split
+EDGE_SAMPLES = 9  # points per patch edge used for the bounding cone
+PATCH_VERTICES = (PATCH_SEGMENTS + 1) ** 2 + 4 * (PATCH_SEGMENTS + 1)
+STRIDE = 8 * 4  # bytes per vertex: position, normal, texcoord
+
+# ------------------ Patch geometry ------------------
+
+def patch_bounds(level, x, y):
+    """Texture-space bounds (s0, t0, s1, t1) of a patch, as tiles.tile_bounds()."""
+    rows, cols = 2 ** level, 2 ** (level + 1)
+    return x / cols, y / rows, (x + 1) / cols, (y + 1) / rows
+
+def patch_error(level, radius, segments=PATCH_SEGMENTS):
+    """Largest distance between a patch's chords and the sphere (its geometric error)."""
+    step = np.pi / 2 ** level / segments
+    return radius * (1.0 - np.cos(step / 2))
+
+def skirt_depth(level, radius, segments=PATCH_SEGMENTS):
+    """How far a patch's skirt hangs below the sphere: the error of a patch two levels up,
+    so cracks against neighbours up to two levels coarser are covered."""
+    return patch_error(max(level - 2, 0), radius, segments)
+
+def patch_vertices(level, x, y, radius, segments=PATCH_SEGMENTS):
+    """Interleaved float32 (position, normal, texcoord) grid of a patch followed by its skirt.
+
+    Rows run from the patch's +z edge towards -z and columns towards +s,
+    the order SphereMesh uses, so the triangles wind the same way.
+    """
+    s0, t0, s1, t1 = patch_bounds(level, x, y)
+    s = np.linspace(s0, s1, segments + 1)
+    t = np.linspace(t1, t0, segments + 1)[:, None]
+    normals = uv_to_xyz(s, t)
+    uv = np.stack(np.broadcast_arrays(s, t), axis=-1)
+    grid = np.concatenate([normals * radius, normals, uv], axis=-1)
+
+    # The skirt repeats the border (top, right, bottom, left) lowered towards the centre.
+    border = np.concatenate([grid[0], grid[:, -1], grid[-1, ::-1], grid[::-1, 0]])
+    border = border.reshape(4, segments + 1, 8).copy()
+    border[..., :3] *= 1.0 - skirt_depth(level, radius, segments) / radius
+    return np.ascontiguousarray(np.concatenate([grid.reshape(-1, 8), border.reshape(-1, 8)]),
+                                dtype=np.float32)
+
+def patch_indices(segments=PATCH_SEGMENTS):
+    """Triangle indices of one patch from patch_vertices(): the grid, then the skirts."""
+    row = segments + 1
+    top = (np.arange(segments)[:, None] * row + np.arange(segments)).ravel()
+    bottom = top + row
+    quads = [np.stack([top, bottom, bottom + 1, top, bottom + 1, top + 1], axis=1).ravel()]
+
+    # Border vertex indices in the same order as the skirt rows in patch_vertices().
+    grid = np.arange(row * row).reshape(row, row)
+    border = np.concatenate([grid[0], grid[:, -1], grid[-1, ::-1], grid[::-1, 0]]).reshape(4, row)
+    skirt = row * row + np.arange(4 * row).reshape(4, row)
+    for edge, lowered in zip(border, skirt):
+        a, b = edge[:-1], edge[1:]
+        c, d = lowered[:-1], lowered[1:]
+        # The border runs counter-clockwise seen from outside, so (a, d, c) faces out of the patch.
+        quads.append(np.stack([a, d, c, a, b, d], axis=1).ravel())
+    return np.concatenate(quads).astype(np.uint32)
+
+# ------------------ Selection ------------------
+
+def _patch_cones(level, patches):
+    """Centre directions (k, 3) and angular radii (k,) of bounding cones around patches."""
+    rows, cols = 2 ** level, 2 ** (level + 1)
+    x, y = patches[:, 0, None], patches[:, 1, None]
+    steps = np.linspace(0.0, 1.0, EDGE_SAMPLES)
+    zeros, ones = np.zeros_like(steps), np.ones_like(steps)
+    # Around the border: the farthest point of a patch from its centre lies on it.
+    u = np.concatenate([steps, ones, steps[::-1], zeros])
+    v = np.concatenate([zeros, steps, ones, steps[::-1]])
+    border = uv_to_xyz((x + u) / cols, (y + v) / rows)
+    centres = uv_to_xyz((x[:, 0] + 0.5) / cols, (y[:, 0] + 0.5) / rows)
+    cos_angles = np.einsum('kni,ki->kn', border, centres)
+    return centres, np.arccos(np.clip(cos_angles.min(axis=1), -1.0, 1.0))
+
+def frustum_planes(matrix):
+    """The six clip planes (a, b, c, d) of a projection * view matrix, normalised."""
+    planes = np.array([matrix[3] + matrix[0], matrix[3] - matrix[0],
+                       matrix[3] + matrix[1], matrix[3] - matrix[1],
+                       matrix[3] + matrix[2], matrix[3] - matrix[2]])
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+def _view_state(camera, radius):
+    """Eye position, its distance, its direction and the frustum planes, in globe coordinates,
+    plus the half-angle of the cap of the sphere visible from the eye."""
+    eye = camera.eye_position()
+    distance = np.linalg.norm(eye)
+    horizon = np.arccos(min(radius / distance, 1.0))
+    planes = frustum_planes(camera.projection_matrix() @ camera.view_matrix())
+    return eye, distance, eye / distance, horizon, planes
+
+def _cull(view, level, patches, radius, depth=0.0, height=0.0):
+    """Visibility of candidate patches, with their centres, cone angles and angles to the eye.
+
+    `depth` is how far the patch's geometry reaches below the sphere and
+    `height` how far above it, for the frustum test and the horizon.
+    """
+    _, _, eye_dir, horizon, planes = view
+    centres, cone = _patch_cones(level, patches)
+    to_eye = np.arccos(np.clip(centres @ eye_dir, -1.0, 1.0))
+    # Points above the surface stay visible a little past the horizon.
+    beyond = np.arccos(radius / (radius + height)) if height > 0 else 0.0
+    visible = to_eye <= cone + horizon + beyond
+
+    # A ball around the patch's centre holding its surface (chord length) and whatever hangs off it.
+    ball = 2 * radius * np.sin(np.minimum(cone, np.pi) / 2) + depth + height
+    centre_points = np.concatenate([centres * radius, np.ones((len(centres), 1))], axis=1)
+    visible &= (centre_points @ planes.T >= -ball[:, None]).all(axis=1)
+    return visible, centres, cone, to_eye
+
+def visible_patches(camera, radius, level, height=0.0):
+    """Boolean (rows, cols) mask of the patches of `level` that may be on screen.
+
+    `height` widens the test for things drawn that far above the surface.
+    """
+    rows, cols = 2 ** level, 2 ** (level + 1)
+    patches = np.stack(np.meshgrid(np.arange(cols), np.arange(rows)), axis=-1).reshape(-1, 2)
+    visible = _cull(_view_state(camera, radius), level, patches, radius, height=height)[0]
+    return visible.reshape(rows, cols)
+
+def select_patches(camera, radius, max_error=MAX_ERROR, max_level=MAX_LEVEL,
+                   segments=PATCH_SEGMENTS):
+    """(level, x, y) of the patches to draw for `camera`, coarsest first.
+
+    Descends the quadtree from level 0, dropping patches behind the horizon
+    or outside the frustum and splitting those whose geometric error would
+    exceed `max_error` pixels at their nearest point to the eye.
+    """
+    view = _view_state(camera, radius)
+    distance = view[1]
+    pixels_per_unit = camera.height / 2.0 / np.tan(np.radians(camera.fov) / 2)
+
+    selected = []
+    patches = np.array([[0, 0], [1, 0]])
+    for level in range(max_level + 1):
+        visible, centres, cone, to_eye = _cull(view, level, patches, radius,
+                                               depth=skirt_depth(level, radius, segments))
+        patches, cone, to_eye = patches[visible], cone[visible], to_eye[visible]
+        if not len(patches):
+            break
+
+        # Nearest point of the patch to the eye, from the angle between them.
+        nearest = np.maximum(to_eye - cone, 0.0)
+        gap = np.sqrt(np.maximum(distance ** 2 + radius ** 2 - 2 * distance * radius * np.cos(nearest), 0.0))
+        error = patch_error(level, radius, segments) * pixels_per_unit / np.maximum(gap, camera.near)
+        split = error > max_error if level < max_level else np.zeros(len(patches), dtype=bool)
+
+        selected += [(level, x, y) for x, y in patches[~split].tolist()]
+        parents = patches[split]
+        patches = np.stack([2 * parents[:, 0] + np.array([[0], [1], [0], [1]]),
+                            2 * parents[:, 1] + np.array([[0], [0], [1], [1]])], axis=-1).reshape(-1, 2)
+        if not len(patches):
+            break
+    return selected
+
+# ------------------ Drawing ------------------
+
+class QuadtreeGlobe:
+    """The Earth as screen-space-error LOD patches, drawn in one call.
+
+    draw(camera) selects patches with select_patches(), uploads the new ones
+    into free slots of the vertex buffer (recycling the least recently drawn
+    slots) and draws the selection. Texturing and material are set by the
+    caller, as for SphereMesh.draw().
+    """
+
+    def __init__(self, radius, max_error=MAX_ERROR, max_level=MAX_LEVEL, capacity=512):
+        self.radius = radius
+        self.max_error = max_error
+        self.max_level = max_level
+        self.capacity = capacity
+        self.patch_indices = patch_indices()
+        self.vbo = None
+        self.ibo = None
+        self.index_count = 0
+        self.selection = []
+        self._slots = OrderedDict()  # (level, x, y) -> slot, in LRU order
+        self._view_key = None
+
+    def _allocate(self):
+        """Create (or, when the selection outgrows it, double) the vertex buffer; empties every slot."""
+        if self.vbo is None:
+            self.vbo, self.ibo = glGenBuffers(2)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.capacity * PATCH_VERTICES * STRIDE, None, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self._slots.clear()
+
+    def _slot(self, key, keep):
+        """Slot holding patch `key`, uploading it into a free or recycled slot first."""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+        if len(self._slots) < self.capacity:
+            slot = len(self._slots)
+        else:
+            old = next(k for k in self._slots if k not in keep)
+            slot = self._slots.pop(old)
+        glBufferSubData(GL_ARRAY_BUFFER, slot * PATCH_VERTICES * STRIDE, PATCH_VERTICES * STRIDE,
+                        patch_vertices(*key, self.radius))
+        self._slots[key] = slot
+        return slot
+
+    def update(self, camera):
+        """Select the patches for `camera` and rebuild the index buffer if the selection changed."""
+        view_key = (tuple(np.round(camera.orientation, 6)), round(camera.distance, 6),
+                    camera.width, camera.height, camera.fov)
+        if view_key == self._view_key:
+            return
+        self._view_key = view_key
+        selection = select_patches(camera, self.radius, self.max_error, self.max_level)
+        if selection == self.selection:
+            return
+        self.selection = selection
+
+        if self.vbo is None or len(selection) > self.capacity:
+            while len(selection) > self.capacity:
+                self.capacity *= 2
+            self._allocate()
+        keep = set(selection)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        slots = np.array([self._slot(key, keep) for key in selection], dtype=np.uint32)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        indices = (self.patch_indices[None, :] + (slots * PATCH_VERTICES)[:, None]).ravel()
+        self.index_count = len(indices)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, np.ascontiguousarray(indices),
+                     GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def draw(self, camera):
+        self.update(camera)
+        if not self.index_count:
+            return
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(3, GL_FLOAT, STRIDE, ctypes.c_void_p(0))
+        glNormalPointer(GL_FLOAT, STRIDE, ctypes.c_void_p(12))
+        glTexCoordPointer(2, GL_FLOAT, STRIDE, ctypes.c_void_p(24))
+        glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(2, [self.vbo, self.ibo])
+            self.vbo = self.ibo = None
+            self._slots.clear()
+            self.selection = []
+            self.index_count = 0
+            self._view_key = None
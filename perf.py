@@ -0,0 +1,223 @@
+"""
+Frame instrumentation for the globe: per-layer CPU time, GL call counts and
+FPS, with an optional on-screen overlay and CSV/JSON export.
+
+GlobeScene calls FrameProfiler.lap() between layers only while a profiler is
+attached, and the GL call counters are installed by wrapping the GL entry
+points of the drawing modules on enable() and removed again on disable(), so
+a detached or disabled profiler costs nothing per frame.
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import time
+from collections import deque
+
+import pygame
+from OpenGL.GL import *
+
+# Per-frame CPU time buckets, in frame order. Layers a frame skips stay at 0.
+LAYERS = ('update', 'clear', 'skybox', 'background', 'nebula', 'stars', 'atmosphere',
+          'earth', 'tiles', 'borders', 'points', 'clouds', 'hud', 'flip')
+COLUMNS = ('interval_ms', 'cpu_ms') + tuple(f'{layer}_ms' for layer in LAYERS) + (
+    'draw_calls', 'state_changes')
+_LAYER_COLUMN = {layer: COLUMNS.index(f'{layer}_ms') for layer in LAYERS}
+
+DRAW_FUNCTIONS = ('glDrawArrays', 'glDrawElements', 'glMultiDrawArrays', 'glBegin')
+STATE_FUNCTIONS = ('glEnable', 'glDisable', 'glBindTexture', 'glBindBuffer', 'glBlendFunc',
+                   'glDepthMask', 'glMaterialfv', 'glLoadMatrixf', 'glMatrixMode', 'glPointSize',
+                   'glEnableClientState', 'glDisableClientState', 'glPushAttrib', 'glPopAttrib')
+# Modules whose GL calls are counted (the ones drawing frame layers).
+COUNTED_MODULES = ('globe', 'tiles', 'lod', 'borders', 'points')
+
+class FrameProfiler:
+    """Rolling per-frame timings and GL call counts.
+
+    Per frame: begin_frame(), lap(layer) after each layer (the time since the
+    previous lap is charged to `layer`), then end_frame(). The last `history`
+    frames are kept for the overlay and for export().
+    """
+
+    def __init__(self, history=1000, clock=time.perf_counter):
+        self.clock = clock
+        self.frames = deque(maxlen=history)
+        self.enabled = False
+        self._counts = [0, 0]  # draw calls, state changes
+        self._patched = []
+        self._row = None
+        self._frame_start = self._last_lap = self._previous_start = None
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        counts = self._counts
+        for name in COUNTED_MODULES:
+            module = sys.modules.get(name)
+            if module is None:
+                continue
+            for functions, slot in ((DRAW_FUNCTIONS, 0), (STATE_FUNCTIONS, 1)):
+                for function in functions:
+                    original = getattr(module, function, None)
+                    if original is not None:
+                        setattr(module, function, _counting(original, counts, slot))
+                        self._patched.append((module, function, original))
+
+    def disable(self):
+        for module, function, original in self._patched:
+            setattr(module, function, original)
+        self._patched = []
+        self.enabled = False
+        self._row = None
+        self._previous_start = None
+
+    def begin_frame(self):
+        now = self.clock()
+        self._row = [0.0] * len(COLUMNS)
+        if self._previous_start is not None:
+            self._row[0] = (now - self._previous_start) * 1000.0
+        self._previous_start = self._frame_start = self._last_lap = now
+        self._counts[0] = self._counts[1] = 0
+
+    def lap(self, layer):
+        now = self.clock()
+        self._row[_LAYER_COLUMN[layer]] += (now - self._last_lap) * 1000.0
+        self._last_lap = now
+
+    def end_frame(self):
+        row = self._row
+        row[1] = (self.clock() - self._frame_start) * 1000.0
+        row[-2], row[-1] = self._counts
+        self.frames.append(row)
+        self._row = None
+
+    def summary(self):
+        """FPS, 1% low FPS, mean per-layer milliseconds and the last frame's GL counts."""
+        intervals = sorted(row[0] for row in self.frames if row[0] > 0)
+        if not intervals:
+            return None
+        worst = intervals[-max(1, math.ceil(len(intervals) / 100)):]
+        count = len(self.frames)
+        return {
+            'frames': count,
+            'fps': 1000.0 * len(intervals) / sum(intervals),
+            'fps_1pct_low': 1000.0 * len(worst) / sum(worst),
+            'cpu_ms': sum(row[1] for row in self.frames) / count,
+            'layers_ms': {layer: sum(row[_LAYER_COLUMN[layer]] for row in self.frames) / count
+                          for layer in LAYERS},
+            'draw_calls': self.frames[-1][-2],
+            'state_changes': self.frames[-1][-1],
+        }
+
+    def export(self, path):
+        """Write the rolling window to `path`: CSV rows per frame, or JSON with a summary."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', newline='') as f:
+                if path.endswith('.json'):
+                    json.dump({'summary': self.summary(), 'columns': COLUMNS,
+                               'frames': list(self.frames)}, f)
+                else:
+                    writer = csv.writer(f)
+                    writer.writerow(COLUMNS)
+                    writer.writerows(self.frames)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[FrameProfiler] Could not write '{path}': {e}")
+
+def _counting(function, counts, slot):
+    def wrapper(*args):
+        counts[slot] += 1
+        return function(*args)
+    return wrapper
+
+class PerfHud:
+    """Text overlay of a FrameProfiler's summary in the top-left corner.
+
+    The text is re-rendered into a texture a few times per second, so the
+    overlay costs one textured quad on the other frames.
+    """
+
+    def __init__(self, profiler, refresh=0.25):
+        self.profiler = profiler
+        self.refresh = refresh
+        self.font = None
+        self.texture = None
+        self.size = (0, 0)
+        self.updated = -math.inf
+
+    def _text(self):
+        summary = self.profiler.summary()
+        if summary is None:
+            return ["collecting..."]
+        lines = [f"{summary['fps']:5.1f} fps  1% low {summary['fps_1pct_low']:5.1f}  "
+                 f"cpu {summary['cpu_ms']:5.2f} ms",
+                 f"draws {summary['draw_calls']}  state changes {summary['state_changes']}"]
+        lines += [f"{layer:>10} {ms:6.2f} ms" for layer, ms in summary['layers_ms'].items() if ms > 0.005]
+        return lines
+
+    def _render_text(self):
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 18)
+        lines = [self.font.render(line, True, (230, 255, 230)) for line in self._text()]
+        width = max(line.get_width() for line in lines) + 8
+        height = sum(line.get_height() for line in lines) + 8
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        y = 4
+        for line in lines:
+            surface.blit(line, (4, y))
+            y += line.get_height()
+        if self.texture is None:
+            self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                     pygame.image.tostring(surface, 'RGBA', True))
+        glBindTexture(GL_TEXTURE_2D, 0)
+        self.size = (width, height)
+
+    def draw(self, viewport_width, viewport_height):
+        now = time.perf_counter()
+        if now - self.updated >= self.refresh:
+            self._render_text()
+            self.updated = now
+        width, height = self.size
+        glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT)
+        glDisable(GL_LIGHTING)
+        glDisable(GL_DEPTH_TEST)
+        glEnable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, viewport_width, 0, viewport_height, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        glColor4f(1, 1, 1, 1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        top = viewport_height - 8
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0); glVertex2f(8, top - height)
+        glTexCoord2f(1, 0); glVertex2f(8 + width, top - height)
+        glTexCoord2f(1, 1); glVertex2f(8 + width, top)
+        glTexCoord2f(0, 1); glVertex2f(8, top)
+        glEnd()
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPopAttrib()
+
+    def delete(self):
+        if self.texture is not None:
+            glDeleteTextures([self.texture])
+            self.texture = None
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Large point datasets on the globe: cities, stations, quiz targets.
+
+A PointLayer takes NumPy arrays of latitude, longitude and an optional
+value and size per point, or streams them from a CSV or Parquet file in
+chunks. Positions are converted to XYZ in one vectorised call and values
+are mapped through a colormap. Everything lives in three GPU buffers
+(position, colour, size).
+
+The CPU arrays are the source of truth. extend() and update() may run on
+any thread: they only change those arrays and record which ranges are
+dirty. draw() runs on the GL thread and uploads just those ranges with
+glBufferSubData, so changing a thousand points of a million moves a
+thousand points' worth of bytes. Every appended chunk is stored grouped by
+spatial cell, so draw() skips the cells behind the horizon or outside the
+view with one glMultiDrawArrays call. With GLSL every point has its own
+size; without it the layer falls back to one size for all points.
+
+index() keeps a spatial.SphereIndex of the points for nearest and radius
+queries, such as the globe's hover picking; refresh_index() rebuilds it on a
+worker after points are added or moved. Files loaded with load_file()
+cache their index next to the other globe caches.
+
+Plot a CSV with lat, lon and value columns:
+    python points.py stations.csv --value temperature
+"""
+
+import os
+import sys
+import csv
+import ctypes
+import hashlib
+import argparse
+import threading
+
+import numpy as np
+from OpenGL.GL import *
+
+from globe import CACHE_DIR, EARTH_RADIUS, latlon_to_xyz, xyz_to_latlon
+from lod import visible_patches
+from spatial import INDEX_VERSION, SphereIndex
+
+# Points float just above the surface so they win the depth test against it.
+POINT_RADIUS_SCALE = 1.002
+DEFAULT_SIZE = 4.0
+DEFAULT_COLOR = (1.0, 0.8, 0.2, 1.0)  # points without a value
+CHUNK_ROWS = 100_000
+# Scattered updates whose buffer slots are closer than this are uploaded as one range.
+RUN_GAP = 256
+# Points are grouped by the lod.py quadtree patch of this level they fall in
+# (16 x 8 cells), so cells behind the horizon or off screen are skipped.
+CELL_LEVEL = 3
+
+# Colormap anchors from low to high, interpolated into a 256-entry table.
+COLORMAPS = {
+    'viridis': [(0.267, 0.005, 0.329), (0.283, 0.141, 0.458), (0.254, 0.265, 0.530),
+                (0.207, 0.372, 0.553), (0.164, 0.471, 0.558), (0.128, 0.567, 0.551),
+                (0.135, 0.659, 0.518), (0.267, 0.749, 0.441), (0.478, 0.821, 0.318),
+                (0.741, 0.873, 0.150), (0.993, 0.906, 0.144)],
+    'plasma': [(0.050, 0.030, 0.528), (0.294, 0.012, 0.615), (0.492, 0.012, 0.658),
+               (0.665, 0.139, 0.585), (0.798, 0.280, 0.470), (0.899, 0.411, 0.357),
+               (0.973, 0.558, 0.248), (0.994, 0.726, 0.145), (0.940, 0.975, 0.131)],
+    'heat': [(0.0, 0.0, 0.0), (0.8, 0.0, 0.0), (1.0, 0.6, 0.0), (1.0, 1.0, 0.4), (1.0, 1.0, 1.0)],
+    'cool-warm': [(0.230, 0.299, 0.754), (0.865, 0.865, 0.865), (0.706, 0.016, 0.150)],
+}
+
+POINT_VERTEX_SHADER = """
+#version 120
+attribute float size;
+
+void main() {
+    gl_Position = ftransform();
+    gl_FrontColor = gl_Color;
+    gl_PointSize = size;
+}
+"""
+
+POINT_FRAGMENT_SHADER = """
+#version 120
+
+void main() {
+    // Round points with a one-pixel-ish soft edge.
+    vec2 d = gl_PointCoord * 2.0 - 1.0;
+    float r2 = dot(d, d);
+    if (r2 > 1.0)
+        discard;
+    gl_FragColor = vec4(gl_Color.rgb, gl_Color.a * clamp((1.0 - r2) * 4.0, 0.0, 1.0));
+}
+"""
+
+def colormap_table(name, alpha=1.0):
+    """(256, 4) uint8 RGBA lookup table of a colormap in COLORMAPS."""
+    anchors = np.asarray(COLORMAPS[name], dtype=np.float64)
+    x = np.linspace(0.0, 1.0, len(anchors))
+    samples = np.linspace(0.0, 1.0, 256)
+    rgb = np.stack([np.interp(samples, x, anchors[:, channel]) for channel in range(3)], axis=1)
+    return np.round(np.hstack([rgb, np.full((256, 1), alpha)]) * 255).astype(np.uint8)
+
+def _ranges(indices, gap=RUN_GAP):
+    """Sorted indices as (start, stop) runs, merging runs separated by less than `gap`."""
+    indices = np.unique(indices)
+    if not len(indices):
+        return []
+    breaks = np.flatnonzero(np.diff(indices) > gap)
+    starts = np.concatenate([indices[:1], indices[breaks + 1]])
+    stops = np.concatenate([indices[breaks], indices[-1:]]) + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+def point_cells(lat, lon, level=CELL_LEVEL):
+    """Row-major index of the lod.py patch at `level` holding each lat/lon."""
+    rows, cols = 2 ** level, 2 ** (level + 1)
+    col = np.clip(((180.0 - lon) / 360.0 % 1.0 * cols).astype(np.intp), 0, cols - 1)
+    row = np.clip(((90.0 - lat) / 180.0 * rows).astype(np.intp), 0, rows - 1)
+    return row * cols + col
+
+def point_index_path(path, lat, lon):
+    """Cache file of the SphereIndex for the points of a file."""
+    stat = os.stat(path)
+    key = hashlib.sha1(repr((os.path.abspath(path), stat.st_mtime_ns, stat.st_size, lat, lon,
+                             INDEX_VERSION)).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"points-{key}.npz")
+
+def _merge(spans, gap=RUN_GAP):
+    """(start, stop) spans sorted and merged where they overlap or are less than `gap` apart."""
+    merged = []
+    for start, stop in sorted(spans):
+        if merged and start - merged[-1][1] < gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+class PointLayer:
+    """Points at lat/lon on the globe with per-point colour (from a value) and size.
+
+    `value_range` fixes the values mapped to the ends of the colormap; when
+    None it follows the data and the colours are recomputed whenever the
+    range grows. Points with a NaN value get `color`.
+
+    Points keep the index they were added with; the buffers hold them in
+    slots sorted by cell within each appended chunk, and `slots` maps one
+    to the other.
+    """
+
+    BUFFERS = ('xyz', 'rgba', 'size')
+
+    def __init__(self, radius=EARTH_RADIUS, colormap='viridis', value_range=None, size=DEFAULT_SIZE,
+                 color=DEFAULT_COLOR, alpha=1.0, capacity=1024):
+        capacity = max(capacity, 1)
+        self.radius = radius
+        self.table = colormap_table(colormap, alpha)
+        self.fixed_range = value_range is not None
+        self.value_range = tuple(value_range) if value_range is not None else None
+        self.size = size
+        self.color = np.round(np.asarray(color, dtype=np.float64) * 255).astype(np.uint8)
+        self.count = 0
+        self.data = {'xyz': np.zeros((capacity, 3), np.float32), 'rgba': np.zeros((capacity, 4), np.uint8),
+                     'size': np.zeros(capacity, np.float32)}
+        self.values = np.zeros(capacity, np.float32)
+        self.slots = np.zeros(capacity, np.int64)
+        # One batch per cell per appended chunk: its cell and its slot range.
+        self._batch_cells = np.zeros(0, np.intp)
+        self._batch_firsts = np.zeros(0, np.int32)
+        self._batch_counts = np.zeros(0, np.int32)
+        self._lock = threading.Lock()
+        self._moves = 0  # position updates so far, to tell when the index is stale
+        self._index = None
+        self._index_stamp = None
+        self._index_build = None  # the Future of a rebuild started by refresh_index()
+        self._dirty = {name: [] for name in self.BUFFERS}
+        self._reallocate = True
+        self._buffers = None
+        self.program = None
+        self._size_attribute = -1
+        self._shader_checked = False
+
+    @classmethod
+    def from_arrays(cls, lat, lon, values=None, sizes=None, **options):
+        layer = cls(capacity=max(len(np.atleast_1d(lat)), 1), **options)
+        layer.extend(lat, lon, values, sizes)
+        return layer
+
+    @classmethod
+    def from_file(cls, path, lat='lat', lon='lon', value=None, size=None, chunk_rows=CHUNK_ROWS,
+                  **options):
+        """Layer filled from a CSV or Parquet file."""
+        layer = cls(**options)
+        layer.load_file(path, lat, lon, value, size, chunk_rows)
+        return layer
+
+    def load_file(self, path, lat='lat', lon='lon', value=None, size=None, chunk_rows=CHUNK_ROWS):
+        """Append the points of a CSV or Parquet file one chunk of rows at a time.
+
+        Safe to run on a worker thread while the layer is drawn: every chunk
+        shows up on the next frame. The spatial index is built (or read from
+        the cache) on this thread once the file is read.
+        """
+        cache_path = point_index_path(path, lat, lon) if self.count == 0 else None
+        for chunk in read_chunks(path, [lat, lon, value, size], chunk_rows):
+            self.extend(chunk[lat], chunk[lon], chunk.get(value), chunk.get(size))
+        if cache_path is None:
+            self.index()
+            return
+        try:
+            index = SphereIndex.load(cache_path)
+            with self._lock:
+                self._index, self._index_stamp = index, (self.count, self._moves)
+        except (OSError, ValueError, KeyError):
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                self.index().save(cache_path)
+            except OSError as e:
+                print(f"[PointLayer] Could not write index cache '{cache_path}': {e}")
+
+    @property
+    def dirty(self):
+        """True while changes are waiting for the next draw() to upload them."""
+        return self._reallocate or any(self._dirty.values())
+
+    # ------------------ CPU side ------------------
+
+    def _colours(self, values):
+        colours = np.empty((len(values), 4), np.uint8)
+        valid = np.isfinite(values)
+        low, high = self.value_range or (0.0, 1.0)
+        scaled = (values[valid] - low) / (high - low) if high > low else np.zeros(valid.sum())
+        colours[valid] = self.table[np.clip((scaled * 255).round(), 0, 255).astype(np.intp)]
+        colours[~valid] = self.color
+        return colours
+
+    def _grow(self, needed):
+        capacity = len(self.values)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, array in self.data.items():
+            grown = np.zeros((capacity,) + array.shape[1:], array.dtype)
+            grown[:self.count] = array[:self.count]
+            self.data[name] = grown
+        for name in ('values', 'slots'):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+        self._reallocate = True
+
+    def _widen_range(self, values):
+        """Grow an automatic value range to cover `values`; True if it changed."""
+        finite = values[np.isfinite(values)]
+        if self.fixed_range or not len(finite):
+            return False
+        low, high = float(finite.min()), float(finite.max())
+        if self.value_range is not None:
+            low, high = min(low, self.value_range[0]), max(high, self.value_range[1])
+        if (low, high) == self.value_range:
+            return False
+        self.value_range = (low, high)
+        return True
+
+    def extend(self, lat, lon, values=None, sizes=None):
+        """Append points; returns the slice of their indices."""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        n = len(lat)
+        values = (np.full(n, np.nan, np.float32) if values is None
+                  else np.broadcast_to(np.asarray(values, dtype=np.float32), (n,)))
+        sizes = np.broadcast_to(np.asarray(self.size if sizes is None else sizes, dtype=np.float32), (n,))
+        cells = point_cells(lat, lon)
+        order = np.argsort(cells, kind='stable')
+        cells = cells[order]
+        xyz = latlon_to_xyz(lat[order], lon[order]).astype(np.float32)
+        batch_cells, batch_starts, batch_counts = np.unique(cells, return_index=True, return_counts=True)
+        with self._lock:
+            start, stop = self.count, self.count + n
+            self._grow(stop)
+            self.slots[start + order] = np.arange(start, stop)
+            self.data['xyz'][start:stop] = xyz
+            self.data['size'][start:stop] = sizes[order]
+            self.values[start:stop] = values[order]
+            if self._widen_range(values):
+                start_colour = 0
+            else:
+                start_colour = start
+            self.data['rgba'][start_colour:stop] = self._colours(self.values[start_colour:stop])
+            self._batch_cells = np.concatenate([self._batch_cells, batch_cells])
+            self._batch_firsts = np.concatenate([self._batch_firsts, start + batch_starts]).astype(np.int32)
+            self._batch_counts = np.concatenate([self._batch_counts, batch_counts]).astype(np.int32)
+            self.count = stop
+            self._dirty['xyz'].append((start, stop))
+            self._dirty['size'].append((start, stop))
+            self._dirty['rgba'].append((start_colour, stop))
+        return slice(start, stop)
+
+    def update(self, indices, values=None, sizes=None, lat=None, lon=None):
+        """Change some points; only the buffer ranges holding them are uploaded again.
+
+        `indices` is a slice or an array of point indices; the other arguments
+        are arrays (or scalars) for those points. A point keeps its cell when
+        it moves, so moves should stay local (or be drawn from a new layer).
+        """
+        with self._lock:
+            slots = self.slots[:self.count][indices]
+            if not np.size(slots):
+                return
+            slots = np.atleast_1d(slots)
+            ranges = _ranges(slots)
+            if lat is not None or lon is not None:
+                if lat is None or lon is None:
+                    old_lat, old_lon = xyz_to_latlon(self.data['xyz'][slots])
+                    lat = old_lat if lat is None else lat
+                    lon = old_lon if lon is None else lon
+                self.data['xyz'][slots] = latlon_to_xyz(np.broadcast_to(lat, slots.shape),
+                                                        np.broadcast_to(lon, slots.shape))
+                self._dirty['xyz'] += ranges
+                self._moves += 1
+            if sizes is not None:
+                self.data['size'][slots] = sizes
+                self._dirty['size'] += ranges
+            if values is not None:
+                self.values[slots] = values
+                if self._widen_range(self.values[slots]):
+                    self.data['rgba'][:self.count] = self._colours(self.values[:self.count])
+                    self._dirty['rgba'].append((0, self.count))
+                else:
+                    self.data['rgba'][slots] = self._colours(self.values[slots])
+                    self._dirty['rgba'] += ranges
+
+    # ------------------ Queries ------------------
+
+    def index(self, build=True):
+        """spatial.SphereIndex of the points, whose ids are point indices.
+
+        Rebuilt when points were added or moved since the last build. With
+        build=False the last index is returned even if stale (None before
+        the first build), so a frame never waits for one.
+        """
+        with self._lock:
+            stamp = (self.count, self._moves)
+            if not build or stamp == self._index_stamp:
+                return self._index
+            xyz = self.data['xyz'][self.slots[:self.count]]
+        index = SphereIndex.build(xyz)
+        with self._lock:
+            if self._index_stamp is None or stamp > self._index_stamp:
+                self._index, self._index_stamp = index, stamp
+        return index
+
+    @property
+    def index_stale(self):
+        """True when points were added or moved since the index was last built."""
+        with self._lock:
+            return self._index_stamp != (self.count, self._moves)
+
+    def refresh_index(self, executor):
+        """Rebuild a stale index on `executor`, with at most one rebuild in flight."""
+        if self.index_stale and (self._index_build is None or self._index_build.done()):
+            self._index_build = executor.submit(self.index)
+
+    def point(self, index):
+        """(lat, lon, value) of the point with this index."""
+        with self._lock:
+            slot = self.slots[index]
+            lat, lon = xyz_to_latlon(self.data['xyz'][slot])
+            return float(lat), float(lon), float(self.values[slot])
+
+    # ------------------ GPU side ------------------
+
+    def _flush(self):
+        """Upload the dirty ranges (or everything, after the arrays grew). Needs the GL context."""
+        with self._lock:
+            dirty = {name: _merge(spans) for name, spans in self._dirty.items()}
+            self._dirty = {name: [] for name in self.BUFFERS}
+            reallocate, self._reallocate = self._reallocate, False
+            if self._buffers is None:
+                self._buffers = dict(zip(self.BUFFERS, glGenBuffers(len(self.BUFFERS))))
+            for name in self.BUFFERS:
+                array = self.data[name]
+                glBindBuffer(GL_ARRAY_BUFFER, self._buffers[name])
+                if reallocate:
+                    usage = GL_STATIC_DRAW if name == 'xyz' else GL_DYNAMIC_DRAW
+                    glBufferData(GL_ARRAY_BUFFER, array.nbytes, array, usage)
+                    continue
+                row = array.itemsize * int(np.prod(array.shape[1:], dtype=np.int64))
+                for start, stop in dirty[name]:
+                    glBufferSubData(GL_ARRAY_BUFFER, start * row, (stop - start) * row,
+                                    np.ascontiguousarray(array[start:stop]))
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            return self._batch_cells, self._batch_firsts, self._batch_counts
+
+    def _create_program(self):
+        self._shader_checked = True
+        try:
+            from OpenGL.GL import shaders
+            self.program = shaders.compileProgram(
+                shaders.compileShader(POINT_VERTEX_SHADER, GL_VERTEX_SHADER),
+                shaders.compileShader(POINT_FRAGMENT_SHADER, GL_FRAGMENT_SHADER),
+                validate=False)
+            self._size_attribute = glGetAttribLocation(self.program, 'size')
+        except Exception as e:
+            print(f"[PointLayer] Shaders unavailable, drawing points at one size: {e}")
+            self.program = None
+
+    def draw(self, camera):
+        cells, firsts, counts = self._flush()
+        visible = visible_patches(camera, self.radius, CELL_LEVEL,
+                                  height=self.radius * (POINT_RADIUS_SCALE - 1)).ravel()[cells]
+        if not visible.any():
+            return
+        firsts, counts = np.ascontiguousarray(firsts[visible]), np.ascontiguousarray(counts[visible])
+        if not self._shader_checked:
+            self._create_program()
+        glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT | GL_POINT_BIT | GL_DEPTH_BUFFER_BIT)
+        glDisable(GL_LIGHTING)
+        glDisable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDepthMask(GL_FALSE)
+        glPushMatrix()
+        scale = self.radius * POINT_RADIUS_SCALE
+        glScalef(scale, scale, scale)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, self._buffers['xyz'])
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(0))
+        glEnableClientState(GL_COLOR_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, self._buffers['rgba'])
+        glColorPointer(4, GL_UNSIGNED_BYTE, 0, ctypes.c_void_p(0))
+        if self.program:
+            glUseProgram(self.program)
+            glEnable(GL_VERTEX_PROGRAM_POINT_SIZE)
+            glEnable(GL_POINT_SPRITE)
+            glEnableVertexAttribArray(self._size_attribute)
+            glBindBuffer(GL_ARRAY_BUFFER, self._buffers['size'])
+            glVertexAttribPointer(self._size_attribute, 1, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+        else:
+            glPointSize(self.size)
+        glMultiDrawArrays(GL_POINTS, firsts, counts, len(firsts))
+        if self.program:
+            glDisableVertexAttribArray(self._size_attribute)
+            glUseProgram(0)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glPopMatrix()
+        glPopAttrib()
+
+    def delete(self):
+        if self._buffers is not None:
+            glDeleteBuffers(len(self._buffers), list(self._buffers.values()))
+            self._buffers = None
+            self._reallocate = True
+        if self.program:
+            glDeleteProgram(self.program)
+            self.program = None
+            self._shader_checked = False
+
+# ------------------ Reading files ------------------
+
+def read_chunks(path, columns, chunk_rows=CHUNK_ROWS):
+    """Yield dicts of float64 arrays for `columns` (None entries skipped), `chunk_rows` rows at a time.
+
+    CSV is read with the standard library; Parquet needs pyarrow. Cells
+    that are empty or not numbers become NaN.
+    """
+    columns = [column for column in columns if column]
+    if path.lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading Parquet needs pyarrow (pip install pyarrow)") from None
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield {column: batch.column(column).to_numpy(zero_copy_only=False).astype(np.float64)
+                   for column in columns}
+        return
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{path}: no column(s) {', '.join(missing)}")
+        positions = [header.index(column) for column in columns]
+        cells = [[] for _ in columns]
+        for row in reader:
+            for column_cells, i in zip(cells, positions):
+                column_cells.append(row[i] if i < len(row) else '')
+            if len(cells[0]) == chunk_rows:
+                yield {column: _parse_numbers(column_cells) for column, column_cells in zip(columns, cells)}
+                cells = [[] for _ in columns]
+        if cells[0]:
+            yield {column: _parse_numbers(column_cells) for column, column_cells in zip(columns, cells)}
+
+def _parse_numbers(cells):
+    """float64 array of CSV cells; NumPy converts the whole column unless a cell is not a number."""
+    try:
+        return np.array(cells, dtype=np.str_).astype(np.float64)
+    except ValueError:
+        def number(cell):
+            try:
+                return float(cell)
+            except ValueError:
+                return np.nan
+        return np.array([number(cell) for cell in cells], dtype=np.float64)
+
+def main():
+    parser = argparse.ArgumentParser(description="Show a CSV or Parquet file of points on the globe")
+    parser.add_argument('path', help="file with latitude/longitude columns")
+    parser.add_argument('--lat', default='lat')
+    parser.add_argument('--lon', default='lon')
+    parser.add_argument('--value', help="column mapped through the colormap")
+    parser.add_argument('--size', help="column of point sizes in pixels")
+    parser.add_argument('--colormap', default='viridis', choices=sorted(COLORMAPS))
+    args = parser.parse_args()
+
+    # Chunks stream in on a worker thread and appear as they are read.
+    layer = PointLayer(colormap=args.colormap)
+    threading.Thread(target=layer.load_file, args=(args.path, args.lat, args.lon, args.value, args.size),
+                     name='point-loader', daemon=True).start()
+    import globe
+    globe.main(point_layers=[layer])
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Persistent player progress for Continental Quest.
+
+Progress lives in a small SQLite database in WAL mode. Every value is also
+kept in memory, so reads never touch the disk after the first one, and
+writes only update memory and queue the change: a background thread
+coalesces queued changes (only the latest value per continent is written)
+and flushes them in one transaction every FLUSH_INTERVAL seconds. Neither
+the pywebview bridge nor the HTTP server ever waits for the disk.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+CONTINENTS = ('north-america', 'south-america', 'europe', 'africa', 'asia', 'australia',
+              'antarctica')
+
+DATA_DIR = os.environ.get('CONTINENTAL_QUEST_DATA_DIR',
+                          os.path.join(os.path.expanduser('~'), '.continental_quest'))
+FLUSH_INTERVAL = 0.5  # seconds a change may wait so bursts are written together
+
+class ProgressStore:
+    """Progress percentages (0-100) per continent with write-behind persistence."""
+
+    def __init__(self, path=None, flush_interval=FLUSH_INTERVAL):
+        self.path = path or os.path.join(DATA_DIR, 'progress.db')
+        self.flush_interval = flush_interval
+        self._cache = None
+        self._pending = {}
+        self._closing = False
+        self._cond = threading.Condition()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._writer = threading.Thread(target=self._flush_loop, name='progress-writer', daemon=True)
+        self._writer.start()
+
+    # ------------------ Database ------------------
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS progress ('
+                             'continent TEXT PRIMARY KEY, progress REAL NOT NULL, '
+                             'updated_at REAL NOT NULL)')
+        return self._db
+
+    def _load(self):
+        """Fill the cache from disk on first use (read-through)."""
+        with self._db_lock:
+            if self._cache is not None:
+                return
+            try:
+                rows = self._connect().execute('SELECT continent, progress, updated_at FROM progress')
+                stored = {continent: (progress, updated_at) for continent, progress, updated_at in rows}
+            except sqlite3.Error as e:
+                print(f"[ProgressStore] Could not read '{self.path}': {e}")
+                stored = {}
+        with self._cond:
+            if self._cache is None:
+                # Changes made while loading are newer than anything on disk.
+                stored.update(self._pending)
+                self._cache = stored
+
+    def _write(self, changes):
+        with self._db_lock:
+            try:
+                db = self._connect()
+                with db:
+                    db.executemany(
+                        'INSERT INTO progress (continent, progress, updated_at) VALUES (?, ?, ?) '
+                        'ON CONFLICT(continent) DO UPDATE SET progress = excluded.progress, '
+                        'updated_at = excluded.updated_at',
+                        [(continent, progress, updated_at)
+                         for continent, (progress, updated_at) in changes.items()])
+            except sqlite3.Error as e:
+                print(f"[ProgressStore] Could not write '{self.path}': {e}")
+
+    def _flush_loop(self):
+        # Warm the cache up front; nothing is written before it is loaded, so
+        # _load() never misses a change that is already on its way to disk.
+        self._load()
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._closing:
+                    # Let a burst of updates collect so it becomes one transaction.
+                    self._cond.wait(self.flush_interval)
+                changes, self._pending = self._pending, {}
+                closing = self._closing
+            if changes:
+                self._write(changes)
+            if closing:
+                return
+
+    # ------------------ Public API ------------------
+
+    def get(self, continent):
+        """Progress of one continent, 0 if it was never played."""
+        if self._cache is None:
+            self._load()
+        entry = self._cache.get(continent)
+        return entry[0] if entry else 0
+
+    def get_all(self):
+        """Progress of every continent in one dict (the whole dashboard)."""
+        if self._cache is None:
+            self._load()
+        cache = self._cache
+        return {continent: cache[continent][0] if continent in cache else 0
+                for continent in CONTINENTS}
+
+    def last_updated(self):
+        """Time of the most recent change, or None."""
+        # update() and the writer change the cache under the condition's lock.
+        with self._cond:
+            if self._cache is None:
+                self._load()
+            return max((updated_at for _, updated_at in self._cache.values()), default=None)
+
+    def update(self, continent, progress):
+        """Record new progress; returns the stored value. Raises ValueError for bad input."""
+        if continent not in CONTINENTS:
+            raise ValueError(f"Unknown continent '{continent}'")
+        progress = min(100.0, max(0.0, float(progress)))
+        entry = (progress, time.time())
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Progress store is closed")
+            if self._cache is not None:
+                self._cache[continent] = entry
+            self._pending[continent] = entry
+            self._cond.notify()
+        return progress
+
+    def flush(self):
+        """Write queued changes now, on the calling thread."""
+        if self._cache is None:
+            self._load()
+        with self._cond:
+            changes, self._pending = self._pending, {}
+        if changes:
+            self._write(changes)
+
+    def close(self):
+        """Flush everything and stop the writer thread."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify()
+        self._writer.join()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
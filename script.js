@@ -905,6 +905,51 @@ class PythonInterface {
         }
     }
     
+    async getDashboard() {
+        try {
+            switch (this.backend_type) {
+                case 'webview':
+                    return await pywebview.api.get_dashboard();
+                    
+                case 'web_api':
+                    const response = await fetch(`${this.base_url}/api/dashboard`);
+                    return await response.json();
+                    
+                default:
+                    return {
+                        status: 'success',
+                        progress: await this.getProgress(),
+                        difficulty: 'medium'
+                    };
+            }
+        } catch (error) {
+            console.error('Error getting dashboard:', error);
+            return { status: 'error', message: error.message };
+        }
+    }
+    
+    async pageReady() {
+        // Readiness handshake: Python finishes its setup once this arrives
+        try {
+            switch (this.backend_type) {
+                case 'webview':
+                    return await pywebview.api.page_ready();
+                    
+                case 'web_api':
+                    const response = await fetch(`${this.base_url}/api/ready`, {
+                        method: 'POST'
+                    });
+                    return await response.json();
+                    
+                default:
+                    return { status: 'success', backend: this.backend_type };
+            }
+        } catch (error) {
+            console.error('❌ Ready handshake failed:', error);
+            return { status: 'error', message: error.message };
+        }
+    }
+    
     async testConnection() {
         console.log('🔥 [TEST] Testing Python connection...');
         try {
@@ -937,6 +982,29 @@ class PythonInterface {
 // Initialize Python interface
 window.pythonInterface = new PythonInterface();
 
+// Tell Python when the page is interactive. In the desktop app this waits
+// for pywebview to inject its API, which can happen after DOMContentLoaded.
+let pageReadySent = false;
+function announcePageReady() {
+    if (pageReadySent) return;
+    pageReadySent = true;
+    window.pythonInterface.pageReady();
+}
+
+window.addEventListener('pywebviewready', () => {
+    window.pythonInterface.backend_type = 'webview';
+    announcePageReady();
+});
+
+document.addEventListener('DOMContentLoaded', () => {
+    if (typeof pywebview !== 'undefined' && pywebview.api && pywebview.api.page_ready) {
+        window.pythonInterface.backend_type = 'webview';
+        announcePageReady();
+    } else if (window.pythonInterface.backend_type !== 'webview') {
+        announcePageReady();
+    }
+});
+
 // Add some fun Easter eggs
 let konamiCode = [];
 const konamiSequence = [38, 38, 40, 40, 37, 39, 37, 39, 66, 65]; // ↑↑↓↓←→←→BA
@@ -4,8 +4,14 @@ Continental Quest - Setup Script
 Sets up the integration between your existing globe.py and the web launcher
 """
 
+import io
 import os
+import re
 import sys
+import gzip
+import json
+import shutil
+import hashlib
 import subprocess
 import platform
 from pathlib import Path
@@ -62,7 +68,7 @@ def install_integration_dependencies():
     
     integration_deps = [
         ("pywebview", "Desktop web integration"),
-        ("flask", "Optional: Web server fallback"),
+        ("brotli", "Optional: brotli-compressed launcher assets"),
     ]
     
     for package, description in integration_deps:
@@ -132,8 +138,8 @@ numpy>=1.20.0
 # Web launcher integration
 pywebview>=4.0.0
 
-# Optional web server fallback
-flask>=2.0.0
+# Optional: brotli responses from the built-in web server
+brotli>=1.0.0
 requests>=2.25.0
 
 # Development tools (optional)
@@ -166,6 +172,254 @@ pause
         print(f"❌ Failed to create run script: {e}")
         return False
 
+BUILD_DIR = 'dist'
+LAUNCHER_PAGE = 'continental_quest_landing.html'
+# Files the landing page loads; identical files are built once.
+PAGE_ASSETS = ['style.css', 'style_landing.css', 'script.js']
+# Downscaled copies for web use; the globe keeps reading the full-size originals.
+IMAGE_ASSETS = ['world.jpg', 'galaxy.jpg']
+IMAGE_WIDTHS = (2048, 1024, 512)
+IMAGE_QUALITY = 85
+
+JS_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                     'throw', 'case', 'do', 'else', 'yield', 'await'}
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{content_hash(data)[:10]}{ext}"
+
+def minify_css(text):
+    """Drop comments and insignificant whitespace; strings are left untouched."""
+    out = []
+    for i, part in enumerate(re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', text)):
+        if i % 2:
+            out.append(part)
+            continue
+        part = re.sub(r'/\*.*?\*/', '', part, flags=re.S)
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)
+        out.append(part.replace(';}', '}'))
+    return ''.join(out).strip()
+
+def _js_tokens(text, i=0, closing=None):
+    """Split JavaScript into ('code', text) and ('literal', text) parts, without comments.
+
+    Strings, template literals and regular expressions are literals; with
+    `closing` set, stops after the '}' ending a template substitution.
+    """
+    parts, code, depth = [], [], 0
+
+    def last_significant():
+        for chunk in reversed(code):
+            if chunk.strip():
+                return chunk.rstrip()
+        for kind, chunk in reversed(parts):
+            if chunk.strip():
+                return chunk.rstrip() if kind == 'code' else 'x'
+        return ''
+
+    def flush():
+        if code:
+            parts.append(('code', ''.join(code)))
+            code.clear()
+
+    while i < len(text):
+        c = text[i]
+        if c in '\'"':
+            j = i + 1
+            while text[j] != c:
+                j += 2 if text[j] == '\\' else 1
+            flush()
+            parts.append(('literal', text[i:j + 1]))
+            i = j + 1
+        elif c == '`':
+            j = i + 1
+            while text[j] != '`':
+                if text[j] == '\\':
+                    j += 2
+                elif text.startswith('${', j):
+                    # Substitutions are code and may hold nested templates.
+                    _, j = _js_tokens(text, j + 2, closing='}')
+                else:
+                    j += 1
+            flush()
+            parts.append(('literal', text[i:j + 1]))
+            i = j + 1
+        elif text.startswith('//', i):
+            i = text.find('\n', i)
+            i = len(text) if i < 0 else i
+        elif text.startswith('/*', i):
+            end = text.index('*/', i + 2)
+            code.append('\n' if '\n' in text[i:end] else ' ')
+            i = end + 2
+        elif c == '/':
+            previous = last_significant()
+            word = re.search(r'[\w$]+$', previous)
+            if not previous or previous[-1] in '(,=:[!&|?{};+-*%<>~^' or (
+                    word and word.group() in JS_REGEX_KEYWORDS):
+                j, in_class = i + 1, False
+                while in_class or text[j] != '/':
+                    if text[j] == '\\':
+                        j += 1
+                    elif text[j] == '[':
+                        in_class = True
+                    elif text[j] == ']':
+                        in_class = False
+                    j += 1
+                j += 1
+                while j < len(text) and (text[j].isalnum() or text[j] == '_'):
+                    j += 1
+                flush()
+                parts.append(('literal', text[i:j]))
+                i = j
+            else:
+                code.append(c)
+                i += 1
+        else:
+            if closing:
+                if c == '{':
+                    depth += 1
+                elif c == '}':
+                    if depth == 0:
+                        flush()
+                        return parts, i + 1
+                    depth -= 1
+            code.append(c)
+            i += 1
+    flush()
+    return parts, i
+
+def minify_js(text):
+    """Drop comments, indentation and blank lines.
+
+    Line breaks are kept, so automatic semicolon insertion behaves exactly as
+    in the source; strings, templates and regular expressions are untouched.
+    """
+    parts, _ = _js_tokens(text)
+    out = []
+    for kind, part in parts:
+        if kind == 'code':
+            part = re.sub(r'[ \t]+', ' ', part)
+            part = re.sub(r' ?\n[\s]*', '\n', part)
+        out.append(part)
+    return ''.join(out).strip() + '\n'
+
+def minify_html(text):
+    """Drop comments, indentation and blank lines."""
+    text = re.sub(r'<!--(?!\[).*?-->', '', text, flags=re.S)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip()) + '\n'
+
+def write_asset(out_dir, name, data):
+    """Write `data` and its gzip/brotli variants (when smaller); returns their sizes."""
+    with open(os.path.join(out_dir, name), 'wb') as f:
+        f.write(data)
+    sizes = {'identity': len(data)}
+    variants = [('gzip', '.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    try:
+        import brotli
+        variants.append(('br', '.br', lambda d: brotli.compress(d, quality=11)))
+    except ImportError:
+        pass
+    for encoding, suffix, compress in variants:
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            with open(os.path.join(out_dir, name + suffix), 'wb') as f:
+                f.write(compressed)
+            sizes[encoding] = len(compressed)
+    return sizes
+
+def build_images(project_dir, out_dir):
+    """Progressive JPEG derivatives of IMAGE_ASSETS at IMAGE_WIDTHS (needs Pillow)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        print("⚠️  Pillow not installed - skipping image derivatives")
+        return {}
+    images = {}
+    for name in IMAGE_ASSETS:
+        source = project_dir / name
+        if not source.exists():
+            continue
+        with Image.open(source) as image:
+            image = image.convert('RGB')
+            derivatives = []
+            for width in [image.width] + [w for w in IMAGE_WIDTHS if w < image.width]:
+                height = round(image.height * width / image.width)
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                buffer = io.BytesIO()
+                resized.save(buffer, 'JPEG', quality=IMAGE_QUALITY, optimize=True, progressive=True)
+                data = buffer.getvalue()
+                if width == image.width and len(data) >= source.stat().st_size:
+                    data = source.read_bytes()  # re-encoding would not make it smaller
+                stem, ext = os.path.splitext(name)
+                filename = hashed_name(f"{stem}-{width}{ext}", data)
+                with open(os.path.join(out_dir, filename), 'wb') as f:
+                    f.write(data)
+                derivatives.append({'file': filename, 'width': width, 'height': height,
+                                    'bytes': len(data)})
+        images[name] = derivatives
+        print(f"✅ {name}: {len(derivatives)} derivatives")
+    return images
+
+def build_assets(project_dir=None, out_dir=None):
+    """Build the launcher into BUILD_DIR and write its manifest.json.
+
+    Returns the manifest. The launcher uses the build only while the
+    manifest's source hashes match the files next to it.
+    """
+    print("\n🛠️  Building launcher assets...")
+    project_dir = Path(project_dir or Path(__file__).parent)
+    out_dir = Path(out_dir or project_dir / BUILD_DIR)
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    manifest = {'entry': LAUNCHER_PAGE, 'sources': {}, 'assets': {}, 'images': {}}
+    built = {}  # source hash -> asset entry, so identical files are built once
+    for name in PAGE_ASSETS:
+        source = project_dir / name
+        if not source.exists():
+            continue
+        data = source.read_bytes()
+        digest = content_hash(data)
+        manifest['sources'][name] = digest
+        if digest not in built:
+            text = data.decode('utf-8')
+            minified = (minify_css(text) if name.endswith('.css') else minify_js(text)).encode('utf-8')
+            filename = hashed_name(name, minified)
+            built[digest] = {'file': filename, 'bytes': write_asset(out_dir, filename, minified)}
+        else:
+            print(f"♻️  {name} is identical to an earlier asset - built once")
+        manifest['assets'][name] = built[digest]
+
+    page = project_dir / LAUNCHER_PAGE
+    data = page.read_bytes()
+    manifest['sources'][LAUNCHER_PAGE] = content_hash(data)
+    html = minify_html(data.decode('utf-8'))
+    for name, asset in manifest['assets'].items():
+        html = re.sub(rf'(\b(?:href|src)=["\']){re.escape(name)}(["\'])',
+                      rf"\g<1>{asset['file']}\g<2>", html)
+    manifest['assets'][LAUNCHER_PAGE] = {
+        'file': LAUNCHER_PAGE, 'bytes': write_asset(out_dir, LAUNCHER_PAGE, html.encode('utf-8'))}
+
+    manifest['images'] = build_images(project_dir, out_dir)
+
+    with open(out_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    for name in [LAUNCHER_PAGE] + PAGE_ASSETS:
+        if name in manifest['assets']:
+            sizes = manifest['assets'][name]['bytes']
+            print(f"✅ {name}: {(project_dir / name).stat().st_size} -> {sizes['identity']} bytes"
+                  + ''.join(f", {encoding} {size}" for encoding, size in sizes.items()
+                            if encoding != 'identity'))
+    print(f"📦 Build written to {out_dir}")
+    return manifest
+
 def show_usage_guide():
     """Display usage instructions"""
     print("\n" + "=" * 60)
@@ -205,7 +459,9 @@ def show_usage_guide():
 
 - Modify globe.py to add continent-specific features
 - Update progress tracking in continental_quest_app.py
-- Customize the web interface in the HTML/CSS/JS files
+- Customize the web interface in the HTML/CSS/JS files, then rebuild with:
+  python setup_continental_quest.py --build-assets
+  (until you do, the launcher loads the edited source files)
 - Add your own textures and game logic
 
 📁 PROJECT STRUCTURE:
@@ -215,6 +471,7 @@ globe.py                     # Your existing 3D OpenGL globe
 continental_quest_landing.html # Web launcher interface
 style.css                    # Landing page styling
 script.js                   # Interactive features
+dist/                       # Minified, precompressed launcher build + manifest.json
 requirements.txt            # All project dependencies
 
 🆘 TROUBLESHOOTING:
@@ -248,6 +505,7 @@ def main():
     print("\n📝 Creating additional project files...")
     create_requirements_file()
     create_run_script()
+    build_assets()
     
     # Show final status
     print("\n" + "=" * 60)
@@ -311,4 +569,7 @@ def main():
         print("\n👋 Setup complete! Use 'python continental_quest_app.py' to run your app.")
 
 if __name__ == '__main__':
-    main()
+    if '--build-assets' in sys.argv[1:]:
+        build_assets()
+    else:
+        main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Spatial index over points on the globe, for nearest-place and radius queries.
+
+SphereIndex is a KD-tree on unit XYZ vectors. The tree is implicit and
+balanced: the points are stored in tree order and every node is a fixed
+slice of them, so the whole index is four flat arrays that save to and load
+from one .npz file. Queries take whole batches of latitudes and longitudes
+and walk the tree one level at a time for all of them with NumPy, keeping
+only the (query, node) pairs whose bounding box is still in reach.
+
+The chord between two unit vectors grows with the angle between them, so
+boxes in XYZ prune great-circle queries exactly; distances are returned in
+kilometres on a sphere of EARTH_RADIUS_KM.
+
+    index = SphereIndex.from_latlon(lat, lon)
+    km, ids = index.nearest(48.86, 2.35, k=3)
+    km, ids = index.within(48.86, 2.35, 500.0)
+
+Build and save an index for a CSV file with lat and lon columns:
+    python spatial.py cities.csv cities-index.npz
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+from globe import latlon_to_xyz
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 32
+# Nearest queries are first bounded by the nearest point of a node this size;
+# descending further costs more than the distances it saves.
+BOUND_POINTS = 64
+# (query, node) pairs a walk starts with, see SphereIndex._start().
+FRONTIER = 1024
+INDEX_VERSION = 1
+
+# ------------------ Distances ------------------
+
+def chord_to_km(chord2):
+    """Great-circle kilometres for squared chord lengths between unit vectors."""
+    return 2.0 * np.arcsin(np.minimum(np.sqrt(chord2) / 2.0, 1.0)) * EARTH_RADIUS_KM
+
+def km_to_chord2(km):
+    """Squared chord length between unit vectors `km` apart on the surface."""
+    angle = np.minimum(np.asarray(km, dtype=np.float64) / EARTH_RADIUS_KM, np.pi)
+    return (2.0 * np.sin(angle / 2.0)) ** 2
+
+def _squared(delta):
+    return np.einsum('...i,...i->...', delta, delta)
+
+# ------------------ Index ------------------
+
+class SphereIndex:
+    """KD-tree over unit vectors; `ids` are what queries return for each point.
+
+    Queries accept a scalar or arrays of lat/lon in degrees. A scalar query
+    returns one row of results and an array query returns one per query;
+    queries at NaN (a pick that missed the globe) find nothing.
+    """
+
+    def __init__(self, points, ids, lo, hi):
+        self.points = points  # (n, 3) float32 in tree order
+        self.ids = ids
+        self.lo, self.hi = lo, hi  # bounding box of every node, in heap order
+        self.depth = int(np.log2(len(lo) + 1)) - 1
+        leaves = 2 ** self.depth
+        self.leaf_bounds = np.arange(leaves + 1, dtype=np.int64) * len(points) // leaves
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def build(cls, xyz, ids=None, leaf_size=LEAF_SIZE):
+        """Index of unit vectors `xyz`; points that are not finite are left out."""
+        xyz = np.asarray(xyz, dtype=np.float32).reshape(-1, 3)
+        ids = np.arange(len(xyz)) if ids is None else np.asarray(ids)
+        valid = np.isfinite(xyz).all(axis=1)
+        xyz, ids = xyz[valid], ids[valid]
+        n = len(xyz)
+        depth = int(np.ceil(np.log2(n / leaf_size))) if n > leaf_size else 0
+        lo = np.zeros((2 ** (depth + 1) - 1, 3), np.float32)
+        hi = np.zeros_like(lo)
+        order = np.arange(n)
+        for level in range(depth + 1 if n else 0):
+            # Node k of this level holds tree positions [k * n // 2**level, (k + 1) * n // 2**level).
+            nodes = 2 ** level
+            starts = np.arange(nodes + 1, dtype=np.int64) * n // nodes
+            points = xyz[order]
+            first = nodes - 1
+            lo[first:first + nodes] = np.minimum.reduceat(points, starts[:-1])
+            hi[first:first + nodes] = np.maximum.reduceat(points, starts[:-1])
+            if level == depth:
+                break
+            # Sort every node along its widest axis, so its first half becomes the left child.
+            axis = np.argmax(hi[first:first + nodes] - lo[first:first + nodes], axis=1)
+            node = np.repeat(np.arange(nodes), np.diff(starts))
+            key = points.ravel()[np.arange(0, 3 * n, 3) + axis[node]] + node * 4.0
+            order = order[np.argsort(key)]
+        return cls(xyz[order], ids[order], lo, hi)
+
+    @classmethod
+    def from_latlon(cls, lat, lon, ids=None, leaf_size=LEAF_SIZE):
+        return cls.build(latlon_to_xyz(np.asarray(lat, dtype=np.float64),
+                                       np.asarray(lon, dtype=np.float64)), ids, leaf_size)
+
+    # ------------------ Serialisation ------------------
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=INDEX_VERSION, points=self.points, ids=self.ids, lo=self.lo, hi=self.hi)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Index saved by save(); raises ValueError for files of another version."""
+        with np.load(path) as data:
+            if int(data['version']) != INDEX_VERSION:
+                raise ValueError(f"index version {int(data['version'])}, expected {INDEX_VERSION}")
+            return cls(data['points'], data['ids'], data['lo'], data['hi'])
+
+    # ------------------ Tree walks ------------------
+
+    def _box_chord2(self, queries, nodes):
+        """Squared distance from each query to the bounding box of its node."""
+        gap = np.maximum(self.lo[nodes] - queries, 0.0) + np.maximum(queries - self.hi[nodes], 0.0)
+        return _squared(gap)
+
+    def _start(self, count, level):
+        """First level of a walk for `count` queries and its (query, node) pairs.
+
+        Small batches skip the top of the tree and test every node of a deeper
+        level at once: one larger NumPy call is cheaper than a call per level.
+        """
+        level = min(level, max(0, int(np.log2(max(FRONTIER // count, 1)))))
+        nodes = 2 ** level
+        query = np.repeat(np.arange(count), nodes)
+        node = np.tile(np.arange(nodes - 1, 2 * nodes - 1), count)
+        return level, query, node
+
+    def _pairs_within(self, queries, chord2):
+        """(query, tree position, squared chord) of every point within chord2[query]."""
+        start, query, node = self._start(len(queries), self.depth)
+        for level in range(start, self.depth + 1):
+            if level > start:
+                query = np.repeat(query, 2)
+                node = np.repeat(2 * node + 1, 2)
+                node[1::2] += 1
+            keep = self._box_chord2(queries[query], node) <= chord2[query]
+            query, node = query[keep], node[keep]
+        leaf = node - (2 ** self.depth - 1)
+        starts, counts = self.leaf_bounds[leaf], np.diff(self.leaf_bounds)[leaf]
+        query = np.repeat(query, counts)
+        offsets = np.cumsum(counts) - counts
+        position = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+        distance = _squared(self.points[position] - queries[query])
+        keep = distance <= chord2[query]
+        return query[keep], position[keep], distance[keep]
+
+    def _kth_bound(self, queries, k):
+        """Squared chord to the k-th nearest point in the node each query falls in.
+
+        The node is the deepest one still holding max(k, BOUND_POINTS) points;
+        nothing nearer than its k-th point can be left out, so it bounds the search.
+        """
+        n = len(self)
+        level = self.depth
+        while level and n // 2 ** level < max(k, BOUND_POINTS):
+            level -= 1
+        start, query, node = self._start(len(queries), level)
+        distance = self._box_chord2(queries[query], node).reshape(len(queries), -1)
+        node = node.reshape(len(queries), -1)[np.arange(len(queries)), np.argmin(distance, axis=1)]
+        for _ in range(start, level):
+            children = np.stack([2 * node + 1, 2 * node + 2])
+            distance = self._box_chord2(queries, children)
+            node = children[np.argmin(distance, axis=0), np.arange(len(node))]
+        index = node - (2 ** level - 1)
+        positions = (index * n // 2 ** level)[:, None] + np.arange(n // 2 ** level)
+        distance = _squared(self.points[positions] - queries[:, None])
+        return np.partition(distance, k - 1, axis=1)[:, k - 1]
+
+    def _queries(self, lat, lon):
+        lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=np.float64),
+                                       np.asarray(lon, dtype=np.float64))
+        xyz = latlon_to_xyz(lat.ravel(), lon.ravel()).reshape(-1, 3)
+        return xyz, np.isfinite(xyz).all(axis=1), lat.ndim == 0
+
+    # ------------------ Queries ------------------
+
+    def nearest(self, lat, lon, k=1):
+        """(km, ids) of the k nearest points, nearest first, each shaped (queries, k).
+
+        Rows are padded with inf and -1 where there are fewer than k points
+        or the query is NaN.
+        """
+        queries, valid, scalar = self._queries(lat, lon)
+        km = np.full((len(queries), k), np.inf)
+        ids = np.full((len(queries), k), -1, dtype=self.ids.dtype)
+        found = min(k, len(self))
+        if found and valid.any():
+            points = queries[valid]
+            # A hair of slack so rounding cannot drop the points that set the bound.
+            bound = self._kth_bound(points, found) * (1.0 + 1e-9) + 1e-12
+            query, position, distance = self._pairs_within(points, bound)
+            order = np.lexsort((distance, query))
+            query, position, distance = query[order], position[order], distance[order]
+            take = np.searchsorted(query, np.arange(len(points)))[:, None] + np.arange(found)
+            km[valid, :found] = chord_to_km(distance[take])
+            ids[valid, :found] = self.ids[position[take]]
+        if scalar:
+            return km[0], ids[0]
+        return km, ids
+
+    def within(self, lat, lon, radius_km):
+        """(km, ids) of every point within `radius_km` great-circle kilometres, nearest first.
+
+        An array query returns lists of one array per query.
+        """
+        queries, valid, scalar = self._queries(lat, lon)
+        chord2 = np.broadcast_to(km_to_chord2(radius_km), valid.shape).copy()
+        chord2[~valid] = -1.0
+        queries = np.where(valid[:, None], queries, 0.0)
+        if len(self):
+            query, position, distance = self._pairs_within(queries, chord2)
+        else:
+            query = position = np.zeros(0, np.int64)
+            distance = np.zeros(0)
+        order = np.lexsort((distance, query))
+        query, position, distance = query[order], position[order], distance[order]
+        splits = np.searchsorted(query, np.arange(1, len(queries)))
+        km = np.split(chord_to_km(distance), splits)
+        ids = np.split(self.ids[position], splits)
+        if scalar:
+            return km[0], ids[0]
+        return km, ids
+
+# ------------------ Main ------------------
+
+def main():
+    from points import read_chunks
+
+    parser = argparse.ArgumentParser(description="Build a spatial index for a file of points.")
+    parser.add_argument('path', help="CSV or Parquet file with latitude/longitude columns")
+    parser.add_argument('out', help="index file to write (.npz)")
+    parser.add_argument('--lat', default='lat')
+    parser.add_argument('--lon', default='lon')
+    args = parser.parse_args()
+    chunks = list(read_chunks(args.path, [args.lat, args.lon]))
+    if not chunks:
+        print(f"No points in '{args.path}'")
+        return 1
+    lat = np.concatenate([chunk[args.lat] for chunk in chunks])
+    lon = np.concatenate([chunk[args.lon] for chunk in chunks])
+    index = SphereIndex.from_latlon(lat, lon)
+    index.save(args.out)
+    print(f"Indexed {len(index)} of {len(lat)} points into '{args.out}' ({index.depth + 1} levels)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
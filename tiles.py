@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Tiled, multi-resolution Earth imagery for the globe.
+
+Imagery is an equirectangular pyramid: level L is 2**(L+1) x 2**L tiles of
+TILE_SIZE x TILE_SIZE pixels, tile (0, 0) being the top-left corner. Like
+world.jpg, the imagery is mirrored east-west (east on the left); pass
+--mirror when building from an ordinary map. Tiles come from either a directory of pre-cut images
+(<root>/<level>/<x>/<y>.jpg plus tiles.json) or a single raw pyramid file that
+is memory-mapped. TileStreamer keeps only the tiles visible from the current
+camera resident on the GPU, decoding them on worker threads.
+
+Build a pyramid from a large image with:
+    python tiles.py world_21600.jpg world_tiles.pyr --mirror
+"""
+
+import os
+import sys
+import json
+import argparse
+import ctypes
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pygame
+from OpenGL.GL import *
+
+from globe import uv_to_xyz, downsample_half, _upload_buffer
+
+TILE_SIZE = 256
+PYRAMID_MAGIC = b'GLOBEPYR'
+PYRAMID_VERSION = 1
+PYRAMID_HEADER = 24  # magic, then uint32 version, tile size, level count, reserved
+
+# Tiles are drawn just above the base globe so they win the depth test against it.
+TILE_RADIUS_SCALE = 1.002
+
+# ------------------ Pyramid layout ------------------
+
+def level_shape(level):
+    """(rows, cols) of tiles at `level`."""
+    return 2 ** level, 2 ** (level + 1)
+
+def tile_bounds(level, x, y):
+    """Texture-space bounds (s0, t0, s1, t1) of a tile; t grows southwards."""
+    rows, cols = level_shape(level)
+    return x / cols, y / rows, (x + 1) / cols, (y + 1) / rows
+
+def levels_for_width(width, tile_size=TILE_SIZE):
+    """Number of levels needed so the finest level is at least `width` pixels wide."""
+    level = 0
+    while 2 ** (level + 1) * tile_size < width:
+        level += 1
+    return level + 1
+
+# ------------------ Tile sources ------------------
+
+class PyramidFileTileSource:
+    """All tiles of a pyramid in one raw file, read through a memory map.
+
+    Layout: PYRAMID_MAGIC, then uint32 version, tile size, level count and a
+    reserved zero, then every level in order with its tiles row-major, each tile as raw RGB
+    rows (top row first).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self.data[:8]) != PYRAMID_MAGIC:
+            raise ValueError(f"{path} is not a tile pyramid file")
+        version, self.tile_size, self.levels = (int(v) for v in self.data[8:20].view('<u4'))
+        if version != PYRAMID_VERSION:
+            raise ValueError(f"{path}: unsupported pyramid version {version}")
+        self.tile_bytes = self.tile_size * self.tile_size * 3
+        self.level_offsets = []
+        offset = PYRAMID_HEADER
+        for level in range(self.levels):
+            self.level_offsets.append(offset)
+            rows, cols = level_shape(level)
+            offset += rows * cols * self.tile_bytes
+
+    def read_tile(self, level, x, y):
+        cols = level_shape(level)[1]
+        start = self.level_offsets[level] + (y * cols + x) * self.tile_bytes
+        return self.data[start:start + self.tile_bytes].reshape(self.tile_size, self.tile_size, 3)
+
+class DirectoryTileSource:
+    """Pre-cut tile images stored as <root>/<level>/<x>/<y>.<ext>, described by tiles.json."""
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, 'tiles.json')) as f:
+            meta = json.load(f)
+        self.tile_size = meta['tile_size']
+        self.levels = meta['levels']
+        self.ext = meta.get('ext', 'jpg')
+
+    def read_tile(self, level, x, y):
+        surface = pygame.image.load(os.path.join(self.root, str(level), str(x), f"{y}.{self.ext}"))
+        width, height = surface.get_rect().size
+        return np.frombuffer(pygame.image.tostring(surface, "RGB"), dtype=np.uint8).reshape(height, width, 3)
+
+def open_tile_source(path):
+    """Open a pyramid file or tile directory."""
+    if os.path.isdir(path):
+        return DirectoryTileSource(path)
+    return PyramidFileTileSource(path)
+
+# ------------------ Building pyramids ------------------
+
+def _resize(image, width, height, strip=256):
+    """Bilinear resize of an (h, w, 3) uint8 image, processed in row strips."""
+    src_h, src_w = image.shape[:2]
+    xs = np.clip((np.arange(width) + 0.5) * src_w / width - 0.5, 0, src_w - 1)
+    x0 = xs.astype(np.intp)
+    x1 = np.minimum(x0 + 1, src_w - 1)
+    wx = (xs - x0)[None, :, None].astype(np.float32)
+
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    for top in range(0, height, strip):
+        ys = np.clip((np.arange(top, min(height, top + strip)) + 0.5) * src_h / height - 0.5, 0, src_h - 1)
+        y0 = ys.astype(np.intp)
+        y1 = np.minimum(y0 + 1, src_h - 1)
+        wy = (ys - y0)[:, None, None].astype(np.float32)
+        rows = image[y0].astype(np.float32) * (1 - wy) + image[y1].astype(np.float32) * wy
+        out[top:top + len(ys)] = (rows[:, x0] * (1 - wx) + rows[:, x1] * wx).round()
+    return out
+
+def _split_tiles(image, tile_size):
+    """(rows, cols, tile, tile, 3) view of a level image."""
+    rows, cols = image.shape[0] // tile_size, image.shape[1] // tile_size
+    return image.reshape(rows, tile_size, cols, tile_size, 3).swapaxes(1, 2)
+
+def build_tile_pyramid(image_path, out_path, tile_size=TILE_SIZE, directory=False, ext='jpg',
+                       mirror=False):
+    """Cut `image_path` into a pyramid file (or a tile directory if `directory`).
+
+    Set `mirror` for a standard west-to-east map so it matches the globe's layout.
+    """
+    surface = pygame.image.load(image_path)
+    if mirror:
+        surface = pygame.transform.flip(surface, True, False)
+    width, height = surface.get_rect().size
+    image = np.frombuffer(pygame.image.tostring(surface, "RGB"), dtype=np.uint8).reshape(height, width, 3)
+    del surface
+
+    levels = levels_for_width(width, tile_size)
+    rows, cols = level_shape(levels - 1)
+    print(f"Resampling {width}x{height} to {cols * tile_size}x{rows * tile_size} ({levels} levels)")
+    level_image = _resize(image, cols * tile_size, rows * tile_size)
+    del image
+
+    # Levels are written finest first, each one downsampled from the next finer
+    # and then dropped, so only two levels are ever held in memory.
+    if directory:
+        os.makedirs(out_path, exist_ok=True)
+        for level in reversed(range(levels)):
+            tiles = _split_tiles(level_image, tile_size)
+            for y in range(tiles.shape[0]):
+                for x in range(tiles.shape[1]):
+                    tile_dir = os.path.join(out_path, str(level), str(x))
+                    os.makedirs(tile_dir, exist_ok=True)
+                    tile = np.ascontiguousarray(tiles[y, x])
+                    pygame.image.save(pygame.image.frombuffer(tile.tobytes(), (tile_size, tile_size), 'RGB'),
+                                      os.path.join(tile_dir, f"{y}.{ext}"))
+            if level:
+                level_image = downsample_half(level_image)
+        with open(os.path.join(out_path, 'tiles.json'), 'w') as f:
+            json.dump({'tile_size': tile_size, 'levels': levels, 'ext': ext}, f)
+    else:
+        level_offsets = [PYRAMID_HEADER]
+        for level in range(levels):
+            rows, cols = level_shape(level)
+            level_offsets.append(level_offsets[-1] + rows * cols * tile_size * tile_size * 3)
+        tmp_path = f"{out_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(PYRAMID_MAGIC)
+            f.write(np.array([PYRAMID_VERSION, tile_size, levels, 0], dtype='<u4').tobytes())
+            for level in reversed(range(levels)):
+                f.seek(level_offsets[level])
+                # One row of tiles at a time, so the tile-ordered copy stays small.
+                for tile_row in _split_tiles(level_image, tile_size):
+                    f.write(np.ascontiguousarray(tile_row).tobytes())
+                if level:
+                    level_image = downsample_half(level_image)
+        os.replace(tmp_path, out_path)
+    print(f"Wrote {levels}-level tile pyramid to {out_path}")
+
+# ------------------ Geometry and visibility ------------------
+
+def patch_segments(level):
+    """Grid resolution of a tile patch; keeps each quad at or below ~6 degrees."""
+    return max(4, 32 >> level)
+
+def tile_patch_vertices(level, x, y, radius):
+    """Interleaved float32 (position, normal, texcoord) grid covering one tile."""
+    segments = patch_segments(level)
+    s0, t0, s1, t1 = tile_bounds(level, x, y)
+    u = np.linspace(0.0, 1.0, segments + 1)
+    uu, vv = np.meshgrid(u, u)
+    normals = uv_to_xyz(s0 + uu * (s1 - s0), t0 + vv * (t1 - t0))
+    vertices = np.concatenate([normals * radius * TILE_RADIUS_SCALE, normals,
+                               uu[..., None], vv[..., None]], axis=2)
+    return np.ascontiguousarray(vertices.reshape(-1, 8), dtype=np.float32)
+
+def patch_indices(segments):
+    row = segments + 1
+    top = (np.arange(segments)[:, None] * row + np.arange(segments)).ravel()
+    bottom = top + row
+    quads = np.stack([top, bottom, bottom + 1, top, bottom + 1, top + 1], axis=1)
+    return np.ascontiguousarray(quads.ravel(), dtype=np.uint16)
+
+def select_level(camera, radius, tile_size, levels, detail=1.0):
+    """Coarsest level whose texels are no larger than a screen pixel at the view centre."""
+    gap = max(camera.distance - radius, 1e-6)
+    pixels_per_unit = camera.height / 2.0 / np.tan(np.radians(camera.fov) / 2) / gap
+    needed = 2 * np.pi * radius * pixels_per_unit * detail
+    level = 0
+    while level < levels - 1 and 2 ** (level + 1) * tile_size < needed:
+        level += 1
+    return level
+
+def _tiles_visible(camera, radius, level, candidates, samples=5):
+    """Subset of candidate (x, y) tiles that are in front of the horizon and in the frustum."""
+    if not candidates:
+        return []
+    tiles = np.array(candidates)
+    rows, cols = level_shape(level)
+    steps = np.linspace(0.0, 1.0, samples)
+    s = (tiles[:, 0, None, None] + steps[None, None, :]) / cols
+    t = (tiles[:, 1, None, None] + steps[None, :, None]) / rows
+    points = uv_to_xyz(s, t).reshape(len(tiles), -1, 3) * radius
+
+    # A surface point p is in front of the horizon when p . eye > radius^2.
+    facing = points @ camera.eye_position() > radius * radius
+    clip = np.concatenate([points, np.ones(points.shape[:2] + (1,))], axis=2) @ \
+        (camera.projection_matrix() @ camera.view_matrix()).T
+    w = np.maximum(clip[..., 3], 1e-6)
+    ndc_x, ndc_y = clip[..., 0] / w, clip[..., 1] / w
+
+    # Keep tiles whose front-facing samples overlap the screen rectangle.
+    visible = facing.any(axis=1)
+    visible &= np.where(facing, ndc_x, np.inf).min(axis=1) <= 1
+    visible &= np.where(facing, ndc_x, -np.inf).max(axis=1) >= -1
+    visible &= np.where(facing, ndc_y, np.inf).min(axis=1) <= 1
+    visible &= np.where(facing, ndc_y, -np.inf).max(axis=1) >= -1
+    return [tuple(tile) for tile in tiles[visible].tolist()]
+
+def visible_tiles(camera, radius, level):
+    """Visible tiles at `level`, found by descending the quadtree from level 0."""
+    rows, cols = level_shape(0)
+    tiles = _tiles_visible(camera, radius, 0, [(x, y) for y in range(rows) for x in range(cols)])
+    for current in range(1, level + 1):
+        children = [(2 * x + dx, 2 * y + dy) for x, y in tiles for dy in (0, 1) for dx in (0, 1)]
+        tiles = _tiles_visible(camera, radius, current, children)
+    return tiles
+
+# ------------------ GPU tile cache and streaming ------------------
+
+class TileStreamer:
+    """Streams the tiles visible from the camera into a fixed-size GPU cache.
+
+    Call update(camera) once per frame after the camera moves, poll() to upload
+    tiles decoded by the worker threads (at most `upload_budget` per call so
+    the frame never stalls), and draw() after the base globe. Level 0 is always
+    resident, and a missing tile is covered by its nearest resident ancestor.
+    Least recently drawn tiles are evicted and their GL objects reused.
+    """
+
+    def __init__(self, source, radius=2.5, capacity=256, workers=2, upload_budget=8,
+                 detail=1.0, notify=None):
+        self.source = source
+        self.radius = radius
+        self.capacity = max(capacity, 2 * level_shape(0)[1])
+        self.upload_budget = upload_budget
+        self.detail = detail
+        self.notify = notify
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tile-loader')
+        self._lock = threading.Lock()
+        self._resident = OrderedDict()   # key -> (texture, vbo), in LRU order
+        self._in_flight = set()
+        self._ready = []                 # (key, pixels, vertices) waiting for upload
+        self._wanted = set()
+        self._view = []
+        self._view_key = None
+        self._indices = {}
+        self._pinned = {(0, x, y) for y in range(level_shape(0)[0]) for x in range(level_shape(0)[1])}
+        self._request(sorted(self._pinned))
+
+    def _load(self, key):
+        level, x, y = key
+        try:
+            if key not in self._wanted and key not in self._pinned:
+                return  # the view moved on before this tile's turn came
+            pixels = np.ascontiguousarray(self.source.read_tile(level, x, y))
+            vertices = tile_patch_vertices(level, x, y, self.radius)
+            with self._lock:
+                self._ready.append((key, pixels, vertices))
+            if self.notify:
+                self.notify()
+        except Exception as e:
+            print(f"[TileStreamer] Failed to load tile {key}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def _request(self, keys):
+        with self._lock:
+            keys = [key for key in keys if key not in self._resident and key not in self._in_flight]
+            self._in_flight.update(keys)
+        for key in keys:
+            self._executor.submit(self._load, key)
+
+    def update(self, camera):
+        """Recompute the visible tile set and queue the missing tiles, nearest first."""
+        view_key = (tuple(np.round(camera.orientation, 6)), round(camera.distance, 6),
+                    camera.width, camera.height)
+        if view_key == self._view_key:
+            return
+        self._view_key = view_key
+
+        level = select_level(camera, self.radius, self.source.tile_size, self.source.levels, self.detail)
+        tiles = visible_tiles(camera, self.radius, level)
+        view_dir = camera.eye_position() / np.linalg.norm(camera.eye_position())
+        if tiles:
+            centres = [tile_bounds(level, x, y) for x, y in tiles]
+            centres = uv_to_xyz([(b[0] + b[2]) / 2 for b in centres], [(b[1] + b[3]) / 2 for b in centres])
+            tiles = [tiles[i] for i in np.argsort(-(centres @ view_dir))]
+        view = [(level, x, y) for x, y in tiles]
+
+        # Prefetch the ring around the view and the parents used while tiles arrive.
+        rows, cols = level_shape(level)
+        ring = {(level, (x + dx) % cols, y + dy) for _, x, y in view
+                for dx in (-1, 0, 1) for dy in (-1, 0, 1) if 0 <= y + dy < rows}
+        parents = {(level - 1, x // 2, y // 2) for _, x, y in view} if level > 0 else set()
+        visible = set(view)
+
+        self._view = view
+        self._wanted = visible | parents | ring
+        self._request(view + sorted(parents - visible) + sorted(ring - visible))
+
+    def poll(self):
+        """Upload up to `upload_budget` decoded tiles. Returns True if any were added."""
+        with self._lock:
+            batch, self._ready = self._ready[:self.upload_budget], self._ready[self.upload_budget:]
+        for key, pixels, vertices in batch:
+            texture, vbo = self._allocate()
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+            height, width = pixels.shape[:2]
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, pixels)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            _upload_buffer(vertices, buffer_id=vbo)
+            self._resident[key] = (texture, vbo)
+        return bool(batch)
+
+    def _allocate(self):
+        """GL texture and buffer for a new tile, recycled from the LRU tile when full."""
+        if len(self._resident) >= self.capacity:
+            visible = set(self._view)
+            for key in self._resident:
+                if key not in self._pinned and key not in visible:
+                    return self._resident.pop(key)
+        texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        return texture, glGenBuffers(1)
+
+    def _index_buffer(self, segments):
+        ibo = self._indices.get(segments)
+        if ibo is None:
+            indices = patch_indices(segments)
+            ibo = self._indices[segments] = (_upload_buffer(indices, GL_ELEMENT_ARRAY_BUFFER), len(indices))
+        return ibo
+
+    def draw_list(self):
+        """Resident tiles to draw for the current view, coarsest first."""
+        keys = set()
+        for level, x, y in self._view:
+            while (level, x, y) not in self._resident and level > 0:
+                level, x, y = level - 1, x // 2, y // 2
+            keys.add((level, x, y))
+        if not keys:
+            keys = {key for key in self._pinned if key in self._resident}
+        return sorted(key for key in keys if key in self._resident)
+
+    def draw(self):
+        """Draw the streamed tiles over the base globe (texturing and material set by the caller)."""
+        glDepthMask(GL_FALSE)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        for key in self.draw_list():
+            texture, vbo = self._resident[key]
+            self._resident.move_to_end(key)
+            ibo, count = self._index_buffer(patch_segments(key[0]))
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glBindBuffer(GL_ARRAY_BUFFER, vbo)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ibo)
+            glVertexPointer(3, GL_FLOAT, 32, ctypes.c_void_p(0))
+            glNormalPointer(GL_FLOAT, 32, ctypes.c_void_p(12))
+            glTexCoordPointer(2, GL_FLOAT, 32, ctypes.c_void_p(24))
+            glDrawElements(GL_TRIANGLES, count, GL_UNSIGNED_SHORT, ctypes.c_void_p(0))
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDepthMask(GL_TRUE)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cut a large equirectangular image into a globe tile pyramid")
+    parser.add_argument('image', help="source image, e.g. a 21600x10800 world map")
+    parser.add_argument('output', help="pyramid file to write (or directory with --directory)")
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE)
+    parser.add_argument('--directory', action='store_true', help="write individual tile images instead")
+    parser.add_argument('--mirror', action='store_true',
+                        help="flip a standard west-to-east map into the globe's east-to-west layout")
+    args = parser.parse_args()
+    build_tile_pyramid(args.image, args.output, args.tile_size, args.directory, mirror=args.mirror)
+
+if __name__ == '__main__':
+    sys.exit(main())
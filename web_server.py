@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Local HTTP backend for the landing page (the `web_api` backend of script.js).
+
+One asyncio event loop serves every client, so hundreds of browsers (a lab
+pointing at one host, say) cost a socket each rather than a thread each:
+
+    GET  /api/test
+    POST /api/ready                (readiness handshake from the page)
+    GET  /api/launch/<continent>
+    POST /api/start-game           {"continent": ..., "difficulty": ...}
+    POST /api/difficulty           {"difficulty": ...}
+    GET  /api/progress[/<continent>]
+    POST /api/progress/<continent> {"progress": ...}
+    GET  /api/dashboard
+
+The endpoints call the same WebAPI object as the pywebview bridge. Calls that
+may block (showing the globe) run on a worker thread so the loop keeps
+serving everyone else.
+
+Static files are read once and kept in memory with their ETag and
+Last-Modified, connections are kept alive, and responses are compressed
+with brotli or gzip when the client accepts it: a precompressed `file.br` or
+`file.gz` next to the file is used as is, otherwise the file is compressed
+once on first request, at a quicker brotli quality. Reading and compressing
+happen on a worker thread, never on the loop. Content-hashed files from the asset build
+(setup_continental_quest.py --build-assets) are marked immutable.
+
+    python web_server.py --host 0.0.0.0 --port 8765
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import asyncio
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+# brotli is optional; without it clients get gzip
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+KEEPALIVE_TIMEOUT = 15.0      # seconds an idle connection is kept open
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+INDEX_FILE = 'continental_quest_landing.html'
+# Built assets are named by content hash (style.<hash>.css), so they never change.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+
+# Only these file types are served, so the source and data next to them are not.
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.json': 'application/json',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.ico': 'image/x-icon',
+    '.woff2': 'font/woff2',
+}
+COMPRESSIBLE = ('.html', '.css', '.js', '.json', '.svg')
+# Files without a precompressed .br are compressed on demand; quality 11 (the
+# asset build's) takes ~100 ms for the launcher's scripts, quality 5 a few ms.
+BROTLI_QUALITY = 5
+# Preferred first.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+STATUS_TEXT = {200: 'OK', 204: 'No Content', 304: 'Not Modified', 400: 'Bad Request',
+               404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+               431: 'Request Header Fields Too Large', 500: 'Internal Server Error'}
+
+class HttpError(Exception):
+    def __init__(self, status, message=None, headers=None):
+        super().__init__(message or STATUS_TEXT[status])
+        self.status = status
+        self.headers = headers or {}  # extra response headers, e.g. Allow for a 405
+
+# ------------------ Static files ------------------
+
+class StaticFile:
+    """One file's bytes, validators and compressed variants."""
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.key = (stat.st_mtime_ns, stat.st_size)
+        with open(path, 'rb') as f:
+            self.body = f.read()
+        self.content_type = CONTENT_TYPES[os.path.splitext(path)[1].lower()]
+        self.etag = '"%s"' % hashlib.sha1(self.body).hexdigest()[:20]
+        self.mtime = int(stat.st_mtime)
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+        self.compressible = path.lower().endswith(COMPRESSIBLE)
+        self._variants = {}
+
+    def variant(self, encoding, suffix):
+        """The body in `encoding`, or None if that encoding is not available."""
+        if encoding not in self._variants:
+            self._variants[encoding] = self._precompressed(suffix) or self._compress(encoding)
+        return self._variants[encoding]
+
+    def _precompressed(self, suffix):
+        try:
+            if os.stat(self.path + suffix).st_mtime_ns >= self.key[0]:
+                with open(self.path + suffix, 'rb') as f:
+                    return f.read()
+        except OSError:
+            pass
+        return None
+
+    def _compress(self, encoding):
+        if not self.compressible:
+            return None
+        if encoding == 'gzip':
+            return gzip.compress(self.body, compresslevel=9, mtime=0)
+        if encoding == 'br' and BROTLI_AVAILABLE:
+            return brotli.compress(self.body, quality=BROTLI_QUALITY)
+        return None
+
+class StaticFiles:
+    """In-memory cache of the files under `root`, revalidated by mtime and size."""
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self._files = {}
+
+    def lookup(self, url_path):
+        if url_path in ('', '/'):
+            url_path = '/' + INDEX_FILE
+        path = os.path.realpath(os.path.join(self.root, url_path.lstrip('/')))
+        if (not path.startswith(self.root + os.sep)
+                or os.path.splitext(path)[1].lower() not in CONTENT_TYPES):
+            raise HttpError(404)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise HttpError(404)
+        cached = self._files.get(path)
+        if cached is None or cached.key != (stat.st_mtime_ns, stat.st_size):
+            cached = self._files[path] = StaticFile(path, stat)
+        return cached
+
+def not_modified(static, headers):
+    """Whether the client's cached copy (If-None-Match / If-Modified-Since) is current."""
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        return static.etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')] \
+            or if_none_match.strip() == '*'
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return static.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return False
+
+def accepted_encodings(headers):
+    accepted = set()
+    for part in headers.get('accept-encoding', '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip().lower())
+    return accepted
+
+# ------------------ Server ------------------
+
+def required(body, key):
+    if key not in body:
+        raise HttpError(400, f"Missing '{key}' in request body")
+    return body[key]
+
+class WebServer:
+    """Serves `api` (a WebAPI) and the static files in `root` over HTTP/1.1."""
+
+    def __init__(self, api, root, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.api = api
+        self.static = StaticFiles(root)
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.server = None
+        self._thread = None
+        # (method, pattern, handler, blocking)
+        self.routes = [
+            ('GET', r'/api/test', lambda body: api.test_connection(), False),
+            ('POST', r'/api/ready', lambda body: api.page_ready(), True),
+            ('GET', r'/api/launch/([\w-]+)', lambda body, c: api.launch_continent(c), True),
+            ('POST', r'/api/start-game', lambda body: api.start_game(body or None), True),
+            ('POST', r'/api/difficulty',
+             lambda body: api.set_difficulty(required(body, 'difficulty')), False),
+            ('GET', r'/api/progress', lambda body: api.get_progress(), False),
+            ('GET', r'/api/progress/([\w-]+)', lambda body, c: api.get_progress(c), False),
+            ('POST', r'/api/progress/([\w-]+)',
+             lambda body, c: api.update_progress(c, required(body, 'progress')), False),
+            ('GET', r'/api/dashboard', lambda body: api.get_dashboard(), False),
+        ]
+        self.routes = [(method, re.compile(pattern + '$'), handler, blocking)
+                       for method, pattern, handler, blocking in self.routes]
+
+    @property
+    def url(self):
+        host = 'localhost' if self.host in ('0.0.0.0', '::', '127.0.0.1') else self.host
+        return f"http://{host}:{self.port}/"
+
+    # ------------------ Lifecycle ------------------
+
+    async def start(self):
+        try:
+            self.server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                     backlog=1024, limit=MAX_HEADER_BYTES)
+        except OSError as e:
+            print(f"[WebServer] Port {self.port} unavailable ({e}), using a free one")
+            self.server = await asyncio.start_server(self._handle, self.host, 0,
+                                                     backlog=1024, limit=MAX_HEADER_BYTES)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def serve_forever(self):
+        """Run the server on the calling thread until interrupted."""
+        async def run():
+            self.loop = asyncio.get_running_loop()
+            await self.start()
+            print(f"🌐 Serving Continental Quest on {self.url}")
+            async with self.server:
+                await self.server.serve_forever()
+        asyncio.run(run())
+
+    def start_in_thread(self):
+        """Run the server on a daemon thread; returns once it is listening."""
+        started = threading.Event()
+        errors = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.loop.run_until_complete(self.start())
+            except Exception as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            self.loop.run_forever()
+            # Close the connections still kept alive before the loop goes away.
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+        self._thread = threading.Thread(target=run, name='web-server', daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self.url
+
+    def stop(self):
+        if self.loop is None or self.server is None:
+            return
+        self.loop.call_soon_threadsafe(self.server.close)
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+    # ------------------ Connections ------------------
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError,
+                        asyncio.CancelledError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 431, {'Content-Type': 'text/plain'},
+                                     b'Request headers too large', keep_alive=False)
+                    break
+                keep_alive = await self._respond(reader, writer, head)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, reader, writer, head):
+        """Answer one request; returns whether the connection stays open."""
+        try:
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, version = request_line.split(' ')
+        except ValueError:
+            await self._send(writer, 400, {'Content-Type': 'text/plain'}, b'Bad request',
+                             keep_alive=False)
+            return False
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_BYTES:
+            await self._send(writer, 413, {'Content-Type': 'text/plain'}, b'Payload too large',
+                             keep_alive=False)
+            return False
+        try:
+            body = await reader.readexactly(length) if length else b''
+        except asyncio.IncompleteReadError:
+            return False  # the client went away mid-body
+
+        path = target.split('?', 1)[0]
+        try:
+            if path.startswith('/api/'):
+                status, response_headers, payload = await self._api(method, path, body)
+            else:
+                # Reading and compressing a file would stall every connection on the loop.
+                status, response_headers, payload = await asyncio.get_running_loop().run_in_executor(
+                    None, self._static, method, path, headers)
+        except HttpError as e:
+            status, response_headers = e.status, {'Content-Type': 'application/json', **e.headers}
+            payload = json.dumps({'status': 'error', 'message': str(e)}).encode()
+        except Exception as e:
+            print(f"[WebServer] {method} {path} failed: {e}")
+            status, response_headers = 500, {'Content-Type': 'application/json'}
+            payload = json.dumps({'status': 'error', 'message': str(e)}).encode()
+        await self._send(writer, status, response_headers, b'' if method == 'HEAD' else payload,
+                         keep_alive, content_length=len(payload))
+        return keep_alive
+
+    async def _send(self, writer, status, headers, payload, keep_alive, content_length=None):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        if status != 304:
+            lines.append(f"Content-Length: {len(payload) if content_length is None else content_length}")
+        lines.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+        if keep_alive:
+            lines.append(f"Keep-Alive: timeout={int(KEEPALIVE_TIMEOUT)}")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await writer.drain()
+
+    # ------------------ Handlers ------------------
+
+    async def _api(self, method, path, body):
+        allowed = []
+        for route_method, pattern, handler, blocking in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed.append(route_method)
+                continue
+            try:
+                data = json.loads(body) if body else {}
+            except ValueError:
+                raise HttpError(400, "Request body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HttpError(400, "Request body must be a JSON object")
+            if blocking:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, handler, data, *match.groups())
+            else:
+                result = handler(data, *match.groups())
+            return 200, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'}, \
+                json.dumps(result).encode()
+        if allowed:
+            raise HttpError(405, headers={'Allow': ', '.join(allowed)})
+        raise HttpError(404)
+
+    def _static(self, method, path, headers):
+        if method not in ('GET', 'HEAD'):
+            raise HttpError(405, headers={'Allow': 'GET, HEAD'})
+        static = self.static.lookup(path)
+        cache_control = 'public, max-age=31536000, immutable' if HASHED_NAME.search(path) else 'no-cache'
+        response_headers = {'Content-Type': static.content_type, 'ETag': static.etag,
+                            'Last-Modified': static.last_modified, 'Cache-Control': cache_control}
+        if static.compressible:
+            response_headers['Vary'] = 'Accept-Encoding'
+        if not_modified(static, headers):
+            return 304, response_headers, b''
+        payload = static.body
+        accepted = accepted_encodings(headers)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted:
+                variant = static.variant(encoding, suffix)
+                if variant is not None and len(variant) < len(payload):
+                    response_headers['Content-Encoding'] = encoding
+                    payload = variant
+                    break
+        return 200, response_headers, payload
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Continental Quest launcher over HTTP.")
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help="interface to listen on (0.0.0.0 for other machines)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    from continental_quest_app import ContinentalQuestApp, WebAPI
+    app = ContinentalQuestApp()
+    server = WebServer(WebAPI(app), app.launcher_path.parent, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Server stopped")
+    finally:
+        if app.game_process:
+            app.game_process.quit()
+        app.progress.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())